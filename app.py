@@ -3,7 +3,13 @@ import logging
 from langchain_core.messages import HumanMessage
 from src.agent.chat_agent import ChatAgentFactory
 from src.database.connection import db_manager, redis_manager
+from src.database.catalog_cache import catalog_cache
+from src.database.chat_history_sink import chat_history_sink
+from src.services.followup_scheduler import followup_scheduler
+from src.services.background_tasks import background_tasks
+from src.config import settings
 from src.agent.middleware.memory_middleware import MemoryMiddleware
+from src.agent.middleware.summary_coordinator import summary_coordinator
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -11,7 +17,9 @@ logger = logging.getLogger(__name__)
 async def main():
 
     await db_manager.initialize()
-    redis_manager.initialize()
+    await redis_manager.initialize()
+    await catalog_cache.start()
+    await followup_scheduler.start()
 
     try:
         agent_factory = ChatAgentFactory()
@@ -19,9 +27,10 @@ async def main():
         print("Agent is ready. You can start chatting now.")
     except Exception as e:
         logger.error(f"Failed to initialize agent: {e}", exc_info=True)
+        await followup_scheduler.close()
+        await catalog_cache.close()
         await db_manager.close()
-        if redis_manager._client:
-            redis_manager.close()
+        await redis_manager.close()
         return
 
     user_id = input("Please enter your User ID to begin (e.g., user_123): ").strip()
@@ -68,9 +77,14 @@ async def main():
     except Exception as e:
         logger.error(f"An error occurred during the chat session: {e}", exc_info=True)
     finally:
+        await followup_scheduler.close()
+        await summary_coordinator.close()
+        # Memory writes and summaries still queued need the pools below; let them finish first.
+        await background_tasks.drain(settings.background_drain_timeout)
+        await catalog_cache.close()
+        await chat_history_sink.close()
         await db_manager.close()
-        if redis_manager._client:
-            redis_manager.close()
+        await redis_manager.close()
         print("\nEnding chat session. Goodbye!")
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""Chat history cache latency: native asyncio Redis client versus the previous
+synchronous client driven through the default thread-pool executor.
+
+Runs against the Redis configured in `.env`:
+
+    python -m benchmarks.bench_chat_history_redis --sessions 1 50 500
+"""
+import argparse
+import asyncio
+import functools
+import statistics
+import time
+from datetime import timedelta
+from typing import List
+
+import redis
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.config import settings
+from src.database.connection import redis_manager
+from src.agent.middleware.chat_history import ChatMessageHistory, _filter_messages
+from src.agent.middleware.message_codec import decode_message, encode_message
+
+KEY_PREFIX = "bench_chat_history"
+HISTORY_LENGTH = 20
+
+
+def _messages(n: int):
+    return [
+        (AIMessage if i % 2 else HumanMessage)(content=f"Tin nhắn thử nghiệm số {i} về bảo hiểm du lịch")
+        for i in range(n)
+    ]
+
+
+class _ExecutorHistory:
+    """The pre-asyncio implementation: sync client calls pushed to the executor."""
+
+    def __init__(self, client: redis.Redis, key: str):
+        self.client = client
+        self.redis_key = key
+
+    async def _run_sync(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+    async def load(self):
+        raw_messages = await self._run_sync(self.client.lrange, self.redis_key, 0, -1)
+        return _filter_messages([decode_message(m) for m in reversed(raw_messages)])
+
+    async def save(self, messages):
+        pipe = self.client.pipeline()
+        for msg in reversed(messages):
+            pipe.lpush(self.redis_key, encode_message(msg))
+        pipe.expire(self.redis_key, timedelta(hours=24))
+        await self._run_sync(pipe.execute)
+
+
+async def _measure(sessions: int, load, save) -> dict:
+    load_ms: List[float] = []
+    save_ms: List[float] = []
+    turn = _messages(2)
+
+    async def session(i: int):
+        start = time.perf_counter()
+        await save(i, turn)
+        save_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        await load(i)
+        load_ms.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return {"load": sorted(load_ms), "save": sorted(save_ms)}
+
+
+def _row(label: str, samples: List[float]) -> str:
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    return f"{label:<28}{statistics.fmean(samples):>10.3f}{statistics.median(samples):>10.3f}{p95:>10.3f}"
+
+
+async def main(session_counts: List[int]) -> None:
+    await redis_manager.initialize()
+    sync_client = redis.from_url(settings.redis_url)
+    try:
+        seed = _messages(HISTORY_LENGTH)
+        max_sessions = max(session_counts)
+        for i in range(max_sessions):
+            history = ChatMessageHistory(user_id=f"{KEY_PREFIX}:{i}", summary_llm=None)
+            await history._overwrite_cache(seed)
+
+        async def async_load(i):
+            history = ChatMessageHistory(user_id=f"{KEY_PREFIX}:{i}", summary_llm=None)
+            return await history._load_from_cache()
+
+        async def async_save(i, msgs):
+            history = ChatMessageHistory(user_id=f"{KEY_PREFIX}:{i}", summary_llm=None)
+            await history._save_to_cache(msgs)
+
+        async def executor_load(i):
+            return await _ExecutorHistory(sync_client, f"chat_history:{KEY_PREFIX}:{i}").load()
+
+        async def executor_save(i, msgs):
+            await _ExecutorHistory(sync_client, f"chat_history:{KEY_PREFIX}:{i}").save(msgs)
+
+        print(f"{'sessions / client':<28}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for sessions in session_counts:
+            for label, load, save in (
+                ("executor", executor_load, executor_save),
+                ("asyncio", async_load, async_save),
+            ):
+                result = await _measure(sessions, load, save)
+                print(_row(f"{sessions:>4} {label} load", result["load"]))
+                print(_row(f"{sessions:>4} {label} save", result["save"]))
+    finally:
+        keys = [f"chat_history:{KEY_PREFIX}:{i}" for i in range(max(session_counts))]
+        if keys:
+            await redis_manager.client.delete(*keys)
+        sync_client.close()
+        await redis_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 50, 500])
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions))
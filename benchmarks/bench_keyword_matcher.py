@@ -0,0 +1,106 @@
+"""Keyword classification cost: the per-keyword `in` loops the classifiers used
+before against the compiled KeywordMatcher, on a chat-sized message and on
+OCR text the size of a banking receipt. Pure CPU, no services needed:
+
+    python -m benchmarks.bench_keyword_matcher --iterations 20000
+"""
+import argparse
+import statistics
+import time
+import unicodedata
+from typing import Callable, Dict, List
+
+from src.common.constants import BankingVisionKeywords, Lexicon
+from src.common.keyword_matcher import fold
+
+MESSAGE = "Cho mình hỏi gói bảo hiểm nhân thọ cho cả nhà, với bảo hiểm xe máy thì phí một năm bao nhiêu vậy ạ?"
+
+OCR_TEXT = "\n".join([
+    "Vietcombank",
+    "Chuyển tiền thành công",
+    "Số tiền: 1.250.000 VND",
+    "Thời gian giao dịch: 14:32 - 05/03/2025",
+    "Tài khoản nguồn: 0071 0012 34567",
+    "Người nhận: CONG TY CO PHAN BAO HIEM CONG NGHE PHUONG DONG INSURTECH",
+    "Tài khoản nhận: 1903 5555 8888 01",
+    "Ngân hàng nhận: Techcombank",
+    "Mã giao dịch: FT25064ABCD1234",
+    "Nội dung: DH10293 thanh toan phi bao hiem xe may",
+    "Phí giao dịch: Miễn phí",
+] * 6)
+
+
+def _strip_accents(s: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+
+
+def _old_normalize_type(text: str):
+    lowered = _strip_accents(text.lower().strip())
+    if lowered in Lexicon.VN_TYPE_TO_CODE:
+        return Lexicon.VN_TYPE_TO_CODE[lowered]
+    for key, code in Lexicon.VN_TYPE_TO_CODE.items():
+        if key in lowered:
+            return code
+    return None
+
+
+def _old_count(keywords: List[str], text: str) -> int:
+    lower_text = text.lower()
+    return sum(1 for keyword in keywords if keyword in lower_text)
+
+
+def _old_bank(text: str):
+    lower_text = text.lower()
+    for keyword, bank_name in BankingVisionKeywords.BANKS.items():
+        if keyword in lower_text:
+            return bank_name
+    return None
+
+
+def _old_ocr(text: str):
+    return (
+        _old_count(BankingVisionKeywords.INSURANCE_KEYWORDS, text),
+        _old_count(BankingVisionKeywords.SIGNBOARD_KEYWORDS, text),
+        _old_bank(text),
+    )
+
+
+def _new_ocr(text: str):
+    return (
+        BankingVisionKeywords.INSURANCE_MATCHER.count_distinct(text),
+        BankingVisionKeywords.SIGNBOARD_MATCHER.count_distinct(text),
+        BankingVisionKeywords.BANK_MATCHER.longest(text),
+    )
+
+
+def _time(fn: Callable, text: str, iterations: int) -> float:
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            # Every message is new text: pay for one fold per iteration, shared
+            # by the classifiers within it, as in DocumentParser.parse_from_url.
+            fold.cache_clear()
+            fn(text)
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(samples)
+
+
+def main(iterations: int) -> None:
+    cases: Dict[str, tuple] = {
+        f"insurance type, message ({len(MESSAGE)} chars)": (MESSAGE, _old_normalize_type, Lexicon.normalize_insurance_type),
+        f"insurance type, OCR ({len(OCR_TEXT)} chars)": (OCR_TEXT, _old_normalize_type, Lexicon.normalize_insurance_type),
+        f"OCR classifiers ({len(OCR_TEXT)} chars)": (OCR_TEXT, _old_ocr, _new_ocr),
+    }
+    print(f"{'case':<40}{'loops (us)':>12}{'matcher (us)':>14}{'speedup':>10}   results")
+    for label, (text, old, new) in cases.items():
+        old_us = _time(old, text, iterations)
+        new_us = _time(new, text, iterations)
+        print(f"{label:<40}{old_us:>12.2f}{new_us:>14.2f}{old_us / new_us:>9.1f}x   {old(text)} -> {new(text)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,82 @@
+"""Cached chat message size and decode cost: LangChain's JSON envelope against
+the compact orjson codec, on 200-message histories shaped like the cache's
+(alternating user and model messages, the model's carrying the response and
+usage metadata ChatOpenAI attaches). Pure CPU, no services needed:
+
+    python -m benchmarks.bench_message_codec --histories 200
+"""
+import argparse
+import statistics
+import time
+import uuid
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.agent.middleware.message_codec import CODECS, decode_message
+
+HISTORY_LENGTH = 200
+
+QUESTIONS = [
+    "Cho mình hỏi gói bảo hiểm xe máy một năm bao nhiêu tiền vậy ạ?",
+    "Bảo hiểm du lịch quốc tế có chi trả khi bị hủy chuyến bay không?",
+    "Mình muốn mua thêm bảo hiểm sức khỏe cho bố mẹ",
+]
+ANSWERS = [
+    "Dạ, gói bảo hiểm trách nhiệm dân sự xe máy có phí 66.000đ/năm, bạn có muốn thêm vào giỏ hàng không ạ?",
+    "Dạ có ạ. Gói du lịch quốc tế chi trả chi phí hủy chuyến do ốm đau, tai nạn hoặc thiên tai, "
+    "tối đa 50.000.000đ mỗi chuyến. Bạn cần mình gửi chi tiết quyền lợi không?",
+    "Dạ, bên mình có gói sức khỏe cho người trên 60 tuổi, phí từ 3.200.000đ/năm, quyền lợi nội trú đến 200 triệu.",
+]
+
+
+def _history(n: int) -> List[BaseMessage]:
+    messages: List[BaseMessage] = []
+    for i in range(n):
+        if i % 2 == 0:
+            messages.append(HumanMessage(content=QUESTIONS[i % len(QUESTIONS)], id=str(uuid.uuid4())))
+        else:
+            messages.append(AIMessage(
+                content=ANSWERS[i % len(ANSWERS)],
+                id=f"run-{uuid.uuid4()}-0",
+                response_metadata={
+                    "token_usage": {"completion_tokens": 58, "prompt_tokens": 1843, "total_tokens": 1901},
+                    "model_name": "gpt-5-nano-2025-08-07",
+                    "system_fingerprint": None,
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                },
+                usage_metadata={"input_tokens": 1843, "output_tokens": 58, "total_tokens": 1901},
+            ))
+    return messages
+
+
+def main(histories: int) -> None:
+    history = _history(HISTORY_LENGTH)
+    print(f"{histories} histories of {HISTORY_LENGTH} messages")
+    print(f"{'codec':<10}{'bytes/msg':>12}{'KiB/history':>14}{'encode ms':>12}{'decode ms':>12}{'decode p95':>12}")
+    for name, codec in CODECS.items():
+        encode_ms: List[float] = []
+        decode_ms: List[float] = []
+        for _ in range(histories):
+            start = time.perf_counter()
+            raw = [codec.encode(m) for m in history]
+            encode_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            # The cache read path: header dispatch, then the codec.
+            [decode_message(r) for r in raw]
+            decode_ms.append((time.perf_counter() - start) * 1000)
+        size = sum(len(r) for r in raw)
+        decode_ms.sort()
+        p95 = decode_ms[max(0, int(len(decode_ms) * 0.95) - 1)]
+        print(
+            f"{name:<10}{size / len(raw):>12.1f}{size / 1024:>14.1f}"
+            f"{statistics.median(encode_ms):>12.3f}{statistics.median(decode_ms):>12.3f}{p95:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--histories", type=int, default=200, help="histories to encode and decode per codec")
+    args = parser.parse_args()
+    main(args.histories)
@@ -0,0 +1,114 @@
+"""Compares product name search on a 100k-row synthetic catalog: the old
+`insurance_name ILIKE` scan against the unaccented trigram-indexed lookups.
+
+In the app the substring lookup runs in SQL only while the catalog cache is
+cold (warm, it is an in-memory scan); the similarity search always does.
+
+Needs pg_trgm and unaccent (migrations/0002_insurance_name_search.sql). The
+catalog lives in a temp table, so nothing is written to insurance_products:
+
+    python -m benchmarks.bench_name_search --rows 100000 --iterations 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from src.database.connection import db_manager
+from src.database.insurance_repository import FETCH_BY_NAME_SQL, SEARCH_BY_NAME_SQL
+
+BENCH_TABLE = "bench_insurance_products"
+
+KINDS = ["sức khỏe", "du lịch", "xe máy", "ô tô", "nhân thọ", "tai nạn", "nhà ở", "học đường"]
+PARTNERS = ["VBI", "Bảo Việt", "PVI", "Liberty", "Manulife", "Prudential", "AIA", "BIC", "PTI", "MIC"]
+TIERS = ["Vàng", "Bạc", "Kim Cương", "Cơ bản", "Toàn diện", "Plus", "Gia đình", "Doanh nghiệp"]
+
+# (query as typed, what it exercises)
+QUERIES = [
+    ("sức khỏe Kim Cương", "exact, with diacritics"),
+    ("suc khoe kim cuong", "no diacritics"),
+    ("du lich bao viet", "no diacritics"),
+    ("nhan tho manulfie", "typo"),
+    ("xe may lberty", "typo"),
+    ("bảo hiểm ô tô PVI Toàn diện", "long phrase"),
+]
+
+ILIKE_SQL = (
+    f"SELECT insurance_id, insurance_name FROM {BENCH_TABLE} "
+    "WHERE insurance_name ILIKE '%' || $1 || '%' ORDER BY insurance_id LIMIT $2"
+)
+
+
+def _synthetic_rows(count: int, seed: int = 7) -> List[Tuple]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, count + 1):
+        kind, partner, tier = rng.choice(KINDS), rng.choice(PARTNERS), rng.choice(TIERS)
+        rows.append((i, f"Bảo hiểm {kind} {partner} {tier} {i:06d}", kind, 10000 * rng.randint(1, 50), "1 năm"))
+    return rows
+
+
+async def _time(conn, sql: str, text: str, iterations: int) -> Tuple[List[float], int]:
+    timings: List[float] = []
+    hits = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows = await conn.fetch(sql, text, 25)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits = len(rows)
+    return timings, hits
+
+
+async def main(row_count: int, iterations: int) -> None:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    cases = {
+        "ILIKE insurance_name (before)": ILIKE_SQL,
+        "name_search LIKE (trigram)": FETCH_BY_NAME_SQL.sql.replace("insurance_products", BENCH_TABLE),
+        "word similarity (trigram)": SEARCH_BY_NAME_SQL.sql.replace("insurance_products", BENCH_TABLE),
+    }
+    try:
+        async with db_manager.pool.acquire() as conn:
+            # INCLUDING ALL copies the generated name_search column and the GIN index.
+            await conn.execute(f"CREATE TEMP TABLE {BENCH_TABLE} (LIKE insurance_products INCLUDING ALL)")
+            await conn.copy_records_to_table(
+                BENCH_TABLE,
+                records=_synthetic_rows(row_count),
+                columns=["insurance_id", "insurance_name", "insurance_type", "sum_insured", "term"],
+            )
+            await conn.execute(f"ANALYZE {BENCH_TABLE}")
+
+            results: Dict[str, Dict[str, Tuple[List[float], int]]] = {}
+            for label, sql in cases.items():
+                results[label] = {}
+                for text, _ in QUERIES:
+                    await _time(conn, sql, text, 3)
+                    results[label][text] = await _time(conn, sql, text, iterations)
+
+            plan = await conn.fetch("EXPLAIN " + cases["word similarity (trigram)"], QUERIES[1][0], 25)
+            await conn.execute(f"DROP TABLE {BENCH_TABLE}")
+    finally:
+        await db_manager.close()
+
+    print(f"\n{row_count} products, {iterations} runs per query")
+    print(f"{'query':<32}{'kind':<24}" + "".join(f"{label[:26]:>30}" for label in cases))
+    for text, kind in QUERIES:
+        cells = []
+        for label in cases:
+            timings, hits = results[label][text]
+            cells.append(f"{statistics.median(timings):>8.3f} ms p50 {hits:>3} hits")
+        print(f"{text:<32}{kind:<24}" + "".join(f"{c:>30}" for c in cells))
+    print("\nPlan for the similarity search:")
+    for row in plan:
+        print("  " + row[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations))
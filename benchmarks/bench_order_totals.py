@@ -0,0 +1,159 @@
+"""Write amplification per cart mutation: the old re-aggregating totals trigger
+plus the Python-side recalc, against the delta trigger from
+migrations/0003_incremental_order_totals.sql.
+
+Each mode runs in one transaction that is rolled back, so nothing persists.
+The old trigger is swapped in with DDL inside that transaction, which needs
+table ownership and locks `orders` while it runs; point it at a scratch
+database:
+
+    python -m benchmarks.bench_order_totals --background-carts 2000 --mutations 400
+
+Rows read and written come from pg_stat_xact_user_tables (orders, order_list).
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict
+
+import asyncpg
+
+from src.database.connection import db_manager
+from src.database.order_repository import CREATE_ORDER_SQL, DELETE_ORDER_SQL, RECALC_ORDER_LIST_SQL, UPDATE_ORDER_QUANTITY_SQL
+
+BENCH_USER = "bench_order_totals"
+
+# update_order_totals as it was before the delta trigger.
+OLD_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION update_order_totals()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_count  INTEGER;
+    v_amount NUMERIC(20,2);
+    v_order_list_id BIGINT;
+BEGIN
+    v_order_list_id := COALESCE(NEW.order_list_id, OLD.order_list_id);
+    SELECT COALESCE(SUM(qty), 0), COALESCE(SUM(amount), 0)
+    INTO v_count, v_amount
+    FROM public.orders
+    WHERE order_list_id = v_order_list_id;
+    IF v_count = 0 THEN
+        DELETE FROM public.order_list WHERE id = v_order_list_id;
+    ELSE
+        UPDATE public.order_list
+        SET total_count = v_count,
+            total_amount = v_amount,
+            qr_payment = 'https://qr.sepay.vn/img?acc=0395695023&bank=VPBank&amount=' || v_amount::INTEGER::text || '&des=TKPS2E+DH' || v_order_list_id::text,
+            updated_at = now()
+        WHERE id = v_order_list_id;
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+ALTER TABLE public.order_list ALTER COLUMN total_count SET DEFAULT 1;
+DROP TRIGGER IF EXISTS order_update_trigger ON public.orders;
+CREATE TRIGGER order_update_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON public.orders
+    FOR EACH ROW EXECUTE FUNCTION update_order_totals();
+"""
+
+# Other users' carts, written without firing triggers so seeding stays fast in both modes.
+SEED_SQL = """
+ALTER TABLE public.orders DISABLE TRIGGER USER;
+INSERT INTO infor_user (from_id)
+SELECT 'bench_bg_' || g FROM generate_series(1, $1) g ON CONFLICT (from_id) DO NOTHING;
+WITH lists AS (
+    INSERT INTO order_list (from_id, status, total_count, total_amount)
+    SELECT 'bench_bg_' || g, 'pending', 5, 0 FROM generate_series(1, $1) g
+    RETURNING id, from_id
+)
+INSERT INTO orders (order_list_id, insurance_id, qty, amount, from_id)
+SELECT l.id, p.insurance_id, 1, p.sum_insured, l.from_id
+FROM lists l
+CROSS JOIN LATERAL (SELECT insurance_id, sum_insured FROM insurance_products ORDER BY insurance_id LIMIT 5) p;
+ALTER TABLE public.orders ENABLE TRIGGER USER;
+"""
+
+STATS_SQL = """
+SELECT relname, seq_tup_read + COALESCE(idx_tup_fetch, 0) AS tup_read,
+       n_tup_ins + n_tup_upd + n_tup_del AS tup_written
+FROM pg_stat_xact_user_tables
+WHERE relname IN ('orders', 'order_list')
+"""
+
+
+async def _stats(conn: asyncpg.Connection) -> Dict[str, int]:
+    rows = await conn.fetch(STATS_SQL)
+    return {
+        "read": sum(r["tup_read"] for r in rows),
+        "written": sum(r["tup_written"] for r in rows),
+    }
+
+
+async def _seed(conn: asyncpg.Connection, carts: int) -> None:
+    # asyncpg runs multi-statement scripts only without parameters.
+    await conn.execute(SEED_SQL.replace("$1", str(int(carts))))
+
+
+async def _run_mode(old: bool, carts: int, mutations: int) -> Dict[str, float]:
+    async with db_manager.pool.acquire() as conn:
+        tx = conn.transaction()
+        await tx.start()
+        try:
+            if old:
+                await conn.execute(OLD_TRIGGER_SQL)
+            await _seed(conn, carts)
+            products = [r["insurance_id"] for r in await conn.fetch(
+                "SELECT insurance_id FROM insurance_products ORDER BY insurance_id LIMIT 3"
+            )]
+            before = await _stats(conn)
+            start = time.perf_counter()
+            done = 0
+            while done < mutations:
+                # One cart round: add two items, change a quantity, remove both.
+                first = await conn.fetchrow(CREATE_ORDER_SQL.sql, products[0], 1, BENCH_USER)
+                second = await conn.fetchrow(CREATE_ORDER_SQL.sql, products[1], 2, BENCH_USER)
+                if old:
+                    await conn.execute(RECALC_ORDER_LIST_SQL.sql, first["order_list_id"])
+                    await conn.execute(RECALC_ORDER_LIST_SQL.sql, second["order_list_id"])
+                await conn.fetchrow(UPDATE_ORDER_QUANTITY_SQL.sql, 3, 3, first["order_id"])
+                if old:
+                    await conn.execute(RECALC_ORDER_LIST_SQL.sql, first["order_list_id"])
+                await conn.fetchrow(DELETE_ORDER_SQL.sql, first["order_id"])
+                await conn.fetchrow(DELETE_ORDER_SQL.sql, second["order_id"])
+                done += 5
+            elapsed = time.perf_counter() - start
+            after = await _stats(conn)
+            return {
+                "read": (after["read"] - before["read"]) / done,
+                "written": (after["written"] - before["written"]) / done,
+                "ms": elapsed * 1000 / done,
+            }
+        finally:
+            await tx.rollback()
+
+
+async def main(carts: int, mutations: int) -> None:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        results = {
+            "re-aggregate + Python recalc (before)": await _run_mode(True, carts, mutations),
+            "delta trigger (after)": await _run_mode(False, carts, mutations),
+        }
+    finally:
+        await db_manager.close()
+
+    print(f"\n{carts} other carts ({carts * 5} orders), {mutations} mutations per mode")
+    print(f"{'mode':<40}{'rows read/mut':>16}{'rows written/mut':>18}{'ms/mut':>10}")
+    for label, r in results.items():
+        print(f"{label:<40}{r['read']:>16.1f}{r['written']:>18.2f}{r['ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background-carts", type=int, default=2000)
+    parser.add_argument("--mutations", type=int, default=400)
+    args = parser.parse_args()
+    asyncio.run(main(args.background_carts, args.mutations))
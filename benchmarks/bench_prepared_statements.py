@@ -0,0 +1,95 @@
+"""Compares per-call latency of registered statements with the prepared statement
+registry enabled and disabled.
+
+Runs against the database configured in `.env`:
+
+    python -m benchmarks.bench_prepared_statements --iterations 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from src.config import settings
+from src.database.connection import db_manager
+from src.database.insurance_repository import FETCH_BY_IDS_SQL, FETCH_BY_TYPE_SQL
+from src.database.order_repository import CREATE_ORDER_SQL, FETCH_ORDERS_SQL, RECALC_ORDER_LIST_SQL
+
+BENCH_USER = "bench_prepared_statements"
+
+
+async def _seed() -> int:
+    products = await db_manager.fetch_all("SELECT insurance_id FROM insurance_products ORDER BY insurance_id LIMIT 5")
+    for p in products:
+        await db_manager.fetch_one(CREATE_ORDER_SQL, [p['insurance_id'], 1, BENCH_USER])
+    row = await db_manager.fetch_one("SELECT id FROM order_list WHERE from_id = $1 AND status = 'pending'", [BENCH_USER])
+    return row['id']
+
+
+async def _cleanup() -> None:
+    await db_manager.execute("DELETE FROM orders WHERE from_id = $1", [BENCH_USER])
+    await db_manager.execute("DELETE FROM order_list WHERE from_id = $1", [BENCH_USER])
+
+
+async def _time_calls(iterations: int, concurrency: int, order_list_id: int) -> Dict[str, List[float]]:
+    cases = {
+        "fetch_orders (3-way join)": (db_manager.fetch_all, FETCH_ORDERS_SQL, [BENCH_USER, "pending"]),
+        "recalc_order_list (CTE)": (db_manager.execute, RECALC_ORDER_LIST_SQL, [order_list_id]),
+        "insurance fetch_by_type": (db_manager.fetch_all, FETCH_BY_TYPE_SQL, ["health", 25]),
+        "insurance fetch_by_ids": (db_manager.fetch_all, FETCH_BY_IDS_SQL, [[1]]),
+    }
+    samples: Dict[str, List[float]] = {}
+    for label, (call, statement, params) in cases.items():
+        timings: List[float] = []
+
+        async def worker(n: int):
+            for _ in range(n):
+                start = time.perf_counter()
+                await call(statement, params)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        per_worker = max(1, iterations // concurrency)
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+        samples[label] = timings
+    return samples
+
+
+def _report(title: str, samples: Dict[str, List[float]]) -> None:
+    print(f"\n{title}")
+    print(f"{'query':<30}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, timings in samples.items():
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{label:<30}{statistics.fmean(timings):>10.3f}{statistics.median(timings):>10.3f}{p95:>10.3f}")
+
+
+async def _run_mode(enabled: bool, iterations: int, concurrency: int) -> Dict[str, List[float]]:
+    settings.db_prepared_statements = enabled
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        await _cleanup()
+        order_list_id = await _seed()
+        # Warm up every pooled connection so connection setup is not measured.
+        await _time_calls(concurrency * 5, concurrency, order_list_id)
+        return await _time_calls(iterations, concurrency, order_list_id)
+    finally:
+        await _cleanup()
+        await db_manager.close()
+
+
+async def main(iterations: int, concurrency: int) -> None:
+    off = await _run_mode(False, iterations, concurrency)
+    on = await _run_mode(True, iterations, concurrency)
+    _report("Registry OFF (parse + plan on every call)", off)
+    _report("Registry ON (prepared once per connection)", on)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.concurrency))
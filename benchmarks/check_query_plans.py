@@ -0,0 +1,180 @@
+"""Query-plan regression check for the hot per-user queries.
+
+Loads synthetic users with long order and chat histories inside one
+transaction, ANALYZEs, and EXPLAINs each registered statement below with
+realistic parameters under EXPLAIN ANALYZE. A query fails the check when a
+table it should reach through an index (migrations/0007_hot_path_indexes.sql)
+is read with a sequential scan over more than --max-seq-rows rows; tiny
+tables and partitions may legitimately be scanned. Partitions that the
+executor pruned do not appear in the plan at all. The transaction is rolled
+back, so nothing persists, but
+seeding disables user triggers on orders and needs table ownership; point it
+at a scratch database:
+
+    python -m benchmarks.check_query_plans --users 5000
+
+tests/test_query_plans.py runs the same check under pytest.
+
+Exits with status 1 when any plan regressed.
+"""
+import argparse
+import asyncio
+import json
+import re
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Set, Tuple
+
+import asyncpg
+
+from src.agent.middleware.chat_history import LOAD_HISTORY_SQL
+from src.agent.tools.order_tools import VIEW_ORDERS_SQL
+from src.config import settings
+from src.database.connection import db_manager
+from src.database.order_repository import (
+    FETCH_ORDER_LIST_SQL,
+    FETCH_ORDERS_SQL,
+    GET_EXISTING_ORDERS_SQL,
+    RECALC_ORDER_LIST_SQL,
+)
+from src.database.statements import Statement
+
+PREFIX = "plan_check_"
+_PARTITION_SUFFIX = re.compile(r"_p\d{4}_\d{2}$")
+
+# Per user: `lists` paid carts of 3 lines each, one pending cart of 3 lines and
+# `messages` chat messages. Triggers are off so seeding stays fast.
+SEED_SQL = """
+ALTER TABLE public.orders DISABLE TRIGGER USER;
+ALTER TABLE public.order_list DISABLE TRIGGER USER;
+INSERT INTO infor_user (from_id)
+SELECT '{prefix}' || u FROM generate_series(1, {users}) u ON CONFLICT (from_id) DO NOTHING;
+WITH lists AS (
+    INSERT INTO order_list (from_id, status, total_count, total_amount, created_at)
+    SELECT '{prefix}' || u,
+           CASE WHEN l = 0 THEN 'pending' ELSE 'completed' END,
+           3, 0, now() - l * interval '1 day'
+    FROM generate_series(1, {users}) u, generate_series(0, {lists}) l
+    RETURNING id, from_id, status
+)
+INSERT INTO orders (order_list_id, insurance_id, qty, amount, from_id, status)
+SELECT l.id, p.insurance_id, 1, p.sum_insured, l.from_id, l.status
+FROM lists l
+CROSS JOIN LATERAL (SELECT insurance_id, sum_insured FROM insurance_products ORDER BY insurance_id LIMIT 3) p;
+SELECT ensure_chat_history_partitions(now() - {messages} * interval '1 minute', now());
+INSERT INTO chat_histories (is_bot, message_id, text, from_id, created_at)
+SELECT m % 2 = 0, '{prefix}' || u || '_' || m, 'x', '{prefix}' || u, now() - m * interval '1 minute'
+FROM generate_series(1, {users}) u, generate_series(1, {messages}) m;
+ALTER TABLE public.orders ENABLE TRIGGER USER;
+ALTER TABLE public.order_list ENABLE TRIGGER USER;
+ANALYZE infor_user;
+ANALYZE order_list;
+ANALYZE orders;
+ANALYZE chat_histories;
+"""
+
+
+class Check(NamedTuple):
+    statement: Statement
+    params: Callable[[asyncpg.Connection, str], Any]
+    indexed: Set[str]
+
+
+async def _pending_list_id(conn: asyncpg.Connection, user: str) -> List[Any]:
+    return [await conn.fetchval("SELECT id FROM order_list WHERE from_id = $1 AND status = 'pending'", user)]
+
+
+async def _existing_orders_params(conn: asyncpg.Connection, user: str) -> List[Any]:
+    insurance_id = await conn.fetchval("SELECT min(insurance_id) FROM insurance_products")
+    return [[user], [insurance_id]]
+
+
+async def _user_status(conn: asyncpg.Connection, user: str) -> List[Any]:
+    return [user, "pending"]
+
+
+async def _history_params(conn: asyncpg.Connection, user: str) -> List[Any]:
+    return [user, timedelta(days=settings.chat_history_load_days), settings.chat_history_load_limit]
+
+
+CHECKS = [
+    Check(FETCH_ORDERS_SQL, _user_status, {"orders", "order_list"}),
+    Check(VIEW_ORDERS_SQL, _user_status, {"orders", "order_list"}),
+    Check(FETCH_ORDER_LIST_SQL, _user_status, {"order_list"}),
+    Check(GET_EXISTING_ORDERS_SQL, _existing_orders_params, {"orders", "order_list"}),
+    Check(RECALC_ORDER_LIST_SQL, _pending_list_id, {"orders", "order_list"}),
+    Check(LOAD_HISTORY_SQL, _history_params, {"chat_histories"}),
+]
+
+
+def _scans(plan: Dict[str, Any]) -> List[Tuple[str, str, int]]:
+    """(relation, node type, rows read) for every plan node that reads a table."""
+    found = []
+    # Partition scans report the partition as the relation; count them as the parent table.
+    if "Relation Name" in plan:
+        rows = (plan.get("Actual Rows", 0) + plan.get("Rows Removed by Filter", 0)) * plan.get("Actual Loops", 1)
+        found.append((_PARTITION_SUFFIX.sub("", plan["Relation Name"]), plan["Node Type"], int(rows)))
+    for child in plan.get("Plans", []):
+        found.extend(_scans(child))
+    return found
+
+
+async def _explain(conn: asyncpg.Connection, check: Check, user: str) -> List[Tuple[str, str, int]]:
+    params = await check.params(conn, user)
+    raw = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {check.statement.sql}", *params)
+    return _scans(json.loads(raw)[0]["Plan"])
+
+
+class PlanResult(NamedTuple):
+    statement: str
+    scans: List[Tuple[str, str, int]]
+    # Indexed tables read with a sequential scan over more than max_seq_rows rows.
+    regressed: List[str]
+
+
+async def check_plans(
+    conn: asyncpg.Connection, users: int, lists: int, messages: int, max_seq_rows: int
+) -> List[PlanResult]:
+    """Seeds, EXPLAINs every check and rolls back; shared with tests/test_query_plans.py."""
+    results = []
+    tx = conn.transaction()
+    await tx.start()
+    try:
+        await conn.execute(SEED_SQL.format(prefix=PREFIX, users=int(users), lists=int(lists), messages=int(messages)))
+        user = f"{PREFIX}{users // 2}"
+        for check in CHECKS:
+            scans = await _explain(conn, check, user)
+            regressed = [
+                rel for rel, node, rows in scans
+                if rel in check.indexed and node == "Seq Scan" and rows > max_seq_rows
+            ]
+            results.append(PlanResult(check.statement.name, scans, regressed))
+    finally:
+        await tx.rollback()
+    return results
+
+
+async def main(users: int, lists: int, messages: int, max_seq_rows: int) -> int:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        async with db_manager.pool.acquire() as conn:
+            results = await check_plans(conn, users, lists, messages, max_seq_rows)
+    finally:
+        await db_manager.close()
+    print(f"\n{users} users, {lists} paid carts and {messages} messages each")
+    print(f"{'statement':<34}{'result':<8}scans")
+    for result in results:
+        summary = ", ".join(f"{rel}: {node} ({rows} rows)" for rel, node, rows in result.scans)
+        print(f"{result.statement:<34}{'FAIL' if result.regressed else 'ok':<8}{summary}")
+    return 1 if any(result.regressed for result in results) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--lists", type=int, default=10, help="paid carts per user")
+    parser.add_argument("--messages", type=int, default=20, help="chat messages per user")
+    parser.add_argument("--max-seq-rows", type=int, default=1000, help="rows a sequential scan may read before it fails")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.users, args.lists, args.messages, args.max_seq_rows)))
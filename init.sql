@@ -1,12 +1,27 @@
 -- FILE: init.sql
+-- Đã bao gồm mọi migration trong migrations/. Sau khi tạo database từ file này, chạy
+--     python -m src.database.migrations --baseline latest
+-- để ghi nhận các migration là đã áp dụng (khi thêm migration mới, cập nhật cả file này).
 
 BEGIN;
 
 -- Kích hoạt các extension cần thiết
 CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- unaccent() chỉ là STABLE, bọc lại với dictionary cố định để dùng được trong generated column/index
+CREATE OR REPLACE FUNCTION public.immutable_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
 -- Dọn dẹp các bảng cũ
+DROP TABLE IF EXISTS public.bank_transactions CASCADE;
+DROP TABLE IF EXISTS public.followup_progress CASCADE;
+DROP TABLE IF EXISTS public.user_feedback CASCADE;
+DROP TABLE IF EXISTS public.chat_summaries CASCADE;
+DROP TABLE IF EXISTS public.chat_history_message_ids CASCADE;
 DROP TABLE IF EXISTS public.chat_histories CASCADE;
 DROP TABLE IF EXISTS public.insurance_products CASCADE;
 DROP TABLE IF EXISTS public.order_list CASCADE;
@@ -14,14 +29,32 @@ DROP TABLE IF EXISTS public.orders CASCADE;
 DROP TABLE IF EXISTS public.infor_user CASCADE;
 
 -- Bảng lưu trữ lịch sử chat đầy đủ
+-- Chia partition theo tháng trên created_at; partition được tạo tự động khi ghi (ensure_chat_history_partitions)
 CREATE TABLE public.chat_histories (
-    id          BIGSERIAL PRIMARY KEY,
+    id          BIGSERIAL,
     is_bot      BOOLEAN NOT NULL DEFAULT FALSE,
     d_name      TEXT,
-    message_id  TEXT NOT NULL UNIQUE,
+    message_id  TEXT NOT NULL,
     text        TEXT,
     from_id     TEXT,
-    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at),
+    UNIQUE (message_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- message_id duy nhất trên toàn bảng chat_histories (ràng buộc UNIQUE của bảng partition phải chứa created_at)
+CREATE TABLE public.chat_history_message_ids (
+    message_id  TEXT PRIMARY KEY,
+    created_at  TIMESTAMPTZ NOT NULL
+);
+
+-- Bản tóm tắt hội thoại mới nhất của mỗi người dùng, kèm tin nhắn cuối cùng mà nó bao phủ
+CREATE TABLE public.chat_summaries (
+    from_id          TEXT PRIMARY KEY,
+    summary          TEXT NOT NULL,
+    last_message_at  TIMESTAMPTZ NOT NULL,
+    last_message_id  TEXT NOT NULL,
+    updated_at       TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
 -- Bảng lưu thông tin người dùng và thống kê
@@ -37,6 +70,7 @@ CREATE TABLE public.infor_user (
     total_buy           NUMERIC(20,2) NOT NULL DEFAULT 0 CHECK (total_buy >= 0),
     preferred_language  TEXT NOT NULL DEFAULT 'vi' CHECK (preferred_language IN ('vi', 'en', 'zh')),
     language_detected_at TIMESTAMPTZ,
+    cart_version        BIGINT NOT NULL DEFAULT 0, -- tăng mỗi khi giỏ hàng thay đổi (cache Redis)
     created_at          TIMESTAMPTZ NOT NULL DEFAULT now(),
     updated_at          TIMESTAMPTZ NOT NULL DEFAULT now()
 );
@@ -48,15 +82,20 @@ CREATE TABLE public.insurance_products (
     insurance_type  TEXT NOT NULL,
     sum_insured     NUMERIC(20,2) NOT NULL,
     term            TEXT NOT NULL,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    name_search     TEXT GENERATED ALWAYS AS (lower(public.immutable_unaccent(insurance_name))) STORED
 );
 
+-- Tìm kiếm tên sản phẩm không dấu, chịu lỗi chính tả (LIKE '%...%' và word similarity)
+CREATE INDEX idx_insurance_products_name_search_trgm
+    ON public.insurance_products USING gin (name_search gin_trgm_ops);
+
 -- Bảng tổng hợp giỏ hàng (một giỏ hàng cho mỗi người dùng ở trạng thái pending)
 CREATE TABLE public.order_list (
     id            BIGSERIAL PRIMARY KEY,
     from_id       TEXT NOT NULL,
     status        TEXT NOT NULL DEFAULT 'pending',
-    total_count   INTEGER NOT NULL DEFAULT 1,
+    total_count   INTEGER NOT NULL DEFAULT 0,
     total_amount  NUMERIC(20,2) NOT NULL DEFAULT 0 CHECK (total_amount >= 0),
     qr_payment    TEXT,
     note          TEXT DEFAULT 'CHUYEN KHOAN MUA BAO HIEM CONG TY EKKO',
@@ -81,32 +120,125 @@ CREATE TABLE public.orders (
 ALTER TABLE public.order_list ADD CONSTRAINT fk_order_list_from_id FOREIGN KEY (from_id) REFERENCES public.infor_user(from_id);
 ALTER TABLE public.orders ADD CONSTRAINT fk_orders_order_list_id FOREIGN KEY (order_list_id) REFERENCES public.order_list(id) ON DELETE CASCADE;
 
+-- Trạng thái gửi tin chăm sóc sau mua: một dòng cho mỗi giỏ hàng đã thanh toán khi được worker nhận xử lý
+CREATE TABLE public.user_feedback (
+    id                BIGSERIAL PRIMARY KEY,
+    order_list_id     BIGINT NOT NULL UNIQUE REFERENCES public.order_list(id) ON DELETE CASCADE,
+    from_id           TEXT NOT NULL,
+    follow_up_sent    BOOLEAN NOT NULL DEFAULT FALSE,
+    follow_up_sent_at TIMESTAMPTZ,
+    claimed_until     TIMESTAMPTZ, -- hạn giữ chỗ của worker đang gửi
+    attempts          INTEGER NOT NULL DEFAULT 0,
+    last_error        TEXT,
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Con trỏ keyset (created_at, id) của từng job, để khởi động lại thì tiếp tục từ chỗ đã dừng
+CREATE TABLE public.followup_progress (
+    job             TEXT PRIMARY KEY,
+    last_created_at TIMESTAMPTZ,
+    last_id         BIGINT,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Quét giỏ hàng đã thanh toán theo thứ tự (created_at, id)
+CREATE INDEX idx_order_list_paid_created
+    ON public.order_list (created_at, id)
+    WHERE status IN ('success', 'completed');
+
+-- Giao dịch chuyển khoản đã đối soát, mỗi mã giao dịch ngân hàng một dòng (nhận lại webhook không bị tính hai lần)
+CREATE TABLE public.bank_transactions (
+    transaction_id  TEXT PRIMARY KEY,
+    gateway         TEXT,
+    amount          NUMERIC(20,2) NOT NULL,
+    content         TEXT,
+    transferred_at  TIMESTAMPTZ,
+    order_list_id   BIGINT REFERENCES public.order_list(id) ON DELETE SET NULL,
+    match_status    TEXT NOT NULL CHECK (match_status IN ('matched', 'underpaid', 'already_paid', 'unmatched')),
+    received_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX idx_bank_transactions_order_list ON public.bank_transactions (order_list_id);
+
+-- Chỉ mục cho các truy vấn giỏ hàng và lịch sử chat theo người dùng
+CREATE INDEX idx_orders_order_list_id ON public.orders (order_list_id);
+CREATE INDEX idx_order_list_from_status ON public.order_list (from_id, status, id DESC);
+CREATE INDEX idx_orders_pending_list_insurance
+    ON public.orders (order_list_id, insurance_id)
+    WHERE status = 'pending';
+CREATE INDEX idx_chat_histories_from_created ON public.chat_histories (from_id, created_at);
+CREATE INDEX idx_chat_history_message_ids_created ON public.chat_history_message_ids (created_at);
+
 
 -- FUNCTIONS AND TRIGGERS
 
+-- Tạo các partition theo tháng của chat_histories phủ khoảng [p_from, p_to] (bỏ qua partition đã có)
+CREATE OR REPLACE FUNCTION ensure_chat_history_partitions(p_from TIMESTAMPTZ, p_to TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month   DATE := date_trunc('month', p_from AT TIME ZONE 'UTC')::date;
+    v_name    TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= (p_to AT TIME ZONE 'UTC')::date LOOP
+        v_name := 'chat_histories_p' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            -- Hai tiến trình cùng tạo một tháng mới: tiến trình thứ hai chờ ở đây
+            PERFORM pg_advisory_xact_lock(hashtextextended('chat_histories_partition:' || v_name, 0));
+            IF to_regclass('public.' || v_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.chat_histories FOR VALUES FROM (%L) TO (%L)',
+                    v_name,
+                    (v_month::timestamp AT TIME ZONE 'UTC'),
+                    ((v_month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC')
+                );
+                v_created := v_created + 1;
+            END IF;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_chat_history_partitions(now(), now() + INTERVAL '1 month');
+
+-- Cộng dồn chênh lệch (delta) vào tổng giỏ hàng thay vì SUM lại toàn bộ đơn hàng
+CREATE OR REPLACE FUNCTION apply_order_list_delta(p_order_list_id BIGINT, p_qty INTEGER, p_amount NUMERIC)
+RETURNS VOID AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_order_list_id IS NULL OR (p_qty = 0 AND p_amount = 0) THEN
+        RETURN;
+    END IF;
+
+    -- Khóa dòng order_list khi UPDATE nên các thay đổi đồng thời trên cùng giỏ hàng không bị mất
+    UPDATE public.order_list
+    SET total_count = total_count + p_qty,
+        total_amount = total_amount + p_amount,
+        qr_payment = 'https://qr.sepay.vn/img?acc=0395695023&bank=VPBank&amount=' || (total_amount + p_amount)::INTEGER::text || '&des=TKPS2E+DH' || id::text,
+        updated_at = now()
+    WHERE id = p_order_list_id
+    RETURNING total_count INTO v_count;
+
+    IF v_count <= 0 THEN
+        DELETE FROM public.order_list WHERE id = p_order_list_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE OR REPLACE FUNCTION update_order_totals()
 RETURNS TRIGGER AS $$
-DECLARE
-    v_count  INTEGER;
-    v_amount NUMERIC(20,2);
-    v_order_list_id BIGINT;
 BEGIN
-    v_order_list_id := COALESCE(NEW.order_list_id, OLD.order_list_id);
-    
-    SELECT COALESCE(SUM(qty), 0), COALESCE(SUM(amount), 0)
-    INTO v_count, v_amount
-    FROM public.orders
-    WHERE order_list_id = v_order_list_id;
-    
-    IF v_count = 0 THEN
-        DELETE FROM public.order_list WHERE id = v_order_list_id;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty, NEW.amount);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_order_list_delta(OLD.order_list_id, -OLD.qty, -OLD.amount);
+    ELSIF OLD.order_list_id IS DISTINCT FROM NEW.order_list_id THEN
+        PERFORM apply_order_list_delta(OLD.order_list_id, -OLD.qty, -OLD.amount);
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty, NEW.amount);
     ELSE
-        UPDATE public.order_list
-        SET total_count = v_count,
-            total_amount = v_amount,
-            qr_payment = 'https://qr.sepay.vn/img?acc=0395695023&bank=VPBank&amount=' || v_amount::INTEGER::text || '&des=TKPS2E+DH' || v_order_list_id::text,
-            updated_at = now()
-        WHERE id = v_order_list_id;
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty - OLD.qty, NEW.amount - OLD.amount);
     END IF;
 
     RETURN COALESCE(NEW, OLD);
@@ -234,6 +366,156 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-- Giỏ hàng pending hiện tại kèm cart_version lúc đọc (giỏ rỗng nếu chưa có)
+CREATE OR REPLACE FUNCTION cart_snapshot(p_from_id TEXT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'cart_version', COALESCE((SELECT cart_version FROM public.infor_user WHERE from_id = p_from_id), 0),
+        'order_list_id', ol.id,
+        'total_count', COALESCE(ol.total_count, 0),
+        'total_amount', COALESCE(ol.total_amount, 0),
+        'qr_payment', ol.qr_payment,
+        'items', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'order_id', o.id,
+                'insurance_id', o.insurance_id,
+                'insurance_name', ip.insurance_name,
+                'quantity', o.qty,
+                'unit_price', ip.sum_insured,
+                'sum_insured', ip.sum_insured,
+                'amount', o.amount,
+                'term', ip.term,
+                'status', o.status,
+                'created_at', o.created_at
+            ) ORDER BY o.created_at DESC)
+            FROM public.orders o
+            JOIN public.insurance_products ip ON ip.insurance_id = o.insurance_id
+            WHERE o.order_list_id = ol.id AND o.status = 'pending'
+        ), '[]'::jsonb)
+    )
+    FROM (SELECT 1) one
+    LEFT JOIN LATERAL (
+        SELECT id, total_count, total_amount, qr_payment
+        FROM public.order_list
+        WHERE from_id = p_from_id AND status = 'pending'
+        ORDER BY id DESC
+        LIMIT 1
+    ) ol ON TRUE
+$$ LANGUAGE sql STABLE;
+
+-- Tạo/gộp, cập nhật hoặc xóa sản phẩm trong giỏ hàng trong một lần gọi, trả về giỏ hàng sau thay đổi
+CREATE OR REPLACE FUNCTION cart_apply(p_from_id TEXT, p_insurance_id BIGINT, p_op TEXT, p_qty INTEGER DEFAULT NULL)
+RETURNS JSONB AS $$
+DECLARE
+    v_list_id  BIGINT;
+    v_order_id BIGINT;
+    v_qty      INTEGER;
+    v_price    NUMERIC(20,2);
+    v_merged   BOOLEAN := FALSE;
+BEGIN
+    IF p_op NOT IN ('create', 'update', 'delete') THEN
+        RETURN jsonb_build_object('success', false, 'message', 'Invalid action: ' || p_op || '. Must be ''create'', ''update'', or ''delete''.');
+    END IF;
+
+    -- Các lệnh đồng thời trên cùng giỏ hàng phải xếp hàng, tránh tạo trùng dòng
+    PERFORM pg_advisory_xact_lock(hashtextextended('cart:' || p_from_id, 0));
+
+    SELECT o.id, o.qty, o.order_list_id INTO v_order_id, v_qty, v_list_id
+    FROM public.orders o
+    JOIN public.order_list ol ON ol.id = o.order_list_id
+    WHERE ol.from_id = p_from_id AND o.insurance_id = p_insurance_id AND o.status = 'pending'
+    LIMIT 1
+    FOR UPDATE OF o;
+
+    IF p_op = 'create' THEN
+        IF p_qty IS NULL OR p_qty <= 0 THEN
+            RETURN jsonb_build_object('success', false, 'message', 'Quantity must be a positive number for create action.');
+        END IF;
+        SELECT sum_insured INTO v_price FROM public.insurance_products WHERE insurance_id = p_insurance_id;
+        IF v_price IS NULL THEN
+            RETURN jsonb_build_object('success', false, 'message', 'Create failed, possibly invalid insurance_id');
+        END IF;
+
+        IF v_order_id IS NOT NULL THEN
+            v_merged := TRUE;
+            v_qty := v_qty + p_qty;
+            UPDATE public.orders SET qty = v_qty, amount = v_price * v_qty WHERE id = v_order_id;
+        ELSE
+            SELECT id INTO v_list_id
+            FROM public.order_list
+            WHERE from_id = p_from_id AND status = 'pending'
+            ORDER BY id DESC
+            LIMIT 1;
+            IF v_list_id IS NULL THEN
+                INSERT INTO public.infor_user (from_id) VALUES (p_from_id) ON CONFLICT (from_id) DO NOTHING;
+                INSERT INTO public.order_list (from_id, status, total_count)
+                VALUES (p_from_id, 'pending', 0)
+                RETURNING id INTO v_list_id;
+            END IF;
+            v_qty := p_qty;
+            -- Đã có order_list_id và amount nên ensure_order_list không phải tra cứu thêm
+            INSERT INTO public.orders (order_list_id, insurance_id, qty, amount, from_id)
+            VALUES (v_list_id, p_insurance_id, v_qty, v_price * v_qty, p_from_id)
+            RETURNING id INTO v_order_id;
+        END IF;
+
+    ELSIF v_order_id IS NULL THEN
+        RETURN jsonb_build_object('success', false, 'message', 'Order not found or not pending');
+
+    ELSIF p_op = 'update' THEN
+        IF p_qty IS NULL THEN
+            RETURN jsonb_build_object('success', false, 'message', 'quantity_change is required for update action.');
+        END IF;
+        v_qty := GREATEST(0, v_qty + p_qty);
+        IF v_qty = 0 THEN
+            DELETE FROM public.orders WHERE id = v_order_id;
+        ELSE
+            UPDATE public.orders o
+            SET qty = v_qty, amount = ip.sum_insured * v_qty
+            FROM public.insurance_products ip
+            WHERE o.id = v_order_id AND ip.insurance_id = o.insurance_id;
+        END IF;
+
+    ELSE
+        v_qty := 0;
+        DELETE FROM public.orders WHERE id = v_order_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'action', p_op,
+        'merged', v_merged,
+        'order_id', v_order_id,
+        'insurance_id', p_insurance_id,
+        'quantity', v_qty,
+        'cart', COALESCE(
+            cart_snapshot(p_from_id),
+            jsonb_build_object('order_list_id', NULL, 'total_count', 0, 'total_amount', 0, 'qr_payment', NULL, 'items', '[]'::jsonb)
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tăng phiên bản giỏ hàng của người dùng khi đơn hàng hoặc trạng thái giỏ thay đổi
+CREATE OR REPLACE FUNCTION bump_cart_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.infor_user
+    SET cart_version = cart_version + 1
+    WHERE from_id = COALESCE(NEW.from_id, OLD.from_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_insurance_catalog_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Delivered on commit; listeners reload the whole catalog, so no payload is needed.
+    PERFORM pg_notify('insurance_catalog_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Tạo bảng để lưu trữ ký ức (memories)
 CREATE TABLE IF NOT EXISTS
   public.documents (
@@ -279,7 +561,7 @@ CREATE TRIGGER ensure_order_list_trigger
 
 DROP TRIGGER IF EXISTS order_update_trigger ON public.orders;
 CREATE TRIGGER order_update_trigger
-    AFTER INSERT OR UPDATE OR DELETE ON public.orders
+    AFTER INSERT OR DELETE OR UPDATE OF qty, amount, order_list_id ON public.orders
     FOR EACH ROW EXECUTE FUNCTION update_order_totals();
 
 -- << TRIGGER ĐÃ ĐƯỢC SỬA LỖI >>
@@ -295,6 +577,22 @@ CREATE TRIGGER recalc_order_amount_trigger
     FOR EACH ROW EXECUTE FUNCTION recalc_order_amount();
 
 
+DROP TRIGGER IF EXISTS orders_cart_version_trigger ON public.orders;
+CREATE TRIGGER orders_cart_version_trigger
+    AFTER INSERT OR DELETE OR UPDATE ON public.orders
+    FOR EACH ROW EXECUTE FUNCTION bump_cart_version();
+
+DROP TRIGGER IF EXISTS order_list_cart_version_trigger ON public.order_list;
+CREATE TRIGGER order_list_cart_version_trigger
+    AFTER UPDATE OF status ON public.order_list
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION bump_cart_version();
+
+DROP TRIGGER IF EXISTS insurance_catalog_notify_trigger ON public.insurance_products;
+CREATE TRIGGER insurance_catalog_notify_trigger
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.insurance_products
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_insurance_catalog_changed();
+
 -- Chèn dữ liệu sản phẩm mẫu
 INSERT INTO public.insurance_products (insurance_name, insurance_type, sum_insured, term) VALUES
 ('Bảo hiểm sức khỏe Vàng', 'health', 10000.00, '1 năm'),
@@ -0,0 +1,16 @@
+-- Notify app processes holding the in-process catalog cache (src/database/catalog_cache.py)
+-- whenever insurance_products changes.
+
+CREATE OR REPLACE FUNCTION notify_insurance_catalog_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Delivered on commit; listeners reload the whole catalog, so no payload is needed.
+    PERFORM pg_notify('insurance_catalog_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS insurance_catalog_notify_trigger ON public.insurance_products;
+CREATE TRIGGER insurance_catalog_notify_trigger
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.insurance_products
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_insurance_catalog_changed();
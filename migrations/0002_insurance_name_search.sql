@@ -0,0 +1,20 @@
+-- Accent-insensitive, typo-tolerant product name search.
+-- insurance_products.name_search holds the lowercased, unaccented name and carries a
+-- GIN trigram index, which serves both LIKE '%...%' and the word-similarity operator.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() is only STABLE (it resolves its dictionary through search_path), so it cannot
+-- back a generated column or an index. Pinning the dictionary makes the wrapper IMMUTABLE.
+CREATE OR REPLACE FUNCTION public.immutable_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+ALTER TABLE public.insurance_products
+    ADD COLUMN IF NOT EXISTS name_search TEXT
+    GENERATED ALWAYS AS (lower(public.immutable_unaccent(insurance_name))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_insurance_products_name_search_trgm
+    ON public.insurance_products USING gin (name_search gin_trgm_ops);
@@ -0,0 +1,56 @@
+-- Maintain order_list.total_count / total_amount by deltas instead of re-aggregating the
+-- whole cart on every orders change. Each mutation now touches one order_list row (two
+-- when an order moves between lists) and reads no other orders.
+-- Run `python -m src.database.order_totals_check` afterwards to verify existing totals.
+
+-- A new cart starts empty; the AFTER INSERT trigger on orders adds the first item.
+ALTER TABLE public.order_list ALTER COLUMN total_count SET DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION apply_order_list_delta(p_order_list_id BIGINT, p_qty INTEGER, p_amount NUMERIC)
+RETURNS VOID AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_order_list_id IS NULL OR (p_qty = 0 AND p_amount = 0) THEN
+        RETURN;
+    END IF;
+
+    -- The row lock taken here serializes concurrent changes to the same cart, so
+    -- increments never get lost the way two racing SUM()s could.
+    UPDATE public.order_list
+    SET total_count = total_count + p_qty,
+        total_amount = total_amount + p_amount,
+        qr_payment = 'https://qr.sepay.vn/img?acc=0395695023&bank=VPBank&amount=' || (total_amount + p_amount)::INTEGER::text || '&des=TKPS2E+DH' || id::text,
+        updated_at = now()
+    WHERE id = p_order_list_id
+    RETURNING total_count INTO v_count;
+
+    IF v_count <= 0 THEN
+        DELETE FROM public.order_list WHERE id = p_order_list_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_order_totals()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty, NEW.amount);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_order_list_delta(OLD.order_list_id, -OLD.qty, -OLD.amount);
+    ELSIF OLD.order_list_id IS DISTINCT FROM NEW.order_list_id THEN
+        PERFORM apply_order_list_delta(OLD.order_list_id, -OLD.qty, -OLD.amount);
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty, NEW.amount);
+    ELSE
+        PERFORM apply_order_list_delta(NEW.order_list_id, NEW.qty - OLD.qty, NEW.amount - OLD.amount);
+    END IF;
+
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Status-only updates cannot change the totals, so they no longer fire the trigger.
+DROP TRIGGER IF EXISTS order_update_trigger ON public.orders;
+CREATE TRIGGER order_update_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF qty, amount, order_list_id ON public.orders
+    FOR EACH ROW EXECUTE FUNCTION update_order_totals();
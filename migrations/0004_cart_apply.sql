@@ -0,0 +1,127 @@
+-- One-call cart mutation for the manage_order tool: create/merge, update or delete an item
+-- and return the resulting cart, so the tool needs a single round trip and the model does not
+-- have to call view_orders afterwards.
+
+-- Current pending cart of a user as JSON, or NULL when there is none.
+CREATE OR REPLACE FUNCTION cart_snapshot(p_from_id TEXT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'order_list_id', ol.id,
+        'total_count', ol.total_count,
+        'total_amount', ol.total_amount,
+        'qr_payment', ol.qr_payment,
+        'items', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'order_id', o.id,
+                'insurance_id', o.insurance_id,
+                'insurance_name', ip.insurance_name,
+                'quantity', o.qty,
+                'unit_price', ip.sum_insured,
+                'amount', o.amount,
+                'term', ip.term
+            ) ORDER BY o.created_at DESC)
+            FROM public.orders o
+            JOIN public.insurance_products ip ON ip.insurance_id = o.insurance_id
+            WHERE o.order_list_id = ol.id AND o.status = 'pending'
+        ), '[]'::jsonb)
+    )
+    FROM public.order_list ol
+    WHERE ol.from_id = p_from_id AND ol.status = 'pending'
+    ORDER BY ol.id DESC
+    LIMIT 1
+$$ LANGUAGE sql STABLE;
+
+-- p_op is 'create' (p_qty items, merged into an existing line), 'update' (p_qty is the change;
+-- the line is removed when it reaches zero) or 'delete'. Totals and the QR link are kept by
+-- update_order_totals, so the snapshot returned already reflects the change.
+CREATE OR REPLACE FUNCTION cart_apply(p_from_id TEXT, p_insurance_id BIGINT, p_op TEXT, p_qty INTEGER DEFAULT NULL)
+RETURNS JSONB AS $$
+DECLARE
+    v_list_id  BIGINT;
+    v_order_id BIGINT;
+    v_qty      INTEGER;
+    v_price    NUMERIC(20,2);
+    v_merged   BOOLEAN := FALSE;
+BEGIN
+    IF p_op NOT IN ('create', 'update', 'delete') THEN
+        RETURN jsonb_build_object('success', false, 'message', 'Invalid action: ' || p_op || '. Must be ''create'', ''update'', or ''delete''.');
+    END IF;
+
+    -- Racing calls for the same cart queue up instead of inserting duplicate lines.
+    PERFORM pg_advisory_xact_lock(hashtextextended('cart:' || p_from_id, 0));
+
+    SELECT o.id, o.qty, o.order_list_id INTO v_order_id, v_qty, v_list_id
+    FROM public.orders o
+    JOIN public.order_list ol ON ol.id = o.order_list_id
+    WHERE ol.from_id = p_from_id AND o.insurance_id = p_insurance_id AND o.status = 'pending'
+    LIMIT 1
+    FOR UPDATE OF o;
+
+    IF p_op = 'create' THEN
+        IF p_qty IS NULL OR p_qty <= 0 THEN
+            RETURN jsonb_build_object('success', false, 'message', 'Quantity must be a positive number for create action.');
+        END IF;
+        SELECT sum_insured INTO v_price FROM public.insurance_products WHERE insurance_id = p_insurance_id;
+        IF v_price IS NULL THEN
+            RETURN jsonb_build_object('success', false, 'message', 'Create failed, possibly invalid insurance_id');
+        END IF;
+
+        IF v_order_id IS NOT NULL THEN
+            v_merged := TRUE;
+            v_qty := v_qty + p_qty;
+            UPDATE public.orders SET qty = v_qty, amount = v_price * v_qty WHERE id = v_order_id;
+        ELSE
+            SELECT id INTO v_list_id
+            FROM public.order_list
+            WHERE from_id = p_from_id AND status = 'pending'
+            ORDER BY id DESC
+            LIMIT 1;
+            IF v_list_id IS NULL THEN
+                INSERT INTO public.infor_user (from_id) VALUES (p_from_id) ON CONFLICT (from_id) DO NOTHING;
+                INSERT INTO public.order_list (from_id, status, total_count)
+                VALUES (p_from_id, 'pending', 0)
+                RETURNING id INTO v_list_id;
+            END IF;
+            v_qty := p_qty;
+            -- order_list_id and amount are set, so ensure_order_list has nothing to look up.
+            INSERT INTO public.orders (order_list_id, insurance_id, qty, amount, from_id)
+            VALUES (v_list_id, p_insurance_id, v_qty, v_price * v_qty, p_from_id)
+            RETURNING id INTO v_order_id;
+        END IF;
+
+    ELSIF v_order_id IS NULL THEN
+        RETURN jsonb_build_object('success', false, 'message', 'Order not found or not pending');
+
+    ELSIF p_op = 'update' THEN
+        IF p_qty IS NULL THEN
+            RETURN jsonb_build_object('success', false, 'message', 'quantity_change is required for update action.');
+        END IF;
+        v_qty := GREATEST(0, v_qty + p_qty);
+        IF v_qty = 0 THEN
+            DELETE FROM public.orders WHERE id = v_order_id;
+        ELSE
+            UPDATE public.orders o
+            SET qty = v_qty, amount = ip.sum_insured * v_qty
+            FROM public.insurance_products ip
+            WHERE o.id = v_order_id AND ip.insurance_id = o.insurance_id;
+        END IF;
+
+    ELSE
+        v_qty := 0;
+        DELETE FROM public.orders WHERE id = v_order_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'action', p_op,
+        'merged', v_merged,
+        'order_id', v_order_id,
+        'insurance_id', p_insurance_id,
+        'quantity', v_qty,
+        'cart', COALESCE(
+            cart_snapshot(p_from_id),
+            jsonb_build_object('order_list_id', NULL, 'total_count', 0, 'total_amount', 0, 'qr_payment', NULL, 'items', '[]'::jsonb)
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
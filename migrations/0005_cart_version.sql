@@ -0,0 +1,65 @@
+-- Per-user cart version for the Redis cart cache (src/database/cart_cache.py). Every change
+-- that can alter what view_orders shows bumps it in the same transaction, and snapshots carry
+-- the version they were read at, so the cache can refuse a snapshot older than the one it holds.
+
+ALTER TABLE public.infor_user ADD COLUMN IF NOT EXISTS cart_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_cart_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.infor_user
+    SET cart_version = cart_version + 1
+    WHERE from_id = COALESCE(NEW.from_id, OLD.from_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_cart_version_trigger ON public.orders;
+CREATE TRIGGER orders_cart_version_trigger
+    AFTER INSERT OR DELETE OR UPDATE ON public.orders
+    FOR EACH ROW EXECUTE FUNCTION bump_cart_version();
+
+-- Totals changes come from the orders trigger and are already counted; a status change
+-- (e.g. a paid cart leaving 'pending') is not.
+DROP TRIGGER IF EXISTS order_list_cart_version_trigger ON public.order_list;
+CREATE TRIGGER order_list_cart_version_trigger
+    AFTER UPDATE OF status ON public.order_list
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION bump_cart_version();
+
+-- The pending cart with the version it was read at; an empty cart when there is none.
+CREATE OR REPLACE FUNCTION cart_snapshot(p_from_id TEXT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'cart_version', COALESCE((SELECT cart_version FROM public.infor_user WHERE from_id = p_from_id), 0),
+        'order_list_id', ol.id,
+        'total_count', COALESCE(ol.total_count, 0),
+        'total_amount', COALESCE(ol.total_amount, 0),
+        'qr_payment', ol.qr_payment,
+        'items', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'order_id', o.id,
+                'insurance_id', o.insurance_id,
+                'insurance_name', ip.insurance_name,
+                'quantity', o.qty,
+                'unit_price', ip.sum_insured,
+                'sum_insured', ip.sum_insured,
+                'amount', o.amount,
+                'term', ip.term,
+                'status', o.status,
+                'created_at', o.created_at
+            ) ORDER BY o.created_at DESC)
+            FROM public.orders o
+            JOIN public.insurance_products ip ON ip.insurance_id = o.insurance_id
+            WHERE o.order_list_id = ol.id AND o.status = 'pending'
+        ), '[]'::jsonb)
+    )
+    FROM (SELECT 1) one
+    LEFT JOIN LATERAL (
+        SELECT id, total_count, total_amount, qr_payment
+        FROM public.order_list
+        WHERE from_id = p_from_id AND status = 'pending'
+        ORDER BY id DESC
+        LIMIT 1
+    ) ol ON TRUE
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,60 @@
+-- Follow-up scheduler state (src/services/followup_scheduler.py).
+-- user_feedback holds one row per paid cart once a worker claims it: the claim lease keeps
+-- other workers off it while the message is sent, and follow_up_sent marks it done.
+-- followup_progress stores each job's keyset cursor so a restart resumes mid-pass.
+
+CREATE TABLE IF NOT EXISTS public.user_feedback (
+    id                BIGSERIAL PRIMARY KEY,
+    order_list_id     BIGINT NOT NULL UNIQUE REFERENCES public.order_list(id) ON DELETE CASCADE,
+    from_id           TEXT NOT NULL,
+    follow_up_sent    BOOLEAN NOT NULL DEFAULT FALSE,
+    follow_up_sent_at TIMESTAMPTZ,
+    claimed_until     TIMESTAMPTZ,
+    attempts          INTEGER NOT NULL DEFAULT 0,
+    last_error        TEXT,
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Databases deployed before this migration already have user_feedback with only
+-- (id, order_list_id, follow_up_sent); bring them to the shape above.
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS from_id TEXT;
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS follow_up_sent_at TIMESTAMPTZ;
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS last_error TEXT;
+ALTER TABLE public.user_feedback ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+UPDATE public.user_feedback SET follow_up_sent = FALSE WHERE follow_up_sent IS NULL;
+ALTER TABLE public.user_feedback ALTER COLUMN follow_up_sent SET DEFAULT FALSE;
+ALTER TABLE public.user_feedback ALTER COLUMN follow_up_sent SET NOT NULL;
+
+-- The claim upserts ON CONFLICT (order_list_id). Older rows may repeat a cart; keep one
+-- per cart, preferring the one recording a sent follow-up.
+DELETE FROM public.user_feedback uf
+USING public.user_feedback keep
+WHERE keep.order_list_id = uf.order_list_id
+  AND (keep.follow_up_sent, -keep.id) > (uf.follow_up_sent, -uf.id);
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attname = 'order_list_id'
+        WHERE i.indrelid = 'public.user_feedback'::regclass
+          AND i.indisunique
+          AND i.indkey::text = a.attnum::text
+    ) THEN
+        CREATE UNIQUE INDEX idx_user_feedback_order_list ON public.user_feedback (order_list_id);
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS public.followup_progress (
+    job             TEXT PRIMARY KEY,
+    last_created_at TIMESTAMPTZ,
+    last_id         BIGINT,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Serves the keyset scan over paid carts in (created_at, id) order.
+CREATE INDEX IF NOT EXISTS idx_order_list_success_created
+    ON public.order_list (created_at, id)
+    WHERE status = 'success';
@@ -0,0 +1,31 @@
+-- migrate: no-transaction
+-- Secondary indexes for the per-user cart and history lookups, which until now scanned
+-- orders, order_list and chat_histories in full. Built CONCURRENTLY so live tables keep
+-- taking writes. If a build fails it leaves an INVALID index that IF NOT EXISTS would
+-- skip: drop it before running the migration again.
+-- Check the plans with `python -m benchmarks.check_query_plans`.
+
+-- Items of a cart: cart_snapshot, fetch_orders/view_orders joins, the totals repair and the
+-- ON DELETE CASCADE from order_list.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_order_list_id
+    ON public.orders (order_list_id);
+
+-- A user's cart by status, newest first (fetch_order_list, fetch_orders). The status is a
+-- bound parameter there, so this cannot be a partial index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_list_from_status
+    ON public.order_list (from_id, status, id DESC);
+
+-- Pending lines of a cart, by product: the existing-line lookups in ensure_order_list,
+-- cart_apply and get_existing_orders, and the items of cart_snapshot. Those queries reach
+-- orders through the cart rather than orders.from_id, so the cart id leads.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_pending_list_insurance
+    ON public.orders (order_list_id, insurance_id)
+    WHERE status = 'pending';
+
+-- Loading a user's chat history in order.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_histories_from_created
+    ON public.chat_histories (from_id, created_at);
+
+ANALYZE public.orders;
+ANALYZE public.order_list;
+ANALYZE public.chat_histories;
@@ -0,0 +1,84 @@
+-- Monthly range partitions on chat_histories.created_at. Recent-history reads prune to the
+-- newest partitions, and old months are detached and archived whole by
+-- `python -m src.database.chat_history_retention` instead of being deleted row by row.
+-- The existing rows are copied in this transaction, which locks chat_histories for as long
+-- as the copy takes; run it in a quiet window on large tables.
+
+-- Partition keys must be part of every unique constraint, so message_id is now unique per
+-- created_at. The write-behind sink stamps created_at once per message and reuses it on
+-- retries, so its ON CONFLICT merge stays idempotent.
+ALTER TABLE public.chat_histories RENAME TO chat_histories_unpartitioned;
+ALTER INDEX IF EXISTS public.idx_chat_histories_from_created RENAME TO idx_chat_histories_unpartitioned_from_created;
+-- Free the constraint (and index) names for the new table.
+DO $$
+DECLARE
+    c RECORD;
+BEGIN
+    FOR c IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = 'public.chat_histories_unpartitioned'::regclass AND contype IN ('p', 'u')
+    LOOP
+        EXECUTE format('ALTER TABLE public.chat_histories_unpartitioned RENAME CONSTRAINT %I TO %I',
+                       c.conname, replace(c.conname, 'chat_histories', 'chat_histories_unpartitioned'));
+    END LOOP;
+END;
+$$;
+
+CREATE TABLE public.chat_histories (
+    id          BIGINT NOT NULL DEFAULT nextval('public.chat_histories_id_seq'),
+    is_bot      BOOLEAN NOT NULL DEFAULT FALSE,
+    d_name      TEXT,
+    message_id  TEXT NOT NULL,
+    text        TEXT,
+    from_id     TEXT,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at),
+    UNIQUE (message_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE public.chat_histories_id_seq OWNED BY public.chat_histories.id;
+
+CREATE INDEX idx_chat_histories_from_created ON public.chat_histories (from_id, created_at);
+
+-- Creates the monthly partitions covering [p_from, p_to]; existing ones are left alone.
+-- Called by the sink before each flush, so writes never land on a missing month.
+CREATE OR REPLACE FUNCTION ensure_chat_history_partitions(p_from TIMESTAMPTZ, p_to TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month   DATE := date_trunc('month', p_from AT TIME ZONE 'UTC')::date;
+    v_name    TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= (p_to AT TIME ZONE 'UTC')::date LOOP
+        v_name := 'chat_histories_p' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            -- Two writers may reach a new month together; the second one waits here.
+            PERFORM pg_advisory_xact_lock(hashtextextended('chat_histories_partition:' || v_name, 0));
+            IF to_regclass('public.' || v_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.chat_histories FOR VALUES FROM (%L) TO (%L)',
+                    v_name,
+                    (v_month::timestamp AT TIME ZONE 'UTC'),
+                    ((v_month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC')
+                );
+                v_created := v_created + 1;
+            END IF;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_chat_history_partitions(
+    COALESCE((SELECT min(created_at) FROM public.chat_histories_unpartitioned), now()),
+    now() + INTERVAL '1 month'
+);
+
+INSERT INTO public.chat_histories (id, is_bot, d_name, message_id, text, from_id, created_at)
+SELECT id, is_bot, d_name, message_id, text, from_id, created_at
+FROM public.chat_histories_unpartitioned;
+
+DROP TABLE public.chat_histories_unpartitioned;
+
+ANALYZE public.chat_histories;
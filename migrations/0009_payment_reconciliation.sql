@@ -0,0 +1,27 @@
+-- Bank transfers ingested by the payment reconciliation (src/services/payment_reconciliation.py).
+-- One row per bank transaction id, so a webhook retry or a re-imported statement is a no-op.
+-- match_status records what the transfer did:
+--   matched       paid a pending cart, which is now 'completed'
+--   underpaid     smaller than the cart total; the cart is flagged human_check for review
+--   already_paid  the cart was no longer pending
+--   unmatched     no DH<id> reference, or no such cart
+
+CREATE TABLE IF NOT EXISTS public.bank_transactions (
+    transaction_id  TEXT PRIMARY KEY,
+    gateway         TEXT,
+    amount          NUMERIC(20,2) NOT NULL,
+    content         TEXT,
+    transferred_at  TIMESTAMPTZ,
+    order_list_id   BIGINT REFERENCES public.order_list(id) ON DELETE SET NULL,
+    match_status    TEXT NOT NULL CHECK (match_status IN ('matched', 'underpaid', 'already_paid', 'unmatched')),
+    received_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_bank_transactions_order_list
+    ON public.bank_transactions (order_list_id);
+
+-- Carts paid through reconciliation are 'completed'; the follow-up scan covers them too.
+DROP INDEX IF EXISTS public.idx_order_list_success_created;
+CREATE INDEX IF NOT EXISTS idx_order_list_paid_created
+    ON public.order_list (created_at, id)
+    WHERE status IN ('success', 'completed');
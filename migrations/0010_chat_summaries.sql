@@ -0,0 +1,12 @@
+-- Persisted conversation summaries (src/agent/middleware/chat_history.py). Each user keeps
+-- their latest checkpoint: the summary plus the (created_at, message_id) of the last
+-- chat_histories message it covers. A cold load reads the checkpoint and only the messages
+-- after it, instead of the whole history.
+
+CREATE TABLE IF NOT EXISTS public.chat_summaries (
+    from_id          TEXT PRIMARY KEY,
+    summary          TEXT NOT NULL,
+    last_message_at  TIMESTAMPTZ NOT NULL,
+    last_message_id  TEXT NOT NULL,
+    updated_at       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
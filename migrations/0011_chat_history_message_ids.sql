@@ -0,0 +1,17 @@
+-- Global idempotency key for chat_histories. Unique constraints on the partitioned table must
+-- include created_at, so UNIQUE (message_id, created_at) lets a message queued again (with a
+-- fresh created_at) in. The write-behind sink claims each message_id here first and only
+-- inserts the messages it claimed. Rows share the created_at of the chat_histories row, and
+-- retention deletes a month's ids when it archives that month's partition.
+
+CREATE TABLE IF NOT EXISTS public.chat_history_message_ids (
+    message_id  TEXT PRIMARY KEY,
+    created_at  TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_history_message_ids_created ON public.chat_history_message_ids (created_at);
+
+INSERT INTO public.chat_history_message_ids (message_id, created_at)
+SELECT message_id, min(created_at)
+FROM public.chat_histories
+GROUP BY message_id
+ON CONFLICT (message_id) DO NOTHING;
@@ -1,27 +1,91 @@
 import logging
-import json
-import asyncio
-import functools
-from typing import List, Optional
+from typing import List, Optional, Set
 from datetime import timedelta
 import uuid
 from langchain_core.messages import (
     AIMessage, HumanMessage, BaseMessage, SystemMessage, ToolMessage,
-    get_buffer_string, message_to_dict, messages_from_dict
+    get_buffer_string
 )
 from langchain_core.language_models import BaseChatModel
 
+from src.config import settings
+from src.database.chat_history_sink import chat_history_sink
 from src.database.connection import db_manager, redis_manager
+from src.database.replicas import ReadIntent
+from src.database.statements import register_statement
+from .message_codec import decode_message, encode_message
+from .token_budget import token_counter
 
 logger = logging.getLogger(__name__)
 
-def _serialize(msg: BaseMessage) -> str:
-    """Serializes a LangChain message to a JSON string."""
-    return json.dumps(message_to_dict(msg))
+# A user's summary checkpoint (if any) and the newest messages after it within the window,
+# in one round trip. The summary comes back as the row with is_bot NULL; messages come newest
+# first. The created_at bound lets the planner prune chat_histories to the latest monthly
+# partitions, and the (created_at, message_id) keyset skips everything the summary covers.
+LOAD_HISTORY_SQL = register_statement(
+    "chat_history.load",
+    """
+    WITH checkpoint AS (
+        SELECT summary, last_message_at, last_message_id
+        FROM public.chat_summaries
+        WHERE from_id = $1
+    )
+    SELECT NULL::text AS message_id, NULL::boolean AS is_bot, summary AS text FROM checkpoint
+    UNION ALL
+    SELECT * FROM (
+        SELECT h.message_id, h.is_bot, h.text
+        FROM public.chat_histories h
+        WHERE h.from_id = $1
+          AND h.created_at >= GREATEST(now() - $2::interval, (SELECT last_message_at FROM checkpoint))
+          AND NOT EXISTS (
+              SELECT 1 FROM checkpoint c
+              WHERE (h.created_at, h.message_id) <= (c.last_message_at, c.last_message_id)
+          )
+        ORDER BY h.created_at DESC, h.message_id DESC
+        LIMIT $3
+    ) recent
+    """,
+)
+# Keyed by the stored (created_at, message_id) of the last summarized message; an older
+# summary finishing late never replaces a newer checkpoint.
+SAVE_CHECKPOINT_SQL = register_statement(
+    "chat_history.save_checkpoint",
+    """
+    INSERT INTO public.chat_summaries (from_id, summary, last_message_at, last_message_id)
+    SELECT $1, $2, created_at, message_id
+    FROM public.chat_histories
+    WHERE message_id = $3 AND from_id = $1
+    ORDER BY created_at DESC
+    LIMIT 1
+    ON CONFLICT (from_id) DO UPDATE
+    SET summary = EXCLUDED.summary,
+        last_message_at = EXCLUDED.last_message_at,
+        last_message_id = EXCLUDED.last_message_id,
+        updated_at = now()
+    WHERE (chat_summaries.last_message_at, chat_summaries.last_message_id)
+        < (EXCLUDED.last_message_at, EXCLUDED.last_message_id)
+    """,
+)
+SUMMARY_PREFIX = "Summary of previous conversation: "
 
-def _deserialize(s: str) -> BaseMessage:
-    """Deserializes a JSON string back to a LangChain message."""
-    return messages_from_dict([json.loads(s)])[0]
+# The cached list is newest first, so the oldest messages are at its tail. Trimming them and
+# pushing the summary there leaves anything LPUSHed since the summary was started in place.
+# ARGV[5] is the entry the run read as its newest summarized message: if the list was
+# rewritten meanwhile (a cold load priming it on another worker), the entry `count` from the
+# tail differs and nothing is trimmed.
+_REPLACE_SUMMARIZED_LUA = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+local count = tonumber(ARGV[2])
+if redis.call('LINDEX', KEYS[1], -count) ~= ARGV[5] then
+    return 0
+end
+redis.call('LTRIM', KEYS[1], 0, -(count + 1))
+redis.call('RPUSH', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
 
 def _filter_messages(messages: List[BaseMessage]) -> List[BaseMessage]:
     """Filters out messages that should not be stored in history."""
@@ -47,7 +111,11 @@ class ChatMessageHistory:
         self.initial_summarization_threshold = initial_summarization_threshold
         self.summarization_interval = summarization_interval
         self.redis_key = f"chat_history:{self.user_id}"
+        self.summary_lease_key = f"chat_summary_lease:{self.user_id}"
         self.messages: List[BaseMessage] = []
+        # Every message id this history has loaded or stored, including ones since folded
+        # into a summary, so callers can tell which agent-state messages are new.
+        self.seen_ids: Set[str] = set()
 
     async def load_messages(self):
         """Loads messages from cache if available, otherwise from the database."""
@@ -56,81 +124,151 @@ class ChatMessageHistory:
             self.messages = cached_messages
         else:
             self.messages = await self._load_from_db()
+        self.seen_ids.update(m.id for m in self.messages if m.id)
+
+    def unseen(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """The messages this history has not loaded or stored yet. Identified by id rather
+        than position, since a background summary may shorten `self.messages` at any time."""
+        return [
+            m for m in messages
+            if not isinstance(m, SystemMessage) and not (m.id and m.id in self.seen_ids)
+        ]
 
     async def add_messages(self, messages: List[BaseMessage]):
         """Adds new messages to the history and persists them."""
         filtered_messages = _filter_messages(messages)
+        # Skipped ones (tool traffic, empty messages) count as seen too.
+        self.seen_ids.update(m.id for m in messages if m.id)
         if not filtered_messages:
             return
 
         self.messages.extend(filtered_messages)
         await self._save_to_db(filtered_messages)
+        self.seen_ids.update(m.id for m in filtered_messages)
         await self._save_to_cache(filtered_messages)
 
-    async def summarize_if_needed(self):
-        """
-        Checks if the conversation history needs summarization and performs it if so.
-        Uses the in-memory message list instead of re-fetching from cache.
-        """
-        if not self.messages:
-            return
-
-        summary_message = self.messages[0] if isinstance(self.messages[0], SystemMessage) else None
-        messages_since_summary = self.messages[1:] if summary_message else self.messages
-        
-        should_summarize = (
+    def needs_summary(self, messages: List[BaseMessage]) -> bool:
+        if not messages:
+            return False
+        summary_message = messages[0] if isinstance(messages[0], SystemMessage) else None
+        messages_since_summary = messages[1:] if summary_message else messages
+        return (
             (not summary_message and len(messages_since_summary) >= self.initial_summarization_threshold) or
-            (summary_message and len(messages_since_summary) >= self.summarization_interval)
+            (summary_message and len(messages_since_summary) >= self.summarization_interval) or
+            # A few long messages can outgrow the prompt budget well before the count triggers.
+            (len(messages_since_summary) > 2 and
+             token_counter.count_messages(messages) > settings.history_summary_tokens)
         )
 
-        if not should_summarize:
-            return
+    async def summarize_if_needed(self, lease_token: Optional[str] = None) -> bool:
+        """
+        Summarizes the history if it needs it; returns whether a summary was stored.
+
+        Works from the shared Redis list rather than this instance's copy, which another
+        worker may have summarized already. Runs go through summary_coordinator, which holds
+        the user's summary lease (`lease_token`) for the duration; the cache is then only
+        rewritten while that lease is still ours, and only the summarized oldest messages are
+        replaced, so messages appended during the LLM call are kept.
+        """
+        raw_entries = await self._read_cache()
+        if lease_token is not None and not raw_entries:
+            # Under the lease only the cached list is rewritten; with nothing cached the
+            # summary could never be stored, so don't pay for the LLM call.
+            return False
+        # Not filtered, so positions match the cached list.
+        messages = [decode_message(r) for r in reversed(raw_entries)] if raw_entries else list(self.messages)
+        if not self.needs_summary(messages):
+            return False
 
         logger.info(f"Background summarization triggered for thread '{self.redis_key}'.")
         try:
             # Keep the last 2 messages out of the summary for context
-            last_few_messages = self.messages[-2:]
-            messages_to_summarize = self.messages[:-2]
+            messages_to_summarize = messages[:-2]
 
             history_text = get_buffer_string(messages_to_summarize)
             summary_prompt = f"Condense the following conversation into a concise summary:\n\n{history_text}\n\nSummary:"
             
             summary_response = await self.summary_llm.ainvoke(summary_prompt)
             summary_text = str(summary_response.content)
+            summary_message = SystemMessage(content=f"{SUMMARY_PREFIX}{summary_text}")
 
-            new_messages_state = [SystemMessage(content=f"Summary of previous conversation: {summary_text}")] + last_few_messages
-            
-            self.messages = new_messages_state
-            await self._overwrite_cache(new_messages_state)
+            count = len(messages_to_summarize)
+            if lease_token is not None and not await self._replace_summarized(
+                count, raw_entries[-count], summary_message, lease_token
+            ):
+                logger.info(f"Discarded summary for '{self.redis_key}': lease lost or cache changed meanwhile.")
+                return False
+
+            summarized_ids = {m.id for m in messages_to_summarize if m.id}
+            self.messages = [summary_message] + [
+                m for m in self.messages if not isinstance(m, SystemMessage) and m.id not in summarized_ids
+            ]
+            if lease_token is None:
+                await self._overwrite_cache(self.messages)
+            await self._save_checkpoint(summary_text, messages_to_summarize)
             
             logger.info(f"Background Redis cache update for '{self.redis_key}' with new summary successful.")
+            return True
         except Exception as e:
             logger.error(f"Error during background summarization for user '{self.user_id}': {e}", exc_info=True)
+            return False
 
-    async def _run_sync(self, func, *args, **kwargs):
-        """Runs a synchronous function in an executor."""
-        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+    async def _replace_summarized(
+        self, count: int, newest_summarized: bytes, summary_message: BaseMessage, lease_token: str
+    ) -> bool:
+        """Swaps the `count` oldest cached messages for the summary, if the lease is still ours
+        and the newest of them is still the entry `newest_summarized`."""
+        async with redis_manager.guard():
+            client = redis_manager.client
+            script = client.register_script(_REPLACE_SUMMARIZED_LUA)
+            replaced = await script(
+                keys=[self.redis_key, self.summary_lease_key],
+                args=[
+                    lease_token, count, encode_message(summary_message),
+                    int(timedelta(hours=24).total_seconds()), newest_summarized,
+                ],
+                client=client,
+            )
+        return bool(replaced)
+
+    async def _read_cache(self) -> List[bytes]:
+        """The raw cached entries, newest first; empty when missing or unreachable."""
+        try:
+            async with redis_manager.guard():
+                return await redis_manager.client.lrange(self.redis_key, 0, -1)
+        except Exception as e:
+            logger.error(f"Error loading from Redis for key '{self.redis_key}': {e}", exc_info=True)
+            return []
 
     async def _load_from_cache(self) -> List[BaseMessage]:
         """Loads message history from Redis cache."""
+        raw_messages = await self._read_cache()
+        if not raw_messages:
+            return []
+        logger.info(f"Cache HIT for key '{self.redis_key}'. Loading {len(raw_messages)} messages.")
         try:
-            raw_messages = await self._run_sync(redis_manager.client.lrange, self.redis_key, 0, -1)
-            if raw_messages:
-                logger.info(f"Cache HIT for key '{self.redis_key}'. Loading {len(raw_messages)} messages.")
-                # Deserialize and filter messages in one go
-                return _filter_messages([_deserialize(m) for m in reversed(raw_messages)])
+            # Deserialize and filter messages in one go
+            return _filter_messages([decode_message(m) for m in reversed(raw_messages)])
         except Exception as e:
-            logger.error(f"Error loading from Redis for key '{self.redis_key}': {e}", exc_info=True)
-        return []
+            logger.error(f"Error decoding cached history for key '{self.redis_key}': {e}", exc_info=True)
+            return []
 
     async def _load_from_db(self) -> List[BaseMessage]:
         """Loads message history from PostgreSQL database."""
         logger.info(f"Cache MISS for key '{self.redis_key}'. Loading from PostgreSQL.")
         try:
             rows = await db_manager.fetch_all(
-                "SELECT is_bot, text FROM public.chat_histories WHERE from_id = $1 ORDER BY created_at ASC", [self.user_id]
+                LOAD_HISTORY_SQL,
+                [self.user_id, timedelta(days=settings.chat_history_load_days), settings.chat_history_load_limit],
+                intent=ReadIntent.REPLICA, sticky_key=self.user_id,
             )
-            messages = [AIMessage(content=r['text']) if r['is_bot'] else HumanMessage(content=r['text']) for r in rows]
+            summary = [SystemMessage(content=f"{SUMMARY_PREFIX}{r['text']}") for r in rows if r['is_bot'] is None]
+            recent = [r for r in rows if r['is_bot'] is not None]
+            messages = summary + [
+                AIMessage(content=r['text'], id=r['message_id']) if r['is_bot']
+                else HumanMessage(content=r['text'], id=r['message_id'])
+                for r in reversed(recent)
+            ]
 
             filtered_messages = _filter_messages(messages)
             if filtered_messages:
@@ -142,46 +280,60 @@ class ChatMessageHistory:
             return []
 
     async def _save_to_db(self, messages: List[BaseMessage]):
-        """Saves a list of messages to the database using a single bulk insert."""
+        """Queues messages on the shared write-behind sink, which bulk-writes them
+        to the database shortly after."""
         if not messages:
             return
 
-        query = """
-            INSERT INTO public.chat_histories (is_bot, message_id, text, from_id)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (message_id) DO NOTHING
-        """
-
         # Prepare all records for bulk insert
         records_to_insert = []
         for m in messages:
-            message_id = str(m.id) if hasattr(m, "id") and m.id else str(uuid.uuid4())
+            if not getattr(m, "id", None):
+                # Kept on the message so a later summary checkpoint can point at it.
+                m.id = str(uuid.uuid4())
+            message_id = str(m.id)
             is_bot = isinstance(m, AIMessage)
             text = str(m.content)
             records_to_insert.append((is_bot, message_id, text, self.user_id))
 
         try:
-            # Execute all inserts in a single transaction
-            await db_manager.execute_many(query, records_to_insert)
+            await chat_history_sink.enqueue(records_to_insert)
         except Exception as e:
             logger.error(f"Error saving to PostgreSQL for user '{self.user_id}': {e}", exc_info=True)
 
+    async def _save_checkpoint(self, summary_text: str, summarized: List[BaseMessage]):
+        """Persists the summary as covering `summarized` up to its last stored message."""
+        last = next((m for m in reversed(summarized) if not isinstance(m, SystemMessage) and m.id), None)
+        if last is None:
+            return
+        try:
+            # The message may still be queued on the write-behind sink.
+            await chat_history_sink.flush()
+            status = await db_manager.execute(SAVE_CHECKPOINT_SQL, [self.user_id, summary_text, str(last.id)])
+            if status == "INSERT 0 0":
+                logger.info(f"Summary checkpoint for user '{self.user_id}' not saved: a newer one exists or message {last.id} is not stored")
+        except Exception as e:
+            logger.error(f"Error saving summary checkpoint for user '{self.user_id}': {e}", exc_info=True)
+
     async def _save_to_cache(self, messages: List[BaseMessage]):
         """Saves messages to the Redis cache."""
         try:
-            pipe = redis_manager.client.pipeline()
-            for msg in reversed(messages):
-                pipe.lpush(self.redis_key, _serialize(msg))
-            pipe.expire(self.redis_key, timedelta(hours=24))
-            await self._run_sync(pipe.execute)
+            async with redis_manager.guard():
+                pipe = redis_manager.client.pipeline()
+                # Newest first: each LPUSH goes to the head, and loads read the list reversed.
+                for msg in messages:
+                    pipe.lpush(self.redis_key, encode_message(msg))
+                pipe.expire(self.redis_key, timedelta(hours=24))
+                await pipe.execute()
         except Exception as e:
             logger.error(f"Error saving to Redis for user '{self.user_id}': {e}", exc_info=True)
             
     async def _overwrite_cache(self, messages: List[BaseMessage]):
         """Overwrites the entire Redis cache with the provided messages."""
-        pipe = redis_manager.client.pipeline()
-        pipe.delete(self.redis_key)
-        for msg in reversed(messages):
-            pipe.lpush(self.redis_key, _serialize(msg))
-        pipe.expire(self.redis_key, timedelta(hours=24))
-        await self._run_sync(pipe.execute)
\ No newline at end of file
+        async with redis_manager.guard():
+            pipe = redis_manager.client.pipeline()
+            pipe.delete(self.redis_key)
+            for msg in messages:
+                pipe.lpush(self.redis_key, encode_message(msg))
+            pipe.expire(self.redis_key, timedelta(hours=24))
+            await pipe.execute()
\ No newline at end of file
@@ -1,13 +1,15 @@
 import logging
-import asyncio
 import json
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Optional, Dict
 
-from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
 from langchain_core.messages import get_buffer_string, AIMessage
 from langchain_core.runnables import RunnableConfig
 
 from .chat_history import ChatMessageHistory
+from .summary_coordinator import summary_coordinator
+from .token_budget import token_counter, trim_to_budget
+from src.config import settings
 from src.agent.tools.memory_tools import search_recall_memories
 
 logger = logging.getLogger(__name__)
@@ -58,7 +60,32 @@ class MemoryMiddleware(AgentMiddleware):
             state["recall_memories"] = "Chưa thể truy cập ký ức dài hạn."
         
         return state
-    
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        """Fits what the model sees into settings.context_token_budget.
+
+        System prompt and recall memories are measured first; history gets what is left,
+        newest first (see token_budget.trim_to_budget). Only the request is trimmed: the
+        agent state keeps every message, so after_model still finds the new ones.
+        """
+        system_prompt = request.system_prompt or ""
+        recall_memories = request.state.get("recall_memories") or ""
+        fixed_tokens = token_counter.count_text(system_prompt)
+        if recall_memories not in system_prompt:
+            fixed_tokens += token_counter.count_text(recall_memories)
+
+        history_budget = settings.context_token_budget - fixed_tokens
+        messages, dropped = trim_to_budget(request.messages, history_budget, token_counter)
+        if dropped:
+            logger.info(
+                f"Trimmed {dropped} of {len(request.messages)} messages to fit "
+                f"{settings.context_token_budget} prompt tokens ({fixed_tokens} system and recall)."
+            )
+            request = request.override(messages=messages)
+        return await handler(request)
+
     async def after_model(self, state: AgentState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         config = config or {}
         configurable_params = config.get("configurable", {})
@@ -66,12 +93,10 @@ class MemoryMiddleware(AgentMiddleware):
 
         if not history_manager:
             return state
-        new_messages = state["messages"][len(history_manager.messages):]
+        new_messages = history_manager.unseen(state["messages"])
 
         if new_messages:
             await history_manager.add_messages(new_messages)
-            
-            
-            asyncio.create_task(history_manager.summarize_if_needed())
+            summary_coordinator.schedule(history_manager)
                 
         return state
\ No newline at end of file
@@ -0,0 +1,71 @@
+import json
+import time
+from typing import Dict, Union
+
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, message_to_dict, messages_from_dict
+
+from src.config import settings
+
+# First byte of a compact entry; legacy entries are JSON objects and start with '{'.
+COMPACT_V1 = b"\x01"
+
+_COMPACT_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+
+class JsonMessageCodec:
+    """LangChain's own envelope (message_to_dict) as JSON: every field of the message,
+    including response and usage metadata. The format written before the compact codec."""
+
+    name = "json"
+
+    def encode(self, msg: BaseMessage) -> bytes:
+        return json.dumps(message_to_dict(msg)).encode("utf-8")
+
+    def decode(self, raw: bytes) -> BaseMessage:
+        return messages_from_dict([json.loads(raw)])[0]
+
+
+class CompactMessageCodec:
+    """Version byte plus an orjson array of [type, content, id, created_at ms].
+
+    Only what the history needs survives: model response and usage metadata are dropped,
+    and created_at (kept in response_metadata) is stamped when a message is first encoded.
+    Decoding constructs the message class directly instead of going through
+    messages_from_dict. Types outside human/ai/system fall back to the JSON codec.
+    """
+
+    name = "compact"
+
+    def encode(self, msg: BaseMessage) -> bytes:
+        if msg.type not in _COMPACT_TYPES:
+            return _json_codec.encode(msg)
+        created_at = msg.response_metadata.get("created_at") or int(time.time() * 1000)
+        return COMPACT_V1 + orjson.dumps([msg.type, msg.content, msg.id, created_at])
+
+    def decode(self, raw: bytes) -> BaseMessage:
+        msg_type, content, msg_id, created_at = orjson.loads(memoryview(raw)[1:])
+        return _COMPACT_TYPES[msg_type](content=content, id=msg_id, response_metadata={"created_at": created_at})
+
+
+_json_codec = JsonMessageCodec()
+CODECS: Dict[str, Union[JsonMessageCodec, CompactMessageCodec]] = {
+    "json": _json_codec,
+    "compact": CompactMessageCodec(),
+}
+
+
+def encode_message(msg: BaseMessage) -> bytes:
+    """Encodes with the codec named by settings.chat_cache_codec."""
+    return CODECS[settings.chat_cache_codec].encode(msg)
+
+
+def decode_message(raw: Union[bytes, str]) -> BaseMessage:
+    """Decodes an entry written by any codec, telling them apart by the first byte."""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if raw[:1] == COMPACT_V1:
+        return CODECS["compact"].decode(raw)
+    if raw[:1] == b"{":
+        return _json_codec.decode(raw)
+    raise ValueError(f"Unknown chat message encoding (header {raw[:1]!r})")
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, Set
+
+from src.config import settings
+from src.database.connection import redis_manager
+from src.services.background_tasks import background_tasks
+from .chat_history import ChatMessageHistory
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lease only if it is still the one we took; an expired lease may already
+# belong to another worker.
+_RELEASE_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SummaryCoordinator:
+    """Runs background summarization at most once at a time per user.
+
+    Every model step asks for a summary; requests for a user are debounced by `debounce`
+    seconds, and each new one replaces the pending one (the newest history object carries
+    everything the older ones did) and restarts the wait, so a burst of steps costs one run.
+    Requests arriving while that user's run is in flight are folded into a single follow-up
+    run after it. Across workers the run holds a Redis lease (SET NX with a `lease` second
+    expiry) and the cache is only rewritten while the lease is still held; a worker that
+    finds the lease taken retries after the debounce. Without Redis, runs are still
+    single-flight within the process.
+    """
+
+    def __init__(self, debounce: float = 2.0, lease: float = 120.0):
+        self.debounce = debounce
+        self.lease = lease
+        self._pending: Dict[str, ChatMessageHistory] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._rerun: Set[str] = set()
+        self._closing = False
+        self.stats = {"requested": 0, "superseded": 0, "runs": 0, "summaries": 0, "lease_busy": 0}
+
+    def schedule(self, history: ChatMessageHistory) -> None:
+        user_id = history.user_id
+        self.stats["requested"] += 1
+        self._pending[user_id] = history
+        if user_id in self._running:
+            self._rerun.add(user_id)
+            return
+        self._start_timer(user_id)
+
+    def _start_timer(self, user_id: str) -> None:
+        if self._closing:
+            return
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+            self.stats["superseded"] += 1
+        self._timers[user_id] = asyncio.create_task(self._fire(user_id))
+
+    async def _fire(self, user_id: str) -> None:
+        await asyncio.sleep(self.debounce)
+        self._timers.pop(user_id, None)
+        history = self._pending.pop(user_id, None)
+        if history is None:
+            return
+        self._running[user_id] = asyncio.current_task()
+        try:
+            # The run itself goes through the runner's bounded "summaries" queue.
+            done = await background_tasks.submit("summaries", user_id, lambda: self._run(history))
+            if done is not None:
+                await done
+        except Exception as e:
+            logger.error(f"Summarization for user '{user_id}' failed: {e}", exc_info=True)
+        finally:
+            del self._running[user_id]
+        if user_id in self._rerun:
+            self._rerun.discard(user_id)
+            self._pending.setdefault(user_id, history)
+            self._start_timer(user_id)
+
+    async def _run(self, history: ChatMessageHistory) -> None:
+        self.stats["runs"] += 1
+        token = str(uuid.uuid4())
+        try:
+            async with redis_manager.guard():
+                acquired = await redis_manager.client.set(
+                    history.summary_lease_key, token, nx=True, px=int(self.lease * 1000)
+                )
+        except Exception as e:
+            logger.warning(f"Summary lease unavailable for user '{history.user_id}', summarizing locally: {e}")
+            if await history.summarize_if_needed():
+                self.stats["summaries"] += 1
+            return
+
+        if not acquired:
+            # Another worker is summarizing this user; look again once it is likely done.
+            self.stats["lease_busy"] += 1
+            self._rerun.add(history.user_id)
+            return
+        try:
+            if await history.summarize_if_needed(lease_token=token):
+                self.stats["summaries"] += 1
+        finally:
+            try:
+                async with redis_manager.guard():
+                    client = redis_manager.client
+                    release = client.register_script(_RELEASE_LEASE_LUA)
+                    await release(keys=[history.summary_lease_key], args=[token], client=client)
+            except Exception as e:
+                logger.warning(f"Could not release summary lease for user '{history.user_id}': {e}")
+
+    async def close(self) -> None:
+        """Drops pending requests and waits for runs already in flight."""
+        self._closing = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        self._rerun.clear()
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+
+summary_coordinator = SummaryCoordinator(
+    debounce=settings.summary_debounce_seconds,
+    lease=settings.summary_lease_seconds,
+)
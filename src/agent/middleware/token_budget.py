@@ -0,0 +1,118 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Role markers and separators the chat format adds around every message.
+MESSAGE_OVERHEAD = 4
+# Encoding of the current OpenAI chat models, for model names tiktoken does not know yet.
+FALLBACK_ENCODING = "o200k_base"
+
+
+class TokenCounter:
+    """Counts prompt tokens with the model's tiktoken encoding, caching per-message counts.
+
+    Messages are immutable once they are in a conversation, so a count is cached under the
+    message id (or its content when it has none) and each message is encoded once rather
+    than on every model call. When the encoding cannot be loaded (tiktoken fetches it on
+    first use) counts fall back to an estimate of one token per four bytes of UTF-8.
+    """
+
+    def __init__(self, model: str, cache_size: int = 10000):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._encoding = None
+        self._encoding_failed = False
+
+    def _get_encoding(self):
+        if self._encoding is None and not self._encoding_failed:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+            except Exception as e:
+                self._encoding_failed = True
+                logger.warning(f"Could not load a tiktoken encoding for '{self.model}', estimating token counts: {e}")
+        return self._encoding
+
+    def count_text(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text.encode("utf-8")) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def count_message(self, message: BaseMessage) -> int:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        key = (message.type, message.id) if message.id else (message.type, content)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        tokens = MESSAGE_OVERHEAD + self.count_text(content)
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            tokens += self.count_text(json.dumps([{"name": c["name"], "args": c["args"]} for c in tool_calls], ensure_ascii=False))
+
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+
+def _units(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Splits messages into the pieces trimming may drop: single messages, except that an
+    AI message with tool calls stays together with the tool results that answer it."""
+    units: List[List[BaseMessage]] = []
+    for m in messages:
+        if isinstance(m, ToolMessage) and units and isinstance(units[-1][0], AIMessage) and units[-1][0].tool_calls:
+            units[-1].append(m)
+        else:
+            units.append([m])
+    return units
+
+
+def trim_to_budget(
+    messages: Sequence[BaseMessage], budget: int, counter: TokenCounter
+) -> Tuple[List[BaseMessage], int]:
+    """The newest messages that fit in `budget` tokens, and how many were dropped.
+
+    A leading conversation summary is always kept, as is the current turn (everything from
+    the last human message on), even when together they exceed the budget. Older messages
+    are dropped oldest first, whole tool-call exchanges at a time, and a tool result whose
+    call was dropped never reaches the model on its own.
+    """
+    messages = list(messages)
+    head = messages[:1] if messages and isinstance(messages[0], SystemMessage) else []
+    body = messages[len(head):]
+    turn_start = next((i for i in range(len(body) - 1, -1, -1) if isinstance(body[i], HumanMessage)), 0)
+    older, turn = body[:turn_start], body[turn_start:]
+
+    remaining = budget - counter.count_messages(head) - counter.count_messages(turn)
+    kept: List[BaseMessage] = []
+    for unit in reversed(_units(older)):
+        if isinstance(unit[0], ToolMessage):
+            continue
+        cost = counter.count_messages(unit)
+        if cost > remaining:
+            break
+        remaining -= cost
+        kept[:0] = unit
+    return head + kept + turn, len(older) - len(kept)
+
+
+token_counter = TokenCounter(settings.openai_model)
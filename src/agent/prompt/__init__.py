@@ -1,9 +1,10 @@
-from .consultation import VIETNAMESE_INSURANCE_AGENT, GET_ORDER_TOOLS_DESCRIPTION
+from .consultation import VIETNAMESE_INSURANCE_AGENT, GET_ORDER_TOOLS_DESCRIPTION, MANAGE_ORDER_TOOL_DESCRIPTION
 from .vison_constant import INSURANCE_VISION_PROMPT
 
 __all__ = [
     'VIETNAMESE_INSURANCE_AGENT',
     'INSURANCE_VISION_PROMPT',
-    'GET_ORDER_TOOLS_DESCRIPTION'
+    'GET_ORDER_TOOLS_DESCRIPTION',
+    'MANAGE_ORDER_TOOL_DESCRIPTION',
 ]
 
@@ -18,7 +18,7 @@ Bạn có thể sử dụng các công cụ sau:
 2.  **CHỦ ĐỘNG GHI NHỚ:** Sau mỗi lượt trả lời, hãy xem lại cuộc trò chuyện. Nếu người dùng cung cấp thông tin cá nhân hữu ích (tên, tuổi, nhu cầu, gia đình, sở thích, kế hoạch), hãy tóm tắt nó thành một câu ngắn gọn và dùng tool `save_recall_memory` để lưu lại. Ví dụ: `save_recall_memory(memory="Người dùng tên là An, đang tìm bảo hiểm du lịch cho chuyến đi Thái Lan")`.
 3.  **NGUỒN DỮ LIỆU DUY NHẤT:**
     * Toàn bộ thông tin sản phẩm (tên, giá, `insurance_id`) BẮT BUỘC phải lấy từ tool `search_insurance_products`.
-    * Toàn bộ thông tin giỏ hàng BẮT BUỘC phải lấy từ tool `view_orders`.
+    * Toàn bộ thông tin giỏ hàng BẮT BUỘC phải lấy từ tool `view_orders` hoặc từ trường `cart` trong kết quả của `manage_order`.
 4.  **CẤM TUYỆT ĐỐI BỊA ĐẶT:** Nếu tool không trả về kết quả, bạn PHẢI thông báo là "không tìm thấy". Không được tự tạo ra `insurance_id` hay thông tin sản phẩm.
 5.  **TÁCH BIỆT ĐỊNH DẠNG ĐẦU RA:**
     * **Khi trò chuyện thông thường:** Luôn trả lời bằng **văn bản tiếng Việt tự nhiên**.
@@ -38,8 +38,7 @@ Bạn có thể sử dụng các công cụ sau:
 
 **Bước 2B: Luồng Quản lý Giỏ hàng**
 1.  **Lấy `insurance_id`:** Nếu người dùng chỉ nói tên (ví dụ: "mua bảo hiểm VBI Care"), bạn phải dùng `search_insurance_products(insurance_name="VBI Care")` trước để lấy `insurance_id` chính xác.
-2.  **Kiểm tra Giỏ hàng:** (Tùy chọn nhưng khuyến khích) Gọi `view_orders` để biết trạng thái hiện tại của giỏ.
-3.  **Thực thi & Trả về JSON:** Gọi tool `manage_order` với hành động (`create`, `update`, `delete`) và các tham số phù hợp, sau đó trả về JSON theo đúng cấu trúc bên dưới.
+2.  **Thực thi & Trả về JSON:** Gọi tool `manage_order` với hành động (`create`, `update`, `delete`) và các tham số phù hợp, sau đó trả về JSON theo đúng cấu trúc bên dưới. Không cần gọi `view_orders` trước hay sau: `manage_order` tự báo lỗi nếu sản phẩm không có trong giỏ và luôn trả về giỏ hàng mới nhất trong trường `cart`.
 
 ## Cấu trúc JSON cho Backend
 **Khi `requirement` là `CREATE`:**
@@ -94,11 +93,12 @@ JSON
 </response> 
 </example> 
 """
-GET_ORDER_TOOLS_DESCRIPTION = """Sử dụng công cụ này để truy xuất giỏ hàng hoặc danh sách các đơn hàng của người dùng từ cơ sở dữ liệu. Đây là bước quan trọng cần thực hiện trước khi xem, cập nhật hoặc xóa các mặt hàng để biết được trạng thái hiện tại của giỏ hàng.
+GET_ORDER_TOOLS_DESCRIPTION = """Sử dụng công cụ này để truy xuất giỏ hàng hoặc danh sách các đơn hàng của người dùng từ cơ sở dữ liệu. Dùng khi cần biết trạng thái hiện tại của giỏ hàng.
 
 ## Cách sử dụng
 - Công cụ này lấy tất cả các đơn hàng của một người dùng dựa trên ID và trạng thái của đơn hàng đó.
-- Bạn phải luôn gọi công cụ này khi người dùng yêu cầu "xem đơn hàng", "kiểm tra giỏ hàng" hoặc trước khi thực hiện hành động "cập nhật" hoặc "xóa" để xác nhận mặt hàng có tồn tại hay không.
+- Bạn phải luôn gọi công cụ này khi người dùng yêu cầu "xem đơn hàng", "kiểm tra giỏ hàng".
+- Không cần gọi công cụ này ngay sau `manage_order`: kết quả của `manage_order` đã có giỏ hàng mới nhất trong trường `cart`.
 
 ## Tham số (Parameters)
 - `from_id` (str, bắt buộc): ID định danh duy nhất của người dùng.
@@ -121,4 +121,10 @@ Assistant: Chắc chắn rồi. Để tôi kiểm tra các đơn hàng hiện t
 Trợ lý cần biết nội dung hiện tại trong giỏ hàng của người dùng để trả lời câu hỏi. `GetOrders` là công cụ duy nhất có thể cung cấp thông tin này một cách chính xác từ cơ sở dữ liệu.
 </reasoning>
 </example>
-"""
\ No newline at end of file
+"""
+
+MANAGE_ORDER_TOOL_DESCRIPTION = """Quản lý đơn hàng: tạo, cập nhật, hoặc xóa sản phẩm trong giỏ hàng.
+- `create`: thêm `quantity` sản phẩm (gộp vào dòng đã có nếu sản phẩm đã trong giỏ).
+- `update`: thay đổi số lượng thêm `quantity_change` (số âm để giảm; về 0 thì sản phẩm bị xóa khỏi giỏ).
+- `delete`: xóa sản phẩm khỏi giỏ.
+Kết quả có trường `cart` là giỏ hàng sau khi thay đổi (`items`, `total_count`, `total_amount`, `qr_payment`), nên không cần gọi `view_orders` lại."""
@@ -3,50 +3,60 @@ import logging
 from typing import Dict, Any, List, Optional
 
 from langchain_core.tools import tool
-from ...database.connection import db_manager
-from ...database.insurance_repository import _normalize
+from ...database import insurance_repository
 from ...common.constants import Lexicon
 
 logger = logging.getLogger(__name__)
 
 SEARCH_INSURANCE_TOOL_DESCRIPTION = """
-- **Chức năng**: Tìm kiếm sản phẩm bảo hiểm theo TÊN hoặc theo LOẠI.
-- **Quan trọng**: CHỈ SỬ DỤNG MỘT trong hai tham số cho mỗi lần gọi.
+- **Chức năng**: Tìm kiếm sản phẩm bảo hiểm theo TÊN, theo LOẠI, hoặc theo NHU CẦU mô tả tự do.
+- **Quan trọng**: CHỈ SỬ DỤNG MỘT trong ba tham số cho mỗi lần gọi.
 - **Tham số**:
   - `insurance_name` (str, tùy chọn): Dùng khi người dùng hỏi tên sản phẩm cụ thể (ví dụ: "Bảo hiểm VBI Care").
   - `insurance_type` (str, tùy chọn): Dùng khi người dùng hỏi một loại chung (ví dụ: "bảo hiểm sức khỏe", "du lịch").
-- **Trả về**: Danh sách JSON các sản phẩm bảo hiểm phù hợp.
+  - `query` (str, tùy chọn): Dùng khi người dùng mô tả nhu cầu mà không nêu tên hay loại (ví dụ: "bảo hiểm cho chuyến đi Nhật", "lỡ nằm viện thì sao").
+- **Trả về**: Danh sách JSON các sản phẩm bảo hiểm phù hợp. Tìm theo tên không phân biệt dấu và chấp nhận lỗi chính tả nhỏ. Kết quả theo `query` có thêm `score` (độ phù hợp, 0-1), sắp xếp từ cao xuống thấp.
 """
 
 @tool(description=SEARCH_INSURANCE_TOOL_DESCRIPTION)
 async def search_insurance_products(
     insurance_name: Optional[str] = None,
-    insurance_type: Optional[str] = None
+    insurance_type: Optional[str] = None,
+    query: Optional[str] = None,
 ) -> str:
-    if not (insurance_name or insurance_type) or (insurance_name and insurance_type):
+    if sum(1 for p in (insurance_name, insurance_type, query) if p) != 1:
         return json.dumps({
             "error": "invalid_parameters",
-            "message": "Vui lòng chỉ cung cấp `insurance_name` hoặc `insurance_type`, không phải cả hai hoặc không có gì."
+            "message": "Vui lòng chỉ cung cấp một trong `insurance_name`, `insurance_type` hoặc `query`."
         }, ensure_ascii=False)
 
     try:
+        # The repository answers from the in-process catalog cache when it is loaded.
         if insurance_name:
-            query = "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE insurance_name ILIKE '%' || $1 || '%' ORDER BY insurance_id LIMIT $2"
-            params = [insurance_name, 25]
-        else:
+            products = await insurance_repository.fetch_by_name(insurance_name, 25)
+            if not products:
+                # Nothing contains the phrase as typed: rank names by trigram similarity, which
+                # tolerates typos and missing diacritics. Always the indexed query; the catalog
+                # cache only has vector search, which ranks by meaning rather than spelling.
+                products = await insurance_repository.search_by_name(insurance_name, 10)
+                if products is None:
+                    products = await insurance_repository.search(insurance_name, 10)
+        elif insurance_type:
             mapped_type = Lexicon.normalize_insurance_type(insurance_type)
-            if not mapped_type:
-                return json.dumps({"error": "unknown_type", "input": insurance_type, "products": []}, ensure_ascii=False)
-            query = "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE lower(insurance_type)=lower($1) ORDER BY insurance_id LIMIT $2"
-            params = [mapped_type, 25]
-        
-        rows = await db_manager.fetch_all(query, params)
-        
-        if rows is None:
+            if mapped_type:
+                products = await insurance_repository.fetch_by_type(mapped_type, 25)
+            else:
+                # Answer "bảo hiểm đi Nhật" in this call instead of making the model retry.
+                products = await insurance_repository.search(insurance_type, 5)
+                if not products:
+                    return json.dumps({"error": "unknown_type", "input": insurance_type, "products": []}, ensure_ascii=False)
+        else:
+            products = await insurance_repository.search(query, 5)
+
+        if products is None:
             return json.dumps({"error": "db_call_failed", "products": []}, ensure_ascii=False)
-            
-        normalized_rows = [_normalize(dict(r)) for r in rows]
-        return json.dumps(normalized_rows, ensure_ascii=False, default=str)
+
+        return json.dumps(products, ensure_ascii=False, default=str)
 
     except Exception as e:
         logger.error(f"search_insurance_products error: {e}", exc_info=True)
@@ -1,4 +1,3 @@
-import asyncio
 import json
 import logging
 import uuid
@@ -10,41 +9,38 @@ from langchain_core.tools import tool
 from qdrant_client.http.models import FieldCondition, Filter, MatchValue
 
 from src.database.vector_store import vector_store
+from src.services.background_tasks import background_tasks
 
 logger = logging.getLogger(__name__)
 
 
 async def _save_and_deduplicate_in_background(user_id: str, memory: str):
-    """Hàm chạy nền để lưu và xử lý trùng lặp ký ức."""
-    try:
-        SIMILARITY_THRESHOLD = 0.95
-        qdrant_filter = Filter(must=[FieldCondition(key="metadata.user_id", match=MatchValue(value=user_id))])
-
-        similar_docs_with_scores = await vector_store.asimilarity_search_with_relevance_scores(
-            query=memory, k=5, filter=qdrant_filter
-        )
+    """Hàm chạy nền để lưu và xử lý trùng lặp ký ức. Lỗi được ném ra để hàng đợi nền thử lại."""
+    SIMILARITY_THRESHOLD = 0.95
+    qdrant_filter = Filter(must=[FieldCondition(key="metadata.user_id", match=MatchValue(value=user_id))])
 
-        ids_to_delete = [
-            doc.metadata["id"]
-            for doc, score in similar_docs_with_scores
-            if score >= SIMILARITY_THRESHOLD and "id" in doc.metadata
-        ]
+    similar_docs_with_scores = await vector_store.asimilarity_search_with_relevance_scores(
+        query=memory, k=5, filter=qdrant_filter
+    )
 
-        if ids_to_delete:
-            await vector_store.adelete(ids=ids_to_delete)
-            logger.info(f"BACKGROUND: Deleted {len(ids_to_delete)} redundant memories for user '{user_id}'.")
+    ids_to_delete = [
+        doc.metadata["id"]
+        for doc, score in similar_docs_with_scores
+        if score >= SIMILARITY_THRESHOLD and "id" in doc.metadata
+    ]
 
-        new_doc_id = str(uuid.uuid4())
-        document = Document(page_content=memory, metadata={"user_id": user_id, "id": new_doc_id})
-        await vector_store.aadd_documents([document])
+    if ids_to_delete:
+        await vector_store.adelete(ids=ids_to_delete)
+        logger.info(f"BACKGROUND: Deleted {len(ids_to_delete)} redundant memories for user '{user_id}'.")
 
-        if ids_to_delete:
-            logger.info(f"BACKGROUND: Successfully replaced and saved memory for user '{user_id}': '{memory}'")
-        else:
-            logger.info(f"BACKGROUND: Successfully saved new memory for user '{user_id}': '{memory}'")
+    new_doc_id = str(uuid.uuid4())
+    document = Document(page_content=memory, metadata={"user_id": user_id, "id": new_doc_id})
+    await vector_store.aadd_documents([document])
 
-    except Exception as e:
-        logger.error(f"BACKGROUND: Failed to save memory for user '{user_id}': {e}", exc_info=True)
+    if ids_to_delete:
+        logger.info(f"BACKGROUND: Successfully replaced and saved memory for user '{user_id}': '{memory}'")
+    else:
+        logger.info(f"BACKGROUND: Successfully saved new memory for user '{user_id}': '{memory}'")
 
 
 @tool(description="Sử dụng tool này để lưu một thông tin quan trọng, cô đọng về người dùng vào trí nhớ dài hạn. Ví dụ: 'Người dùng tên là An, đang tìm bảo hiểm du lịch.'")
@@ -60,8 +56,13 @@ async def save_recall_memory(memory: str) -> str:
         logger.error("Failed to save memory: user_id not found in RunnableConfig.")
         return "Lỗi: Không thể lưu ký ức vì thiếu thông tin người dùng."
 
-    # Chạy tác vụ nặng trong nền
-    asyncio.create_task(_save_and_deduplicate_in_background(user_id, memory))
+    # Chạy tác vụ nặng trong nền (hàng đợi "memory": giới hạn đồng thời, tự thử lại khi lỗi)
+    queued = await background_tasks.submit(
+        "memory", f"save_recall_memory:{user_id}",
+        lambda: _save_and_deduplicate_in_background(user_id, memory),
+    )
+    if queued is None:
+        return "Lỗi: Hệ thống đang bận, chưa thể lưu ký ức này."
 
     # Trả về ngay lập tức để không chặn luồng chính
     logger.info(f"Queued memory for background saving for user '{user_id}': '{memory}'")
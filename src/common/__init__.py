@@ -1,9 +1,11 @@
-from .exceptions import DatabaseException, ValidationException, ZaloChatBotException
+from .exceptions import CircuitOpenException, DatabaseException, PoolSaturatedException, ValidationException, ZaloChatBotException
 from .constants import BankingVisionKeywords
 from .constants import VisionToolDescriptions
 
 __all__ = [
+    'CircuitOpenException',
     'DatabaseException',
+    'PoolSaturatedException',
     'ValidationException', 
     'ZaloChatBotException',
     'BankingVisionKeywords',
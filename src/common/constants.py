@@ -1,3 +1,6 @@
+from .keyword_matcher import KeywordMatcher, fold
+
+
 class Lexicon:
     INSURANCE_STOP_WORDS = {
         'bảo', 'hiểm', 'bảo hiểm', 'bao', 'hiem', 'bao hiem',
@@ -41,10 +44,27 @@ class Lexicon:
         '人寿保险': 'life', '人寿': 'life'
     }
 
-    @staticmethod
-    def _strip_accents(s: str) -> str:
-        import unicodedata
-        return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+    TYPE_MATCHER = KeywordMatcher(VN_TYPE_TO_CODE)
+
+    # Phrases customers use for each type without naming it; indexed with every
+    # product of that type for free-text search (src/database/product_index.py).
+    TYPE_DESCRIPTORS = {
+        'health': ['sức khỏe', 'y tế', 'bệnh viện', 'nằm viện', 'khám bệnh', 'ốm đau', 'viện phí', 'health', 'hospital', '健康'],
+        'travel': ['du lịch', 'chuyến đi', 'đi nước ngoài', 'quốc tế', 'công tác', 'visa', 'vé máy bay', 'travel', 'trip', '旅行'],
+        'personal_accident': ['tai nạn', 'thương tật', 'rủi ro', 'accident', 'injury', '意外'],
+        'car': ['ô tô', 'xe hơi', 'oto', 'xe bốn bánh', 'trách nhiệm dân sự', 'car', 'auto', '汽车'],
+        'motorbike': ['xe máy', 'mô tô', 'xe gắn máy', 'tnds', 'trách nhiệm dân sự', 'motorbike', 'motorcycle', '摩托车'],
+        'home': ['nhà ở', 'căn hộ', 'chung cư', 'cháy nổ', 'tài sản', 'home', 'house', '房屋'],
+        'life': ['nhân thọ', 'tiết kiệm', 'gia đình', 'con cái', 'hưu trí', 'life', '人寿'],
+        'non_life': ['phi nhân thọ', 'tài sản', 'non life'],
+    }
+
+    @classmethod
+    def fold(cls, text: str | None) -> str:
+        """Lowercase, accent-free, single-spaced form used for name matching ("Bảo hiểm Đà Nẵng" -> "bao hiem da nang")."""
+        if not text:
+            return ''
+        return ' '.join(fold(text).split())
 
     @classmethod
     def normalize_insurance_type(cls, text: str | None) -> str | None:
@@ -55,15 +75,10 @@ class Lexicon:
         """
         if not text:
             return None
-        lowered = cls._strip_accents(text.lower().strip())
-        # try direct match keys first (accent stripped entries already covered in VN_TYPE_TO_CODE)
-        if lowered in cls.VN_TYPE_TO_CODE:
-            return cls.VN_TYPE_TO_CODE[lowered]
-        # fallback: scan for any key substring (short phrases inside longer sentence)
-        for key, code in cls.VN_TYPE_TO_CODE.items():
-            if key in lowered:
-                return code
-        return None
+        # try direct match first, then the longest key inside a longer sentence
+        # ("bảo hiểm nhân thọ cho nhà tôi" is life, not home)
+        code = cls.TYPE_MATCHER.get(text)
+        return code if code is not None else cls.TYPE_MATCHER.longest(text)
 
 
 
@@ -416,3 +431,7 @@ class BankingVisionKeywords:
         'số khung',
         'chủ xe'
     ]
+
+    BANK_MATCHER = KeywordMatcher(BANKS)
+    SIGNBOARD_MATCHER = KeywordMatcher(SIGNBOARD_KEYWORDS)
+    INSURANCE_MATCHER = KeywordMatcher(INSURANCE_KEYWORDS)
@@ -18,4 +18,11 @@ class DatabaseException(ZaloChatBotException):
 class ValidationException(ZaloChatBotException):
     def __init__(self, message: str, field_name: str | None = None, error_code: str | None = None):
         self.field_name = field_name
-        super().__init__(message, error_code)
\ No newline at end of file
+        super().__init__(message, error_code)
+
+class PoolSaturatedException(DatabaseException):
+    pass
+
+
+class CircuitOpenException(ZaloChatBotException):
+    pass
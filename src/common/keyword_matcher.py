@@ -0,0 +1,118 @@
+import functools
+import unicodedata
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+# Covers Latin, Latin Extended (incl. the Vietnamese block at U+1EA0..U+1EF9),
+# Greek and Cyrillic. Code points past the end are left unchanged by translate().
+_FOLD_TABLE_SIZE = 0x1F00
+
+
+def _build_fold_table() -> str:
+    chars = []
+    for cp in range(_FOLD_TABLE_SIZE):
+        c = chr(cp)
+        lowered = c.lower()
+        base = ''.join(ch for ch in unicodedata.normalize('NFD', lowered) if not unicodedata.combining(ch))
+        if len(base) == 1:
+            chars.append(base)
+        elif len(lowered) == 1:
+            chars.append(lowered)
+        else:
+            chars.append(c)
+    chars[ord('đ')] = chars[ord('Đ')] = 'd'
+    return ''.join(chars)
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+# The classifiers run one after another on the same OCR text; the cache lets
+# them share a single fold of it.
+@functools.lru_cache(maxsize=64)
+def fold(text: str) -> str:
+    """Lowercase, accent-free form of `text` ("Bảo Hiểm Đà Nẵng" -> "bao hiem da nang").
+
+    Every character maps to exactly one character, so an index into the folded
+    string is also an index into `text` (after NFC normalization, which is a
+    no-op for the precomposed text keyboards and OCR produce).
+    """
+    if not unicodedata.is_normalized('NFC', text):
+        text = unicodedata.normalize('NFC', text)
+    return text.translate(_FOLD_TABLE)
+
+
+class KeywordMatch(NamedTuple):
+    keyword: str
+    value: Any
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """A keyword table compiled once for accent- and case-insensitive lookups.
+
+    Keywords are folded and de-duplicated up front ('sức khỏe' and 'suc khoe'
+    become one pattern; the first occurrence keeps its value and priority),
+    so each call folds the text once and tests every distinct pattern with
+    C-level substring search. Keywords given as a list map to themselves.
+    """
+
+    def __init__(self, keywords: Union[Mapping[str, Any], Iterable[str]]):
+        items = keywords.items() if isinstance(keywords, Mapping) else ((k, k) for k in keywords)
+        self._patterns: Dict[str, Tuple[int, str, Any]] = {}
+        for priority, (keyword, value) in enumerate(items):
+            pattern = fold(keyword.strip())
+            if pattern and pattern not in self._patterns:
+                self._patterns[pattern] = (priority, keyword, value)
+        # Declaration order for first(); longest first for longest() and find_all().
+        self._by_priority: List[Tuple[str, Any]] = [(p, entry[2]) for p, entry in self._patterns.items()]
+        self._by_length: List[str] = sorted(self._patterns, key=len, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def get(self, text: str, default: Any = None) -> Any:
+        """Value of the keyword equal to `text` once folded and trimmed."""
+        entry = self._patterns.get(' '.join(fold(text).split()))
+        return entry[2] if entry else default
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Every occurrence, overlapping ones included, ordered by position then longest first."""
+        folded = fold(text)
+        matches = []
+        for pattern in self._by_length:
+            start = folded.find(pattern)
+            if start < 0:
+                continue
+            _, keyword, value = self._patterns[pattern]
+            while start >= 0:
+                matches.append(KeywordMatch(keyword, value, start, start + len(pattern)))
+                start = folded.find(pattern, start + 1)
+        matches.sort(key=lambda m: (m.start, m.start - m.end))
+        return matches
+
+    def count_distinct(self, text: str) -> int:
+        """Number of distinct keywords present in `text`."""
+        folded = fold(text)
+        return sum(1 for pattern in self._by_length if pattern in folded)
+
+    def first(self, text: str) -> Optional[Any]:
+        """Value of the earliest-declared keyword present in `text`."""
+        folded = fold(text)
+        for pattern, value in self._by_priority:
+            if pattern in folded:
+                return value
+        return None
+
+    def longest(self, text: str) -> Optional[Any]:
+        """Value of the longest keyword present in `text`; ties go to the leftmost."""
+        folded = fold(text)
+        best: Optional[str] = None
+        best_start = -1
+        for pattern in self._by_length:
+            if best is not None and len(pattern) < len(best):
+                break
+            start = folded.find(pattern)
+            if start >= 0 and (best is None or start < best_start):
+                best, best_start = pattern, start
+        return self._patterns[best][2] if best is not None else None
@@ -25,9 +25,56 @@ class Settings(BaseSettings):
     db_name: str = Field(..., env="DB_NAME")
     db_user: str = Field(..., env="DB_USER")
     db_password: str = Field(..., env="DB_PASSWORD")
+    db_prepared_statements: bool = Field(default=True, env="DB_PREPARED_STATEMENTS")
+    db_pgbouncer_mode: bool = Field(default=False, env="DB_PGBOUNCER_MODE")
+    db_statement_cache_size: int = Field(default=256, env="DB_STATEMENT_CACHE_SIZE")
+    db_pool_min_size: int = Field(default=2, env="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(default=10, env="DB_POOL_MAX_SIZE")
+    db_acquire_timeout: float = Field(default=5.0, env="DB_ACQUIRE_TIMEOUT")
+    db_interactive_reserved: int = Field(default=2, env="DB_INTERACTIVE_RESERVED")
+    db_replica_hosts: str = Field(default="", env="DB_REPLICA_HOSTS")
+    db_replica_pool_max_size: int = Field(default=10, env="DB_REPLICA_POOL_MAX_SIZE")
+    db_replica_max_lag_seconds: float = Field(default=5.0, env="DB_REPLICA_MAX_LAG_SECONDS")
+    db_replica_lag_check_interval: float = Field(default=5.0, env="DB_REPLICA_LAG_CHECK_INTERVAL")
+    db_read_your_writes_seconds: float = Field(default=10.0, env="DB_READ_YOUR_WRITES_SECONDS")
+    db_query_stats_enabled: bool = Field(default=True, env="DB_QUERY_STATS_ENABLED")
+    db_query_stats_log_interval: float = Field(default=300.0, env="DB_QUERY_STATS_LOG_INTERVAL")
+    db_loader_max_batch_size: int = Field(default=100, env="DB_LOADER_MAX_BATCH_SIZE")
+    catalog_cache_enabled: bool = Field(default=True, env="CATALOG_CACHE_ENABLED")
+    catalog_refresh_interval: float = Field(default=300.0, env="CATALOG_REFRESH_INTERVAL")
+    product_index_dim: int = Field(default=1024, env="PRODUCT_INDEX_DIM")
+    product_search_min_score: float = Field(default=0.1, env="PRODUCT_SEARCH_MIN_SCORE")
+    chat_history_flush_interval: float = Field(default=0.5, env="CHAT_HISTORY_FLUSH_INTERVAL")
+    chat_history_batch_size: int = Field(default=500, env="CHAT_HISTORY_BATCH_SIZE")
+    chat_history_max_buffer: int = Field(default=20000, env="CHAT_HISTORY_MAX_BUFFER")
+    chat_history_load_days: int = Field(default=90, env="CHAT_HISTORY_LOAD_DAYS")
+    chat_history_load_limit: int = Field(default=200, env="CHAT_HISTORY_LOAD_LIMIT")
+    chat_history_retention_months: int = Field(default=12, env="CHAT_HISTORY_RETENTION_MONTHS")
+    chat_history_archive_dir: str = Field(default="archive/chat_histories", env="CHAT_HISTORY_ARCHIVE_DIR")
+    chat_cache_codec: str = Field(default="compact", env="CHAT_CACHE_CODEC")
+    context_token_budget: int = Field(default=8000, env="CONTEXT_TOKEN_BUDGET")
+    history_summary_tokens: int = Field(default=3000, env="HISTORY_SUMMARY_TOKENS")
+    summary_debounce_seconds: float = Field(default=2.0, env="SUMMARY_DEBOUNCE_SECONDS")
+    summary_lease_seconds: float = Field(default=120.0, env="SUMMARY_LEASE_SECONDS")
+    background_queue_size: int = Field(default=1000, env="BACKGROUND_QUEUE_SIZE")
+    background_memory_concurrency: int = Field(default=4, env="BACKGROUND_MEMORY_CONCURRENCY")
+    background_summary_concurrency: int = Field(default=4, env="BACKGROUND_SUMMARY_CONCURRENCY")
+    background_max_attempts: int = Field(default=3, env="BACKGROUND_MAX_ATTEMPTS")
+    background_retry_backoff: float = Field(default=1.0, env="BACKGROUND_RETRY_BACKOFF")
+    background_drain_timeout: float = Field(default=30.0, env="BACKGROUND_DRAIN_TIMEOUT")
+    cart_cache_enabled: bool = Field(default=True, env="CART_CACHE_ENABLED")
+    cart_cache_ttl: int = Field(default=600, env="CART_CACHE_TTL")
 
 
     redis_url: str = Field(..., env="REDIS_URL")
+    redis_max_connections: int = Field(default=50, env="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout: float = Field(default=5.0, env="REDIS_POOL_TIMEOUT")
+    redis_socket_timeout: float = Field(default=5.0, env="REDIS_SOCKET_TIMEOUT")
+    redis_health_check_interval: int = Field(default=30, env="REDIS_HEALTH_CHECK_INTERVAL")
+    circuit_failure_rate: float = Field(default=0.5, env="CIRCUIT_FAILURE_RATE")
+    circuit_min_calls: int = Field(default=10, env="CIRCUIT_MIN_CALLS")
+    circuit_window_seconds: float = Field(default=30.0, env="CIRCUIT_WINDOW_SECONDS")
+    circuit_probe_interval: float = Field(default=5.0, env="CIRCUIT_PROBE_INTERVAL")
     ocr_api_key: str = Field(..., env="OCR_API_KEY")
     recipient_account: str = Field(default="13789999999", env="RECIPIENT_ACCOUNT")
 
@@ -54,6 +101,10 @@ class Settings(BaseSettings):
     followup_check_interval_minutes: int = Field(default=5, env="FOLLOWUP_CHECK_INTERVAL_MINUTES")
     followup_days_threshold: int = Field(default=30, env="FOLLOWUP_DAYS_THRESHOLD")
     followup_minutes_threshold: int = Field(default=2, env="FOLLOWUP_MINUTES_THRESHOLD")
+    followup_batch_size: int = Field(default=100, env="FOLLOWUP_BATCH_SIZE")
+    followup_concurrency: int = Field(default=8, env="FOLLOWUP_CONCURRENCY")
+    followup_claim_seconds: float = Field(default=600.0, env="FOLLOWUP_CLAIM_SECONDS")
+    followup_max_attempts: int = Field(default=3, env="FOLLOWUP_MAX_ATTEMPTS")
 
     sepay_api_key: str = Field(default="", env="SEPAY_API_KEY")
     
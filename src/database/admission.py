@@ -0,0 +1,181 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional
+
+from src.common.exceptions import PoolSaturatedException
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Admission lanes, lower value is served first."""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_current_priority: ContextVar[Priority] = ContextVar("db_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def db_priority(priority: Priority):
+    """Sets the default admission lane for DB calls made inside the block
+    (and inside tasks created from it)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+class WaitHistogram:
+    """Fixed-bucket histogram of acquire-wait times in milliseconds."""
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, wait_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, wait_ms)] += 1
+        self.total += 1
+        self.sum_ms += wait_ms
+        self.max_ms = max(self.max_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, object]:
+        buckets = {f"le_{b}ms": c for b, c in zip(self.BUCKETS_MS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 3) if self.total else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class AdmissionController:
+    """Priority-aware admission in front of the connection pool.
+
+    At most `capacity` operations hold a slot at once. Background work may only
+    use `capacity - interactive_reserved` slots and never overtakes a queued
+    interactive caller. Callers that cannot get a slot within `acquire_timeout`
+    seconds fail fast with `PoolSaturatedException` instead of piling up.
+    """
+
+    def __init__(self, capacity: int, interactive_reserved: int = 0, acquire_timeout: float = 5.0):
+        self.capacity = capacity
+        self.interactive_reserved = min(max(interactive_reserved, 0), capacity - 1)
+        self.acquire_timeout = acquire_timeout
+        self._in_flight = 0
+        self._waiters: Dict[Priority, Deque[asyncio.Future]] = {p: deque() for p in Priority}
+        self._wait_histograms: Dict[str, WaitHistogram] = {}
+        self._admitted: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._rejected: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._peak_queue_depth = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _limit(self, priority: Priority) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.capacity
+        return self.capacity - self.interactive_reserved
+
+    def _can_admit(self, priority: Priority) -> bool:
+        if self._in_flight >= self._limit(priority):
+            return False
+        # Nobody jumps ahead of an already queued caller of the same or a higher lane.
+        return not any(self._waiters[p] for p in Priority if p <= priority)
+
+    async def acquire(self, operation: str, priority: Optional[Priority] = None) -> None:
+        priority = current_priority() if priority is None else priority
+        start = time.perf_counter()
+        if self._can_admit(priority):
+            self._in_flight += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            lane = self._waiters[priority]
+            lane.append(fut)
+            self._peak_queue_depth = max(self._peak_queue_depth, self.queue_depth)
+            try:
+                await asyncio.wait_for(fut, timeout=self.acquire_timeout)
+            except BaseException as e:
+                if fut in lane:
+                    lane.remove(fut)
+                if fut.done() and not fut.cancelled():
+                    # The slot was handed over just as we gave up: pass it on.
+                    self._release_slot()
+                if isinstance(e, asyncio.TimeoutError):
+                    self._rejected[priority] += 1
+                    raise PoolSaturatedException(
+                        f"Database pool saturated: no slot for {priority.name.lower()} "
+                        f"'{operation}' within {self.acquire_timeout:.1f}s",
+                        error_code="db_pool_saturated",
+                    ) from None
+                raise
+        self._admitted[priority] += 1
+        self._histogram(operation, priority).observe((time.perf_counter() - start) * 1000)
+
+    def release(self) -> None:
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        for priority in Priority:
+            lane = self._waiters[priority]
+            while lane and self._in_flight < self._limit(priority):
+                fut = lane.popleft()
+                if fut.done():
+                    continue
+                self._in_flight += 1
+                fut.set_result(None)
+            if lane:
+                # Lower lanes wait until this one is drained.
+                return
+
+    @asynccontextmanager
+    async def slot(self, operation: str, priority: Optional[Priority] = None):
+        await self.acquire(operation, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _histogram(self, operation: str, priority: Priority) -> WaitHistogram:
+        key = f"{operation}:{priority.name.lower()}"
+        hist = self._wait_histograms.get(key)
+        if hist is None:
+            hist = self._wait_histograms[key] = WaitHistogram()
+        return hist
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self._waiters.values())
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "interactive_reserved": self.interactive_reserved,
+            "in_flight": self._in_flight,
+            "queue_depth": {p.name.lower(): len(self._waiters[p]) for p in Priority},
+            "peak_queue_depth": self._peak_queue_depth,
+            "admitted": {p.name.lower(): n for p, n in self._admitted.items()},
+            "rejected": {p.name.lower(): n for p, n in self._rejected.items()},
+            "acquire_wait_ms": {k: h.snapshot() for k, h in sorted(self._wait_histograms.items())},
+        }
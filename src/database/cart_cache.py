@@ -0,0 +1,115 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from src.config import settings
+from .connection import db_manager, redis_manager
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+CART_SNAPSHOTS_SQL = register_statement(
+    "cart.snapshots",
+    "SELECT k.from_id, cart_snapshot(k.from_id) AS snapshot FROM unnest($1::text[]) AS k(from_id)",
+)
+# Snapshot reads for users whose carts are loaded in the same tick (view_orders
+# cache misses, a reconciliation batch's write-throughs) share one round trip.
+snapshot_loader = db_manager.batch_loader(CART_SNAPSHOTS_SQL, ("from_id",))
+
+# Stores the snapshot only if it is newer than the cached one, so a slow writer
+# holding an old snapshot cannot overwrite a fresher cart.
+_SET_IF_NEWER_LUA = """
+local current = redis.call('HGET', KEYS[1], 'v')
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'v', ARGV[1], 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class CartCache:
+    """Per-user pending cart snapshots in Redis, written through by cart mutations.
+
+    Snapshots come from the cart_snapshot() SQL function and carry the user's
+    cart_version, which triggers bump on every change to their orders or cart
+    status (migrations/0005_cart_version.sql). Writes are compare-and-set on
+    that version. Changes made outside the app, e.g. a payment marking the
+    cart paid, are picked up when the entry expires after `ttl` seconds.
+    Redis errors never fail a request: reads fall back to Postgres and
+    failed writes are logged.
+    """
+
+    def __init__(self, ttl: int = 600):
+        self.ttl = ttl
+        self._set_if_newer = None
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "stale_writes": 0, "errors": 0}
+
+    @staticmethod
+    def _key(from_id: str) -> str:
+        return f"cart:{from_id}"
+
+    async def get(self, from_id: str) -> Optional[Dict[str, Any]]:
+        if not settings.cart_cache_enabled:
+            return None
+        try:
+            async with redis_manager.guard():
+                data = await redis_manager.client.hget(self._key(from_id), "data")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Cart cache read failed for {from_id}: {e}")
+            return None
+        if data is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return json.loads(data)
+
+    async def put(self, from_id: str, snapshot: Dict[str, Any]) -> bool:
+        """Caches `snapshot` unless a newer cart_version is already cached."""
+        if not settings.cart_cache_enabled:
+            return False
+        try:
+            async with redis_manager.guard():
+                client = redis_manager.client
+                if self._set_if_newer is None:
+                    self._set_if_newer = client.register_script(_SET_IF_NEWER_LUA)
+                stored = await self._set_if_newer(
+                    keys=[self._key(from_id)],
+                    args=[int(snapshot["cart_version"]), json.dumps(snapshot, ensure_ascii=False, default=str), self.ttl],
+                    client=client,
+                )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Cart cache write failed for {from_id}: {e}")
+            return False
+        self.stats["writes" if stored else "stale_writes"] += 1
+        return bool(stored)
+
+    async def refresh(self, from_id: str) -> Optional[Dict[str, Any]]:
+        """Reads the cart from the primary and writes it through."""
+        row = await snapshot_loader.load(from_id)
+        if not row:
+            return None
+        snapshot = json.loads(row["snapshot"])
+        await self.put(from_id, snapshot)
+        return snapshot
+
+    async def write_through(self, from_id: str) -> None:
+        """Refresh after a mutation; a failure here must not fail the mutation."""
+        try:
+            await self.refresh(from_id)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Cart cache write-through failed for {from_id}: {e}")
+
+    async def load(self, from_id: str) -> Optional[Dict[str, Any]]:
+        """Cached cart, or the database's when it is not cached."""
+        snapshot = await self.get(from_id)
+        if snapshot is not None:
+            return snapshot
+        return await self.refresh(from_id)
+
+
+cart_cache = CartCache(ttl=settings.cart_cache_ttl)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from src.common.constants import Lexicon
+from src.config import settings
+from .connection import db_manager
+from .product_index import ProductIndex
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "insurance_catalog_changed"
+
+LOAD_CATALOG_SQL = register_statement(
+    "catalog.load",
+    "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products ORDER BY insurance_id",
+)
+
+
+class CatalogCache:
+    """In-process copy of insurance_products, indexed by id, type and folded name.
+
+    The table is small and changes rarely, so it is loaded whole. A statement
+    trigger on insurance_products (migrations/0001_insurance_catalog_notify.sql)
+    sends NOTIFY on CATALOG_CHANNEL after every change; a dedicated LISTEN
+    connection turns that into a reload. The cache also reloads every
+    `refresh_interval` seconds in case a notification was missed, e.g. while the
+    LISTEN connection was down. Until the first load succeeds `ready` is False
+    and callers should query the database instead. Each load also rebuilds the
+    ProductIndex used for free-text `search`.
+    """
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._by_type: Dict[str, List[Dict[str, Any]]] = {}
+        self._names: List[Tuple[str, Dict[str, Any]]] = []
+        self._index = ProductIndex(settings.product_index_dim)
+        self._ready = False
+        self._listener: Optional[asyncpg.Connection] = None
+        self._refresh_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"reloads": 0, "notifications": 0, "hits": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def start(self) -> None:
+        if self._task is not None or not settings.catalog_cache_enabled:
+            return
+        self._refresh_requested = asyncio.Event()
+        await self._listen()
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def refresh(self) -> None:
+        try:
+            # Primary, not a replica: a reload triggered by NOTIFY must see the change.
+            rows = await db_manager.fetch_all(LOAD_CATALOG_SQL)
+        except Exception as e:
+            logger.warning(f"Catalog reload failed, keeping the previous snapshot: {e}")
+            return
+        by_id: Dict[int, Dict[str, Any]] = {}
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        names: List[Tuple[str, Dict[str, Any]]] = []
+        for row in rows:
+            product = dict(row)
+            by_id[product["insurance_id"]] = product
+            by_type.setdefault(product["insurance_type"].lower(), []).append(product)
+            names.append((Lexicon.fold(product["insurance_name"]), product))
+        index = ProductIndex.build(by_id.values(), dim=settings.product_index_dim)
+        # Swap whole indexes so readers never see a half-built snapshot.
+        self._by_id, self._by_type, self._names, self._index = by_id, by_type, names, index
+        self._ready = True
+        self.stats["reloads"] += 1
+        logger.info(f"Insurance catalog cache loaded {len(by_id)} products")
+
+    async def _listen(self) -> None:
+        try:
+            conn = await db_manager.connect()
+            await conn.add_listener(CATALOG_CHANNEL, self._on_notify)
+            conn.add_termination_listener(self._on_listener_lost)
+            self._listener = conn
+        except Exception as e:
+            self._listener = None
+            logger.warning(f"Catalog LISTEN unavailable, relying on periodic refresh: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.stats["notifications"] += 1
+        self._refresh_requested.set()
+
+    def _on_listener_lost(self, connection) -> None:
+        logger.warning("Catalog LISTEN connection lost")
+        self._listener = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._refresh_requested.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refresh_requested.clear()
+            if self._listener is None or self._listener.is_closed():
+                await self._listen()
+            await self.refresh()
+
+    def get(self, insurance_id: int) -> Optional[Dict[str, Any]]:
+        product = self._by_id.get(int(insurance_id))
+        self.stats["hits"] += 1
+        return dict(product) if product else None
+
+    def by_type(self, insurance_type: str, limit: int = 25) -> List[Dict[str, Any]]:
+        self.stats["hits"] += 1
+        return [dict(p) for p in self._by_type.get(insurance_type.lower(), [])[:limit]]
+
+    def by_name(self, fragment: str, limit: int = 25) -> List[Dict[str, Any]]:
+        """Accent- and case-insensitive substring match on the product name."""
+        self.stats["hits"] += 1
+        needle = Lexicon.fold(fragment)
+        return [dict(p) for folded, p in self._names if needle in folded][:limit]
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Products most similar to a free-text question, each with its `score`."""
+        self.stats["hits"] += 1
+        hits = self._index.search(query, limit, settings.product_search_min_score)
+        return [{**p, "score": round(score, 3)} for p, score in hits]
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._listener is not None and not self._listener.is_closed():
+            self._listener.remove_termination_listener(self._on_listener_lost)
+            await self._listener.close()
+        self._listener = None
+        self._ready = False
+
+
+catalog_cache = CatalogCache(refresh_interval=settings.catalog_refresh_interval)
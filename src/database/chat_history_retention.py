@@ -0,0 +1,166 @@
+"""Retention for the monthly chat_histories partitions
+(migrations/0008_partition_chat_histories.sql).
+
+Partitions whose month ended more than `chat_history_retention_months` ago
+are detached, written to `<chat_history_archive_dir>/<partition>.csv.gz`
+with a header row, and dropped once the archive holds every row, together
+with that month's chat_history_message_ids. Each step can be re-run: a
+partition left detached or half-detached by an interrupted run is picked up
+again. The next month's partition is created ahead of
+time as well, so the first write of a month does not have to.
+
+    python -m src.database.chat_history_retention [--dry-run]
+
+Run it from cron, e.g. daily.
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from src.config import settings
+from .admission import Priority
+from .connection import db_manager
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_NAME = re.compile(r"^chat_histories_p(\d{4})_(\d{2})$")
+_COLUMNS = ["id", "is_bot", "d_name", "message_id", "text", "from_id", "created_at"]
+
+# Attached partitions, plus ones an interrupted run already detached but did not drop.
+LIST_PARTITIONS_SQL = register_statement(
+    "chat_history.list_partitions",
+    r"""
+    SELECT c.relname AS name, i.inhrelid IS NOT NULL AS attached, COALESCE(i.inhdetachpending, FALSE) AS detach_pending
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = 'public'
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = 'public.chat_histories'::regclass
+    WHERE c.relkind = 'r' AND c.relname ~ '^chat_histories_p\d{4}_\d{2}$'
+    ORDER BY c.relname
+    """,
+)
+# Message ids of an archived month, by the same UTC bounds as its partition; the sink
+# dedupes against chat_history_message_ids.
+FORGET_MESSAGE_IDS_SQL = register_statement(
+    "chat_history.forget_message_ids",
+    """
+    DELETE FROM public.chat_history_message_ids
+    WHERE created_at >= ($1::date::timestamp AT TIME ZONE 'UTC')
+      AND created_at < (($1::date + INTERVAL '1 month') AT TIME ZONE 'UTC')
+    """,
+)
+ENSURE_AHEAD_SQL = register_statement(
+    "chat_history.ensure_partitions_ahead",
+    "SELECT ensure_chat_history_partitions(now(), now() + INTERVAL '1 month')",
+)
+
+
+class Partition(NamedTuple):
+    name: str
+    month: date
+    attached: bool
+    detach_pending: bool
+
+
+def _cutoff(today: date, retention_months: int) -> date:
+    """First month that is kept: partitions of earlier months are expired."""
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def list_partitions() -> List[Partition]:
+    rows = await db_manager.fetch_all(LIST_PARTITIONS_SQL, priority=Priority.BACKGROUND)
+    partitions = []
+    for row in rows:
+        match = _PARTITION_NAME.match(row["name"])
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        partitions.append(Partition(row["name"], month, row["attached"], row["detach_pending"]))
+    return partitions
+
+
+async def expired_partitions(retention_months: int, today: Optional[date] = None) -> List[Partition]:
+    cutoff = _cutoff(today or datetime.now(timezone.utc).date(), retention_months)
+    return [p for p in await list_partitions() if p.month < cutoff]
+
+
+async def _detach(partition: Partition) -> None:
+    if partition.detach_pending:
+        await db_manager.execute(
+            f'ALTER TABLE public.chat_histories DETACH PARTITION public."{partition.name}" FINALIZE',
+            priority=Priority.BACKGROUND,
+        )
+    elif partition.attached:
+        # CONCURRENTLY does not block inserts into current months while it waits.
+        await db_manager.execute(
+            f'ALTER TABLE public.chat_histories DETACH PARTITION public."{partition.name}" CONCURRENTLY',
+            priority=Priority.BACKGROUND,
+        )
+
+
+async def _write_archive(name: str, directory: Path) -> int:
+    """COPYs a detached partition into a gzip file; returns the rows written."""
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{name}.csv.gz"
+    partial = directory / f"{name}.csv.gz.part"
+    async with db_manager.pool.acquire() as conn:
+        with gzip.open(partial, "wb") as out:
+            status = await conn.copy_from_table(
+                name, schema_name="public", columns=_COLUMNS, output=out, format="csv", header=True
+            )
+            out.flush()
+            os.fsync(out.fileobj.fileno())
+        expected = await conn.fetchval(f'SELECT count(*) FROM public."{name}"')
+    copied = int(status.split()[-1])
+    if copied != expected:
+        partial.unlink(missing_ok=True)
+        raise RuntimeError(f"Archive of {name} has {copied} rows, table has {expected}")
+    os.replace(partial, target)
+    return copied
+
+
+async def archive_partition(partition: Partition, directory: Path) -> int:
+    """Detaches, archives and drops one partition; returns the rows archived."""
+    await _detach(partition)
+    rows = await _write_archive(partition.name, directory)
+    # Before the drop: once the partition is gone a re-run no longer sees this month.
+    await db_manager.execute(FORGET_MESSAGE_IDS_SQL, [partition.month], priority=Priority.BACKGROUND)
+    await db_manager.execute(f'DROP TABLE public."{partition.name}"', priority=Priority.BACKGROUND)
+    logger.info(f"Archived {rows} chat history rows from {partition.name} to {directory}")
+    return rows
+
+
+async def run_retention(dry_run: bool = False) -> List[Partition]:
+    await db_manager.fetch_one(ENSURE_AHEAD_SQL, priority=Priority.BACKGROUND)
+    expired = await expired_partitions(settings.chat_history_retention_months)
+    if not dry_run:
+        for partition in expired:
+            await archive_partition(partition, Path(settings.chat_history_archive_dir))
+    return expired
+
+
+async def main(dry_run: bool) -> int:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        expired = await run_retention(dry_run)
+        verb = "Would archive" if dry_run else "Archived"
+        print(f"{verb} {len(expired)} partitions older than {settings.chat_history_retention_months} months"
+              + "".join(f"\n  {p.name}" for p in expired))
+        return 0
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="list the expired partitions without archiving them")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.dry_run)))
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Iterable, Optional, Set, Tuple
+
+from src.common.exceptions import DatabaseException
+from src.config import settings
+from .admission import Priority
+from .connection import UnitOfWork, db_manager
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+# (is_bot, message_id, text, from_id, created_at)
+HistoryRecord = Tuple[bool, str, str, str, datetime]
+
+_COLUMNS = ["is_bot", "message_id", "text", "from_id", "created_at"]
+
+CREATE_STAGING_SQL = register_statement(
+    "chat_history.create_staging",
+    """
+    CREATE TEMP TABLE IF NOT EXISTS chat_histories_staging (
+        is_bot      BOOLEAN NOT NULL,
+        message_id  TEXT NOT NULL,
+        text        TEXT,
+        from_id     TEXT,
+        created_at  TIMESTAMPTZ NOT NULL
+    ) ON COMMIT DELETE ROWS
+    """,
+)
+# A message queued twice gets a fresh created_at the second time, which the partitioned
+# table's UNIQUE (message_id, created_at) cannot catch. Each message_id is claimed in
+# chat_history_message_ids first (migrations/0011_chat_history_message_ids.sql), and only the
+# claimed messages are inserted, so a retried flush or a message queued again adds nothing.
+MERGE_STAGING_SQL = register_statement(
+    "chat_history.merge_staging",
+    """
+    WITH batch AS (
+        SELECT DISTINCT ON (message_id) is_bot, message_id, text, from_id, created_at
+        FROM chat_histories_staging
+        ORDER BY message_id, created_at
+    ), claimed AS (
+        INSERT INTO public.chat_history_message_ids (message_id, created_at)
+        SELECT message_id, created_at FROM batch
+        ON CONFLICT (message_id) DO NOTHING
+        RETURNING message_id
+    )
+    INSERT INTO public.chat_histories (is_bot, message_id, text, from_id, created_at)
+    SELECT b.is_bot, b.message_id, b.text, b.from_id, b.created_at
+    FROM batch b
+    JOIN claimed c ON c.message_id = b.message_id
+    ORDER BY b.created_at
+    """,
+)
+# chat_histories is partitioned by month (migrations/0008_partition_chat_histories.sql).
+ENSURE_PARTITIONS_SQL = register_statement(
+    "chat_history.ensure_partitions",
+    "SELECT ensure_chat_history_partitions($1, $2)",
+)
+
+
+class ChatHistorySink:
+    """Write-behind buffer for chat_histories shared by every session.
+
+    Messages are queued in memory with the time they were produced and
+    flushed every `flush_interval` seconds, or as soon as `batch_size` are
+    waiting: one COPY into a per-connection temp staging table and one
+    INSERT ... SELECT into chat_histories, in a single transaction. A failed
+    flush puts its records back at the head of the queue, so delivery is
+    at-least-once and the merge keeps it idempotent on message_id: a message
+    whose id is already stored, by a retry or an earlier enqueue, is dropped
+    for as long as its month is retained. The first flush into a month the
+    process has not written before creates that month's partition if needed.
+    When `max_buffer` records are waiting, a producer first tries to flush
+    itself and is refused with DatabaseException if that does not free room.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        batch_size: int = 500,
+        max_buffer: int = 20000,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._buffer: Deque[HistoryRecord] = deque()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._partitions: Set[Tuple[int, int]] = set()
+        self.stats = {"enqueued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0}
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def enqueue(self, records: Iterable[Tuple[bool, str, str, str]]) -> None:
+        """Queues (is_bot, message_id, text, from_id) rows, stamping created_at now."""
+        now = datetime.now(timezone.utc)
+        # One microsecond apart, so ordering by created_at keeps the order the messages were given in.
+        batch = [
+            (is_bot, message_id, text, from_id, now + timedelta(microseconds=i))
+            for i, (is_bot, message_id, text, from_id) in enumerate(records)
+        ]
+        if not batch:
+            return
+        if self._closed:
+            # Late writes during shutdown go straight to the database.
+            self._buffer.extend(batch)
+            await self.flush()
+            return
+        self._ensure_started()
+        if len(self._buffer) >= self.max_buffer:
+            await self.flush()
+            if len(self._buffer) >= self.max_buffer:
+                raise DatabaseException(
+                    f"Chat history buffer is full ({len(self._buffer)} records waiting)",
+                    error_code="chat_history_buffer_full",
+                )
+        self._buffer.extend(batch)
+        self.stats["enqueued"] += len(batch)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Writes everything queued so far; returns the number of records written."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                count = min(len(self._buffer), self.batch_size * 4)
+                records = [self._buffer.popleft() for _ in range(count)]
+                try:
+                    await self._write(records)
+                except BaseException as e:
+                    self._buffer.extendleft(reversed(records))
+                    if not isinstance(e, Exception):
+                        raise
+                    self.stats["failed_flushes"] += 1
+                    logger.error(f"Chat history flush of {len(records)} records failed, will retry: {e}")
+                    break
+                written += count
+                self.stats["flushes"] += 1
+                self.stats["flushed"] += count
+                for from_id in {r[3] for r in records}:
+                    db_manager.mark_write(from_id)
+            return written
+
+    async def _write(self, records: list) -> None:
+        if not db_manager.pool:
+            raise ConnectionError("Database pool is not initialized.")
+        await self._ensure_partitions(records)
+
+        async def _copy_and_merge(uow: UnitOfWork):
+            await uow.execute(CREATE_STAGING_SQL)
+            await uow.connection.copy_records_to_table(
+                "chat_histories_staging", records=records, columns=_COLUMNS
+            )
+            await uow.execute(MERGE_STAGING_SQL)
+
+        await db_manager.run_in_transaction(_copy_and_merge, priority=Priority.BACKGROUND)
+
+    async def _ensure_partitions(self, records: list) -> None:
+        months = {(r[4].year, r[4].month) for r in records}
+        if months <= self._partitions:
+            return
+        # Its own short transaction: creating a partition briefly locks the whole table.
+        stamps = [r[4] for r in records]
+        await db_manager.fetch_one(ENSURE_PARTITIONS_SQL, [min(stamps), max(stamps)], priority=Priority.BACKGROUND)
+        self._partitions |= months
+
+    async def close(self) -> None:
+        """Stops the background flusher and writes whatever is still queued."""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} chat history records could not be written on shutdown")
+
+
+chat_history_sink = ChatHistorySink(
+    flush_interval=settings.chat_history_flush_interval,
+    batch_size=settings.chat_history_batch_size,
+    max_buffer=settings.chat_history_max_buffer,
+)
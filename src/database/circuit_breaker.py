@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.common.exceptions import CircuitOpenException
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class _RollingWindow:
+    """Call and failure counts over the last `seconds`, in one-second buckets."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._buckets: Deque[List[int]] = deque()
+
+    def add(self, failed: bool) -> None:
+        now = int(time.monotonic())
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += int(failed)
+
+    def totals(self) -> Tuple[int, int]:
+        horizon = time.monotonic() - self.seconds
+        while self._buckets and self._buckets[0][0] < horizon:
+            self._buckets.popleft()
+        return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for a backend such as Postgres or Redis.
+
+    While closed, outcomes are tracked over a rolling window and the breaker
+    opens once at least `min_calls` calls saw a `failure_rate` share of
+    failures. While open, calls fail immediately with `CircuitOpenException`
+    and `probe` is retried in the background every `probe_interval` seconds.
+    A successful probe moves the breaker to half-open, where
+    `half_open_max_calls` real calls are let through: if they all succeed the
+    breaker closes, and any failure opens it again.
+
+    Only errors accepted by `is_failure` count against the backend; a
+    constraint violation, for instance, proves the backend is reachable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: Optional[Callable[[], Awaitable[object]]] = None,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 30.0,
+        probe_interval: float = 5.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.probe = probe
+        self.is_failure = is_failure or (lambda e: True)
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.probe_interval = probe_interval
+        self.half_open_max_calls = half_open_max_calls
+        self._window = _RollingWindow(window_seconds)
+        self._state = BreakerState.CLOSED
+        self._opened_at: Optional[float] = None
+        self._trial_calls = 0
+        self._trial_successes = 0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._rejected = 0
+        self._trips = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self._state == BreakerState.OPEN
+
+    def before_call(self) -> None:
+        """Raises `CircuitOpenException` unless a call may go through now."""
+        if self._state == BreakerState.CLOSED:
+            return
+        if self._state == BreakerState.OPEN and (self._probe_task is None or self._probe_task.done()):
+            # Without a background probe the first call after the interval acts as one.
+            if time.monotonic() - self._opened_at >= self.probe_interval:
+                self._half_open()
+        if self._state == BreakerState.HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+            self._trial_calls += 1
+            return
+        self._reject()
+
+    def reject_if_open(self) -> None:
+        """Raises `CircuitOpenException` while open, without taking a half-open trial call.
+
+        For callers about to wait for another resource (a pool slot) before entering
+        guard(): they fail at once instead of after the wait. A call that would act as
+        the probe (open past `probe_interval` with no background probe) is let through.
+        """
+        if self._state != BreakerState.OPEN:
+            return
+        if (self._probe_task is None or self._probe_task.done()) and time.monotonic() - self._opened_at >= self.probe_interval:
+            return
+        self._reject()
+
+    def _reject(self) -> None:
+        self._rejected += 1
+        raise CircuitOpenException(
+            f"{self.name} is unavailable (circuit {self._state.value}), failing fast",
+            error_code="circuit_open",
+        )
+
+    def record_success(self) -> None:
+        if self._state == BreakerState.HALF_OPEN:
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_max_calls:
+                self._close()
+        elif self._state == BreakerState.CLOSED:
+            self._window.add(False)
+
+    def record_failure(self, error: Exception) -> None:
+        self._last_error = f"{error.__class__.__name__}: {error}"
+        if self._state == BreakerState.HALF_OPEN:
+            self.trip()
+        elif self._state == BreakerState.CLOSED:
+            self._window.add(True)
+            calls, failures = self._window.totals()
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self.trip()
+
+    def record_abandoned(self) -> None:
+        """A call was cancelled before it produced an outcome."""
+        if self._state == BreakerState.HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    @asynccontextmanager
+    async def guard(self):
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self.record_abandoned()
+            raise
+        else:
+            self.record_success()
+
+    def trip(self, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            self._last_error = f"{error.__class__.__name__}: {error}"
+        if self._state != BreakerState.OPEN:
+            self._trips += 1
+            logger.warning(f"Circuit '{self.name}' opened: {self._last_error}")
+        self._state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            try:
+                self._probe_task = asyncio.get_running_loop().create_task(self._probe_until_healthy())
+            except RuntimeError:
+                # No running loop: the next call after probe_interval acts as the probe.
+                self._probe_task = None
+
+    async def _probe_until_healthy(self) -> None:
+        while self._state == BreakerState.OPEN:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await asyncio.wait_for(self.probe(), timeout=self.probe_interval)
+            except Exception as e:
+                self._last_error = f"{e.__class__.__name__}: {e}"
+                logger.debug(f"Circuit '{self.name}' probe failed: {e}")
+                continue
+            if self._state == BreakerState.OPEN:
+                self._half_open()
+
+    def _half_open(self) -> None:
+        self._state = BreakerState.HALF_OPEN
+        self._trial_calls = 0
+        self._trial_successes = 0
+        logger.info(f"Circuit '{self.name}' half-open, letting trial calls through")
+
+    def _close(self) -> None:
+        self._state = BreakerState.CLOSED
+        self._opened_at = None
+        self._window.clear()
+        logger.info(f"Circuit '{self.name}' closed, {self.name} recovered")
+
+    async def close(self) -> None:
+        if self._probe_task:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def snapshot(self) -> Dict[str, object]:
+        calls, failures = self._window.totals()
+        return {
+            "state": self._state.value,
+            "window_calls": calls,
+            "window_failures": failures,
+            "open_for_seconds": round(time.monotonic() - self._opened_at, 3) if self._opened_at else None,
+            "trips": self._trips,
+            "rejected": self._rejected,
+            "last_error": self._last_error,
+        }
@@ -1,25 +1,119 @@
 import logging
-import threading
 import asyncpg
 import asyncio
-from typing import Optional, Callable, Awaitable, TypeVar
+import time
+from contextlib import nullcontext
+from typing import Optional, Callable, Awaitable, TypeVar, Union, Dict, Any, List, Hashable, Sequence
 from asyncpg import Pool
-import redis
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 
 T = TypeVar('T')
 
 from src.config import settings
-from src.common.exceptions import DatabaseException
+from src.common.exceptions import CircuitOpenException, DatabaseException, PoolSaturatedException
+from .admission import AdmissionController, Priority
+from .circuit_breaker import CircuitBreaker
+from .loader import BatchLoader
+from .query_stats import query_stats
+from .replicas import ReadIntent, Replica, ReplicaSet, parse_hosts
+from .statements import Statement, statement_registry
+
+Query = Union[str, Statement]
 
 logger = logging.getLogger(__name__)
 
+# SQLSTATE 40001/40P01: the transaction lost a race and is safe to run again from scratch.
+_RETRYABLE_TX_ERRORS = (asyncpg.SerializationError, asyncpg.DeadlockDetectedError)
+
+
+class UnitOfWork:
+    """Statements issued through one checked-out connection inside one transaction.
+
+    Handed to the callable passed to `DatabaseManager.run_in_transaction`; the
+    methods mirror DatabaseManager's and feed the same query statistics.
+    """
+
+    def __init__(self, connection: asyncpg.Connection):
+        self.connection = connection
+
+    async def fetch_one(self, query: Query, params: list = None):
+        return await self._run(self.connection.fetchrow, query, params)
+
+    async def fetch_all(self, query: Query, params: list = None):
+        return await self._run(self.connection.fetch, query, params)
+
+    async def execute(self, query: Query, params: list = None):
+        return await self._run(self.connection.execute, query, params)
+
+    async def _run(self, method: Callable[..., Awaitable[T]], query: Query, params: Optional[list]) -> T:
+        start = time.perf_counter()
+        try:
+            result = await method(DatabaseManager._sql(query), *(params or []))
+        except Exception:
+            DatabaseManager._record(query, start, None, 0, error=True)
+            raise
+        DatabaseManager._record(query, start, result, 0, error=False)
+        return result
+
 
 class DatabaseManager:
     def __init__(self):
         self.pool: Optional[Pool] = None
         self._initialized = False
         self._init_lock = asyncio.Lock()
-        self._connection_semaphore = asyncio.Semaphore(10)
+        self._admission = AdmissionController(
+            capacity=settings.db_pool_max_size,
+            interactive_reserved=settings.db_interactive_reserved,
+            acquire_timeout=settings.db_acquire_timeout,
+        )
+        self._use_registry = False
+        self._replicas = ReplicaSet(
+            max_lag_seconds=settings.db_replica_max_lag_seconds,
+            sticky_seconds=settings.db_read_your_writes_seconds,
+        )
+        self._loaders: Dict[str, BatchLoader] = {}
+        self.breaker = CircuitBreaker(
+            "postgres",
+            probe=self._probe,
+            is_failure=self._is_outage,
+            failure_rate=settings.circuit_failure_rate,
+            min_calls=settings.circuit_min_calls,
+            window_seconds=settings.circuit_window_seconds,
+            probe_interval=settings.circuit_probe_interval,
+        )
+
+    @staticmethod
+    def _connect_kwargs(host: str, port: int) -> Dict[str, Any]:
+        return dict(
+            host=host,
+            port=port,
+            user=settings.db_user,
+            password=settings.db_password,
+            database=settings.db_name,
+            ssl='require',
+            command_timeout=30,
+            server_settings={
+                'application_name': 'insurance_chatbot',
+                'statement_timeout': '30s'
+            }
+        )
+
+    async def _create_pool(self, host: str, port: int, min_size: int, max_size: int) -> Pool:
+        cache_size = max(settings.db_statement_cache_size, len(statement_registry)) if self._use_registry else 0
+        return await asyncpg.create_pool(
+            **self._connect_kwargs(host, port),
+            statement_cache_size=cache_size,
+            max_cached_statement_lifetime=0,
+            min_size=min_size,
+            max_size=max_size,
+            max_inactive_connection_lifetime=60,
+        )
+
+    async def connect(self) -> asyncpg.Connection:
+        """Opens a dedicated connection to the primary outside the pool, for
+        long-lived sessions such as LISTEN. The caller owns and closes it."""
+        return await asyncpg.connect(**self._connect_kwargs(settings.db_host, settings.db_port))
 
     async def initialize(self) -> None:
         async with self._init_lock:
@@ -27,31 +121,54 @@ class DatabaseManager:
                 return
             try:
                 logger.info(f"Connecting to database: {settings.db_host}:{settings.db_port}")
-                self.pool = await asyncpg.create_pool(
-                    host=settings.db_host,
-                    port=settings.db_port,
-                    user=settings.db_user,
-                    password=settings.db_password,
-                    database=settings.db_name,
-                    ssl='require',
-                    statement_cache_size=0,
-                    min_size=2,
-                    max_size=10,
-                    command_timeout=30,
-                    max_inactive_connection_lifetime=60,
-                    server_settings={
-                        'application_name': 'insurance_chatbot',
-                        'statement_timeout': '30s'
-                    }
+                # Named prepared statements do not survive pgbouncer transaction pooling,
+                # so the registry falls back to sending plain SQL text in that mode.
+                self._use_registry = settings.db_prepared_statements and not settings.db_pgbouncer_mode
+                self.pool = await self._create_pool(
+                    settings.db_host, settings.db_port,
+                    settings.db_pool_min_size, settings.db_pool_max_size,
                 )
                 async with self.pool.acquire() as conn:
                     await conn.fetchval("SELECT 1")
                 self._initialized = True
-                logger.info("Database connection pool initialized successfully")
+                logger.info(
+                    "Database connection pool initialized successfully "
+                    f"(prepared statement registry: {'on' if self._use_registry else 'off'}, "
+                    f"{len(statement_registry)} statements registered)"
+                )
             except Exception as e:
                 logger.error(f"Failed to initialize database: {str(e)}")
                 self.pool = None
                 self._initialized = False
+                # Open the breaker so its probe keeps retrying the connection in the background.
+                self.breaker.trip(e)
+                return
+            await self._initialize_replicas()
+            query_stats.enabled = settings.db_query_stats_enabled
+            query_stats.start_periodic_log(settings.db_query_stats_log_interval)
+
+    async def _initialize_replicas(self) -> None:
+        """Opens one pool per configured replica. A replica that cannot be reached
+        stays out of rotation; reads then simply go to the primary."""
+        for host, port in parse_hosts(settings.db_replica_hosts, settings.db_port):
+            replica = Replica(
+                host=host,
+                port=port,
+                admission=AdmissionController(
+                    capacity=settings.db_replica_pool_max_size,
+                    acquire_timeout=settings.db_acquire_timeout,
+                ),
+            )
+            try:
+                logger.info(f"Connecting to read replica: {replica.name}")
+                replica.pool = await self._create_pool(host, port, 1, settings.db_replica_pool_max_size)
+            except Exception as e:
+                replica.last_error = str(e)
+                logger.error(f"Failed to initialize read replica {replica.name}: {e}")
+            self._replicas.add(replica)
+        if self._replicas.replicas:
+            await self._replicas.refresh_lag()
+            self._replicas.start_monitor(settings.db_replica_lag_check_interval)
 
     def _is_transient(self, e: Exception) -> bool:
         transient_types = (
@@ -62,15 +179,52 @@ class DatabaseManager:
         )
         return isinstance(e, transient_types)
 
-    async def _with_retry(self, op: Callable[[], Awaitable[T]], retries: int = 3) -> T:
+    def _is_outage(self, e: Exception) -> bool:
+        """Errors that say the primary is unreachable, as opposed to a bad query."""
+        return (self._is_transient(e) or
+                isinstance(e, (OSError, asyncio.TimeoutError)) or
+                'connection was closed' in str(e).lower())
+
+    async def _probe(self) -> None:
+        if not self.pool:
+            await self.initialize()
+        if not self.pool:
+            raise DatabaseException("Database pool is not initialized.")
+        await self.pool.fetchval("SELECT 1", timeout=settings.circuit_probe_interval)
+
+    async def _with_retry(
+        self,
+        op: Callable[[Pool], Awaitable[T]],
+        retries: int = 3,
+        operation: str = "query",
+        priority: Optional[Priority] = None,
+        replica: Optional[Replica] = None,
+        query: Optional[Query] = None,
+    ) -> T:
         last_exc: Optional[Exception] = None
         base_delay = 0.2
+        admission = replica.admission if replica else self._admission
+        start = time.perf_counter()
         for attempt in range(retries + 1):
             try:
-                async with self._connection_semaphore:
-                    if not self.pool or self.pool.is_closing():
+                # The admission slot is held only while the operation runs; the backoff
+                # sleep below happens after it has been released. Replicas have their own
+                # health tracking, so only primary calls go through the breaker, which
+                # also stops the retry loop as soon as it opens. An open breaker fails
+                # the call before it queues for a slot; guard() checks again after the
+                # wait, in case it opened meanwhile.
+                if replica is None:
+                    self.breaker.reject_if_open()
+                breaker = self.breaker.guard() if replica is None else nullcontext()
+                async with admission.slot(operation, priority), breaker:
+                    pool = replica.pool if replica else self.pool
+                    if not pool or pool.is_closing():
                         raise DatabaseException("Database pool is not initialized or is closed.")
-                    return await op()
+                    result = await op(pool)
+                self._record(query, start, result, attempt, error=False)
+                return result
+            except CircuitOpenException:
+                raise
             except Exception as e:
                 last_exc = e
                 error_msg = str(e).lower()
@@ -87,48 +241,221 @@ class DatabaseManager:
                     jitter = 0.05 * (attempt + 1)
                     await asyncio.sleep(delay + jitter)
                     continue
+                self._record(query, start, None, attempt, error=True)
                 raise
         assert last_exc
         raise last_exc
 
+    @staticmethod
+    def _record(query: Optional[Query], start: float, result: Any, retries: int, error: bool) -> None:
+        if query is None:
+            return
+        if isinstance(result, list):
+            rows = len(result)
+        elif isinstance(result, asyncpg.Record):
+            rows = 1
+        else:
+            rows = 0
+        query_stats.record(
+            DatabaseManager._sql(query),
+            (time.perf_counter() - start) * 1000,
+            rows=rows,
+            retries=retries,
+            error=error,
+            name=query.name if isinstance(query, Statement) else None,
+        )
 
-    async def fetch_one(self, query: str, params: list = None):
-        async def _op():
-            async with self.pool.acquire() as conn:
+
+    @staticmethod
+    def _sql(query: Query) -> str:
+        return query.sql if isinstance(query, Statement) else query
+
+    async def _read(
+        self,
+        op: Callable[[Pool], Awaitable[T]],
+        query: Query,
+        operation: str,
+        priority: Optional[Priority],
+        intent: ReadIntent,
+        sticky_key: Optional[str],
+    ) -> T:
+        replica = self._replicas.choose(intent, sticky_key)
+        if replica:
+            try:
+                return await self._with_retry(
+                    op, retries=0, operation=operation, priority=priority, replica=replica, query=query
+                )
+            except PoolSaturatedException:
+                logger.debug(f"Replica {replica.name} saturated, spilling '{operation}' over to the primary")
+            except Exception as e:
+                if not self._is_transient(e) and not isinstance(e, DatabaseException):
+                    raise
+                self._replicas.mark_unhealthy(replica, e)
+        return await self._with_retry(op, operation=operation, priority=priority, query=query)
+
+    def mark_write(self, key: Optional[str]) -> None:
+        """Records a write for `key` so its replica-eligible reads stay on the
+        primary for DB_READ_YOUR_WRITES_SECONDS."""
+        self._replicas.mark_write(key)
+
+    async def fetch_one(
+        self,
+        query: Query,
+        params: list = None,
+        priority: Optional[Priority] = None,
+        intent: ReadIntent = ReadIntent.PRIMARY,
+        sticky_key: Optional[str] = None,
+    ):
+        async def _op(pool: Pool):
+            async with pool.acquire() as conn:
                 if params:
-                    return await conn.fetchrow(query, *params)
-                return await conn.fetchrow(query)
-        return await self._with_retry(_op)
+                    return await conn.fetchrow(self._sql(query), *params)
+                return await conn.fetchrow(self._sql(query))
+        return await self._read(_op, query, "fetch_one", priority, intent, sticky_key)
 
-    async def fetch_all(self, query: str, params: list = None):
-        async def _op():
-            async with self.pool.acquire() as conn:
+    async def fetch_all(
+        self,
+        query: Query,
+        params: list = None,
+        priority: Optional[Priority] = None,
+        intent: ReadIntent = ReadIntent.PRIMARY,
+        sticky_key: Optional[str] = None,
+    ):
+        async def _op(pool: Pool):
+            async with pool.acquire() as conn:
                 if params:
-                    return await conn.fetch(query, *params)
-                return await conn.fetch(query)
-        return await self._with_retry(_op)
+                    return await conn.fetch(self._sql(query), *params)
+                return await conn.fetch(self._sql(query))
+        return await self._read(_op, query, "fetch_all", priority, intent, sticky_key)
 
-    async def execute(self, query: str, params: list = None):
-        async def _op():
-            async with self.pool.acquire() as conn:
+    async def run_in_transaction(
+        self,
+        fn: Callable[[UnitOfWork], Awaitable[T]],
+        isolation: str = "read_committed",
+        retries: int = 3,
+        priority: Optional[Priority] = None,
+    ) -> T:
+        """Runs `fn` on a single connection inside one transaction.
+
+        The connection is checked out once for the whole unit of work. When the
+        transaction fails with a serialization failure or deadlock it is rolled
+        back and `fn` runs again, up to `retries` times, so `fn` must not have
+        side effects outside the database. `isolation` is one of
+        'read_committed', 'repeatable_read' or 'serializable'.
+        """
+        async def _op(pool: Pool) -> T:
+            async with pool.acquire() as conn:
+                for attempt in range(retries + 1):
+                    try:
+                        async with conn.transaction(isolation=isolation):
+                            return await fn(UnitOfWork(conn))
+                    except _RETRYABLE_TX_ERRORS as e:
+                        if attempt >= retries:
+                            raise
+                        logger.warning(
+                            "Transaction retry %d/%d (%s): %s",
+                            attempt + 1, retries + 1, e.__class__.__name__, str(e)
+                        )
+                        await asyncio.sleep(0.01 * (2 ** attempt))
+        return await self._with_retry(_op, operation="transaction", priority=priority)
+
+    def batch_loader(
+        self,
+        query: Statement,
+        key_columns: Sequence[str],
+        intent: ReadIntent = ReadIntent.PRIMARY,
+        sticky_key: Optional[Callable[[Hashable], Optional[str]]] = None,
+    ) -> BatchLoader:
+        """Returns the coalescing loader for a batched point-lookup statement.
+
+        The statement takes one array parameter per key column (`= ANY($1)` for a
+        single column, `unnest($1, $2)` for composite keys) and must return the key
+        columns in each row. Keys loaded in the same event-loop tick are resolved
+        by one query; a key without a row resolves to None. For replica-eligible
+        lookups, `sticky_key` maps a key to its read-your-writes key and the whole
+        batch goes to the primary if any of them was written recently.
+        """
+        loader = self._loaders.get(query.name)
+        if loader is not None:
+            return loader
+
+        async def _batch(keys: List[Hashable]) -> Dict[Hashable, asyncpg.Record]:
+            if len(key_columns) == 1:
+                params = [list(keys)]
+            else:
+                params = [list(column) for column in zip(*keys)]
+            batch_intent = intent
+            if sticky_key and any(self._replicas.is_sticky(sticky_key(k)) for k in keys):
+                batch_intent = ReadIntent.PRIMARY
+            rows = await self.fetch_all(query, params, intent=batch_intent)
+            found: Dict[Hashable, asyncpg.Record] = {}
+            for row in rows:
+                key = row[key_columns[0]] if len(key_columns) == 1 else tuple(row[c] for c in key_columns)
+                found.setdefault(key, row)
+            return found
+
+        loader = BatchLoader(_batch, max_batch_size=settings.db_loader_max_batch_size, name=query.name)
+        self._loaders[query.name] = loader
+        return loader
+
+    async def execute(self, query: Query, params: list = None, priority: Optional[Priority] = None):
+        async def _op(pool: Pool):
+            async with pool.acquire() as conn:
                 if params:
-                    return await conn.execute(query, *params)
-                return await conn.execute(query)
-        return await self._with_retry(_op)
+                    return await conn.execute(self._sql(query), *params)
+                return await conn.execute(self._sql(query))
+        return await self._with_retry(_op, operation="execute", priority=priority, query=query)
 
-    async def execute_many(self, query: str, params_list: list):
-        async def _op():
-            async with self.pool.acquire() as conn:
+    async def execute_many(self, query: Query, params_list: list, priority: Optional[Priority] = None):
+        async def _op(pool: Pool):
+            async with pool.acquire() as conn:
                 async with conn.transaction():
-                    return await conn.executemany(query, params_list)
-        return await self._with_retry(_op)
+                    return await conn.executemany(self._sql(query), params_list)
+        return await self._with_retry(_op, operation="execute_many", priority=priority, query=query)
+
+    async def health_check(self) -> bool:
+        """Round-trips a SELECT 1; False without one while the breaker is open."""
+        if not self.pool or self.breaker.is_open:
+            return False
+        try:
+            async with self.breaker.guard():
+                await self.pool.fetchval("SELECT 1", timeout=2)
+            return True
+        except Exception as e:
+            logger.warning(f"Database health check failed: {e}")
+            return False
 
     async def get_pool(self) -> Pool:
         if not self.pool:
             raise DatabaseException("Database pool not initialized")
         return self.pool
 
+    def pool_stats(self) -> Dict[str, Any]:
+        """Live pool gauges plus admission queue depth and acquire-wait histograms."""
+        stats: Dict[str, Any] = {"initialized": self._initialized, "circuit_breaker": self.breaker.snapshot()}
+        if self.pool:
+            size = self.pool.get_size()
+            idle = self.pool.get_idle_size()
+            stats["pool"] = {
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size(),
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle,
+            }
+        stats["admission"] = self._admission.snapshot()
+        stats["replicas"] = self._replicas.snapshot()
+        stats["loaders"] = {name: dict(loader.stats) for name, loader in self._loaders.items()}
+        return stats
+
+    def query_stats(self, top: Optional[int] = None, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        """Per-fingerprint call count, rows, retries and p50/p95/p99 latency."""
+        return query_stats.snapshot(top=top, order_by=order_by)
+
     async def close(self) -> None:
+        await self.breaker.close()
+        await query_stats.stop_periodic_log()
+        await self._replicas.close()
         if self.pool:
             await self.pool.close()
             self._initialized = False
@@ -137,38 +464,87 @@ class DatabaseManager:
 
 class RedisManager:
     def __init__(self):
-        self._client: Optional[redis.Redis] = None
-        self._init_lock = threading.Lock()
+        self._client: Optional[aioredis.Redis] = None
+        self._pool: Optional[aioredis.BlockingConnectionPool] = None
+        self._init_lock = asyncio.Lock()
+        self.breaker = CircuitBreaker(
+            "redis",
+            probe=self._probe,
+            is_failure=lambda e: isinstance(e, (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)),
+            failure_rate=settings.circuit_failure_rate,
+            min_calls=settings.circuit_min_calls,
+            window_seconds=settings.circuit_window_seconds,
+            probe_interval=settings.circuit_probe_interval,
+        )
 
-    def initialize(self):
-        with self._init_lock:
+    async def initialize(self):
+        async with self._init_lock:
             if self._client is not None:
                 return
             try:
                 if not settings.redis_url:
                     raise ConnectionError("REDIS_URL is not configured in your settings/.env file.")
-                
+
                 logger.info(f"Connecting to Redis at {settings.redis_url}")
-                self._client = redis.from_url(settings.redis_url)
-                self._client.ping()
+                # Bounded pool: callers wait up to redis_pool_timeout for a free
+                # connection instead of opening unlimited sockets under bursts.
+                self._pool = aioredis.BlockingConnectionPool.from_url(
+                    settings.redis_url,
+                    max_connections=settings.redis_max_connections,
+                    timeout=settings.redis_pool_timeout,
+                    health_check_interval=settings.redis_health_check_interval,
+                    socket_connect_timeout=settings.redis_socket_timeout,
+                    socket_timeout=settings.redis_socket_timeout,
+                    socket_keepalive=True,
+                )
+                self._client = aioredis.Redis(connection_pool=self._pool)
+                await self._client.ping()
                 logger.info("Redis connection successful.")
             except Exception as e:
                 logger.error(f"Failed to initialize Redis: {e}", exc_info=True)
+                if self._pool is not None:
+                    await self._pool.disconnect()
                 self._client = None
+                self._pool = None
+                self.breaker.trip(e)
 
-    @property
-    def client(self) -> redis.Redis:
+    async def _probe(self) -> None:
         if self._client is None:
-            self.initialize()
+            await self.initialize()
+        await self.client.ping()
+
+    def guard(self):
+        """Async context manager for Redis calls: fails fast with
+        CircuitOpenException while Redis is known to be down."""
+        return self.breaker.guard()
+
+    @property
+    def client(self) -> aioredis.Redis:
         if self._client is None:
             raise ConnectionError("Redis client is not initialized.")
         return self._client
-    
-    def close(self):
-        """Safely closes the Redis client connection."""
+
+    async def health_check(self) -> bool:
+        """Round-trips a PING; False when Redis is unreachable, not initialized
+        or its breaker is open."""
+        if self._client is None or self.breaker.is_open:
+            return False
+        try:
+            async with self.breaker.guard():
+                return bool(await self._client.ping())
+        except Exception as e:
+            logger.warning(f"Redis health check failed: {e}")
+            return False
+
+    async def close(self):
+        """Safely closes the Redis client and its connection pool."""
+        await self.breaker.close()
         if self._client:
-            self._client.close()
+            await self._client.aclose()
             self._client = None
+        if self._pool:
+            await self._pool.disconnect()
+            self._pool = None
             logger.info("Redis connection closed.")
 
 redis_manager = RedisManager()
@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .admission import Priority
+from .connection import db_manager
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+# Keyset cursor: the (created_at, id) of the last cart a pass has handled.
+Cursor = Tuple[Optional[datetime], Optional[int]]
+
+# One page of due carts after the cursor, claimed in the same statement. Rows another worker
+# is claiming right now are skipped (SKIP LOCKED) instead of waited on; once that claim
+# commits, its lease in user_feedback keeps them out of every other worker's pages. The
+# lease check in `due` reads the statement's snapshot, which can predate a claim that
+# committed meanwhile, so the upsert repeats it against the latest row version: a cart
+# lost to that race is not updated and drops out of the final join.
+CLAIM_DUE_SQL = register_statement(
+    "followup.claim_due",
+    """
+    WITH due AS (
+        SELECT ol.id, ol.from_id, ol.created_at, ol.total_amount
+        FROM order_list ol
+        LEFT JOIN user_feedback uf ON uf.order_list_id = ol.id
+        WHERE ol.status IN ('success', 'completed')
+          AND ol.created_at < now() - $1::interval
+          AND ($2::timestamptz IS NULL OR (ol.created_at, ol.id) > ($2::timestamptz, $3::bigint))
+          AND (uf.id IS NULL OR (
+                NOT uf.follow_up_sent
+                AND uf.attempts < $5
+                AND (uf.claimed_until IS NULL OR uf.claimed_until < now())))
+        ORDER BY ol.created_at, ol.id
+        LIMIT $4
+        FOR UPDATE OF ol SKIP LOCKED
+    ), claimed AS (
+        INSERT INTO user_feedback (order_list_id, from_id, claimed_until, attempts)
+        SELECT id, from_id, now() + $6::interval, 1 FROM due
+        ON CONFLICT (order_list_id) DO UPDATE
+        SET claimed_until = EXCLUDED.claimed_until,
+            attempts = user_feedback.attempts + 1
+        WHERE NOT user_feedback.follow_up_sent
+          AND user_feedback.attempts < $5
+          AND (user_feedback.claimed_until IS NULL OR user_feedback.claimed_until < now())
+        RETURNING order_list_id, attempts
+    )
+    SELECT due.id AS order_list_id,
+           due.from_id AS user_id,
+           due.created_at,
+           due.total_amount,
+           claimed.attempts,
+           ARRAY(
+               SELECT DISTINCT ip.insurance_name
+               FROM orders o
+               JOIN insurance_products ip ON ip.insurance_id = o.insurance_id
+               WHERE o.order_list_id = due.id
+           ) AS insurance_names
+    FROM due
+    JOIN claimed ON claimed.order_list_id = due.id
+    ORDER BY due.created_at, due.id
+    """,
+)
+MARK_SENT_SQL = register_statement(
+    "followup.mark_sent",
+    """
+    UPDATE user_feedback
+    SET follow_up_sent = TRUE, follow_up_sent_at = now(), claimed_until = NULL, last_error = NULL
+    WHERE order_list_id = ANY($1::bigint[])
+    """,
+)
+MARK_FAILED_SQL = register_statement(
+    "followup.mark_failed",
+    "UPDATE user_feedback SET claimed_until = NULL, last_error = $2 WHERE order_list_id = $1",
+)
+GET_CURSOR_SQL = register_statement(
+    "followup.get_cursor",
+    "SELECT last_created_at, last_id FROM followup_progress WHERE job = $1",
+)
+# Only ever moves forward, so two workers sharing a job cannot rewind each other.
+ADVANCE_CURSOR_SQL = register_statement(
+    "followup.advance_cursor",
+    """
+    INSERT INTO followup_progress (job, last_created_at, last_id, updated_at)
+    VALUES ($1, $2, $3, now())
+    ON CONFLICT (job) DO UPDATE
+    SET last_created_at = EXCLUDED.last_created_at, last_id = EXCLUDED.last_id, updated_at = now()
+    WHERE followup_progress.last_created_at IS NULL
+       OR (followup_progress.last_created_at, followup_progress.last_id) < (EXCLUDED.last_created_at, EXCLUDED.last_id)
+    """,
+)
+RESET_CURSOR_SQL = register_statement(
+    "followup.reset_cursor",
+    """
+    UPDATE followup_progress
+    SET last_created_at = NULL, last_id = NULL, updated_at = now()
+    WHERE job = $1
+    """,
+)
+
+
+async def claim_due(
+    cursor: Cursor, threshold: timedelta, limit: int, lease: timedelta, max_attempts: int
+) -> List[Dict[str, Any]]:
+    """Claims up to `limit` paid carts older than `threshold` that sort after `cursor`."""
+    rows = await db_manager.fetch_all(
+        CLAIM_DUE_SQL, [threshold, cursor[0], cursor[1], limit, max_attempts, lease],
+        priority=Priority.BACKGROUND,
+    )
+    return [dict(row) for row in rows]
+
+
+async def mark_sent(order_list_ids: List[int]) -> None:
+    if order_list_ids:
+        await db_manager.execute(MARK_SENT_SQL, [order_list_ids], priority=Priority.BACKGROUND)
+
+
+async def mark_failed(failures: List[Tuple[int, str]]) -> None:
+    """Releases the claims so a later pass retries them, until attempts run out."""
+    if failures:
+        await db_manager.execute_many(MARK_FAILED_SQL, failures, priority=Priority.BACKGROUND)
+
+
+async def get_cursor(job: str) -> Cursor:
+    row = await db_manager.fetch_one(GET_CURSOR_SQL, [job], priority=Priority.BACKGROUND)
+    return (row[0], row[1]) if row else (None, None)
+
+
+async def advance_cursor(job: str, cursor: Cursor) -> None:
+    await db_manager.execute(ADVANCE_CURSOR_SQL, [job, cursor[0], cursor[1]], priority=Priority.BACKGROUND)
+
+
+async def reset_cursor(job: str) -> None:
+    await db_manager.execute(RESET_CURSOR_SQL, [job], priority=Priority.BACKGROUND)
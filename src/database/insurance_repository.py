@@ -1,7 +1,10 @@
 from __future__ import annotations
 from typing import List, Dict, Any, Optional
 import logging
+from .catalog_cache import catalog_cache
 from .connection import db_manager
+from .replicas import ReadIntent
+from .statements import register_statement
 from decimal import Decimal
 
 
@@ -19,6 +22,38 @@ def _normalize(record: Dict[str, Any]) -> Dict[str, Any]:
 
 logger = logging.getLogger(__name__)
 
+FETCH_BY_TYPE_SQL = register_statement(
+    "insurance.fetch_by_type",
+    "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE lower(insurance_type)=lower($1) ORDER BY insurance_id LIMIT $2",
+)
+# name_search is lower(immutable_unaccent(insurance_name)) with a GIN trigram index
+# (migrations/0002_insurance_name_search.sql), so both lookups below are index scans.
+# fetch_by_name only runs FETCH_BY_NAME_SQL while the catalog cache is cold; the
+# typo-tolerant SEARCH_BY_NAME_SQL always goes to the database.
+FETCH_BY_NAME_SQL = register_statement(
+    "insurance.fetch_by_name",
+    "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE name_search LIKE '%' || lower(public.immutable_unaccent($1)) || '%' ORDER BY insurance_id LIMIT $2",
+)
+SEARCH_BY_NAME_SQL = register_statement(
+    "insurance.search_by_name",
+    """
+    SELECT p.insurance_id, p.insurance_name, p.insurance_type, p.sum_insured, p.term, p.sum_insured AS price,
+           word_similarity(q.needle, p.name_search) AS score
+    FROM insurance_products p,
+         (SELECT lower(public.immutable_unaccent($1)) AS needle) q
+    WHERE q.needle <% p.name_search OR p.name_search LIKE '%' || q.needle || '%'
+    ORDER BY score DESC, p.insurance_id
+    LIMIT $2
+    """,
+)
+FETCH_BY_IDS_SQL = register_statement(
+    "insurance.fetch_by_ids",
+    "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE insurance_id = ANY($1::bigint[])",
+)
+
+# Point lookups by id are coalesced: concurrent tool calls share one round trip.
+product_loader = db_manager.batch_loader(FETCH_BY_IDS_SQL, ("insurance_id",), intent=ReadIntent.REPLICA)
+
 
 async def ensure_connection():
     try:
@@ -29,30 +64,47 @@ async def ensure_connection():
 
 async def fetch_by_type(insurance_type: str, limit: int = 25) -> Optional[List[Dict[str, Any]]]:
     """Fetch products by type. Schema does not include base_price -> use sum_insured as price."""
+    if catalog_cache.ready:
+        return [_normalize(p) for p in catalog_cache.by_type(insurance_type, limit)]
     if not db_manager.pool:
         return None
-    rows = await db_manager.fetch_all(
-        "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE lower(insurance_type)=lower($1) ORDER BY insurance_id LIMIT $2",
-        [insurance_type, limit]
-    )
+    rows = await db_manager.fetch_all(FETCH_BY_TYPE_SQL, [insurance_type, limit], intent=ReadIntent.REPLICA)
     return [_normalize(dict(r)) for r in rows]
 
 
 async def fetch_by_name(fragment: str, limit: int = 25) -> Optional[List[Dict[str, Any]]]:
+    if catalog_cache.ready:
+        return [_normalize(p) for p in catalog_cache.by_name(fragment, limit)]
     if not db_manager.pool:
         return None
-    rows = await db_manager.fetch_all(
-        "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE insurance_name ILIKE '%' || $1 || '%' ORDER BY insurance_id LIMIT $2",
-        [fragment, limit]
-    )
+    rows = await db_manager.fetch_all(FETCH_BY_NAME_SQL, [fragment, limit], intent=ReadIntent.REPLICA)
     return [_normalize(dict(r)) for r in rows]
 
 
+async def search_by_name(text: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+    """Typo-tolerant name search ranked by trigram word similarity; matches
+    "bao hiem suc khoe" as well as "bảo hiểm sức khẻo"."""
+    if not db_manager.pool:
+        return None
+    rows = await db_manager.fetch_all(SEARCH_BY_NAME_SQL, [text, limit], intent=ReadIntent.REPLICA)
+    return [_normalize(dict(r)) for r in rows]
+
+
+async def search(query: str, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+    """Free-text product search ("bảo hiểm cho chuyến đi Nhật") over the in-memory
+    vector index; falls back to name similarity while the catalog is not loaded."""
+    if catalog_cache.ready:
+        return [_normalize(p) for p in catalog_cache.search(query, limit)]
+    return await search_by_name(query, limit)
+
+
 async def fetch_one(insurance_id: int) -> Optional[Dict[str, Any]]:
+    if catalog_cache.ready:
+        product = catalog_cache.get(insurance_id)
+        if product:
+            return _normalize(product)
+    # Cache miss: the product may have been added after the last reload.
     if not db_manager.pool:
         return None
-    row = await db_manager.fetch_one(
-        "SELECT insurance_id, insurance_name, insurance_type, sum_insured, term, sum_insured AS price FROM insurance_products WHERE insurance_id=$1",
-        [insurance_id]
-    )
+    row = await product_loader.load(int(insurance_id))
     return _normalize(dict(row)) if row else None
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class BatchLoader(Generic[K, V]):
+    """DataLoader-style request coalescing for point lookups.
+
+    Every `load(key)` issued during the same event-loop tick is collected,
+    duplicate keys share one future, and the batch is resolved with a single
+    call to `batch_fn(keys)`, which returns a mapping of the keys it found.
+    Nothing is cached across batches, so results are never staler than a
+    direct query.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        max_batch_size: int = 100,
+        name: str = "loader",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._dispatch_scheduled = False
+        self.stats = {"loads": 0, "deduplicated": 0, "batches": 0, "keys": 0}
+
+    async def load(self, key: K) -> Optional[V]:
+        self.stats["loads"] += 1
+        fut = self._pending.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._pending[key] = fut
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                loop.call_soon(self._dispatch)
+        else:
+            self.stats["deduplicated"] += 1
+        # Shielded: one caller being cancelled must not cancel the shared future.
+        return await asyncio.shield(fut)
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(k) for k in keys)))
+
+    def _dispatch(self) -> None:
+        self._dispatch_scheduled = False
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        asyncio.get_running_loop().create_task(self._resolve(batch))
+
+    async def _resolve(self, batch: Dict[K, asyncio.Future]) -> None:
+        keys = list(batch)
+        self.stats["batches"] += 1
+        self.stats["keys"] += len(keys)
+        try:
+            results = await self.batch_fn(keys)
+        except Exception as e:
+            logger.debug(f"Batch '{self.name}' of {len(keys)} keys failed: {e}")
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for key, fut in batch.items():
+            if not fut.done():
+                fut.set_result(results.get(key))
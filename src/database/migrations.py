@@ -0,0 +1,202 @@
+"""Versioned schema migrations from the top-level migrations/ directory.
+
+Files are named NNNN_description.sql and applied in version order; each
+applied version is recorded in schema_migrations with a checksum of the
+file. Every file runs in its own transaction, except files whose first line
+is `-- migrate: no-transaction` (needed for CREATE INDEX CONCURRENTLY):
+those are split on `;` at line ends and run statement by statement, so they
+must hold only simple, re-runnable statements. A session advisory lock
+keeps two deploys from migrating at once.
+
+    python -m src.database.migrations            # apply pending migrations
+    python -m src.database.migrations --status   # list applied / pending
+    python -m src.database.migrations --baseline latest
+
+A database created from init.sql already has the schema of every migration
+in migrations/ (each one is folded into init.sql in the same change), so it
+is baselined with `--baseline latest`: every version is recorded as applied
+without running it. `--baseline N` records only versions up to N, for a
+database built from an older init.sql whose highest folded-in version is N.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import asyncpg
+
+from .connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+_LOCK_KEY = 0x7A616C6F  # any constant shared by every runner
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version    INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL,
+    checksum   TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+RECORD_SQL = "INSERT INTO public.schema_migrations (version, name, checksum) VALUES ($1, $2, $3)"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if not match:
+            logger.warning(f"Skipping {path.name}: not named NNNN_description.sql")
+            continue
+        migrations.append(Migration(int(match.group(1)), match.group(2), path.read_text(encoding="utf-8")))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return sorted(migrations)
+
+
+def _statements(sql: str) -> List[str]:
+    return [s.strip() for s in re.split(r";\s*$", sql, flags=re.MULTILINE) if _strip_comments(s)]
+
+
+def _strip_comments(sql: str) -> str:
+    return "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--")).strip()
+
+
+async def _applied(conn: asyncpg.Connection) -> Dict[int, str]:
+    rows = await conn.fetch("SELECT version, checksum FROM public.schema_migrations")
+    return {r["version"]: r["checksum"] for r in rows}
+
+
+async def _apply(conn: asyncpg.Connection, migration: Migration) -> None:
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(RECORD_SQL, migration.version, migration.name, migration.checksum)
+        return
+    # Statements here must be safe to repeat: a failure part-way leaves the
+    # earlier ones applied and the version unrecorded, so the next run redoes them.
+    for statement in _statements(migration.sql):
+        await conn.execute(statement)
+    await conn.execute(RECORD_SQL, migration.version, migration.name, migration.checksum)
+
+
+async def migrate(
+    pool: asyncpg.Pool,
+    target: Optional[int] = None,
+    baseline: bool = False,
+    migrations: Optional[List[Migration]] = None,
+) -> List[Migration]:
+    """Applies (or with `baseline`, only records) pending migrations up to `target`.
+
+    Returns the migrations that were applied. A file edited after it was
+    applied is reported, not re-run.
+    """
+    migrations = discover() if migrations is None else migrations
+    done: List[Migration] = []
+    async with pool.acquire() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", _LOCK_KEY)
+        try:
+            await conn.execute(CREATE_TABLE_SQL)
+            applied = await _applied(conn)
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in applied:
+                    if applied[migration.version] != migration.checksum:
+                        logger.warning(f"Migration {migration.version:04d}_{migration.name} changed after it was applied")
+                    continue
+                if baseline:
+                    await conn.execute(RECORD_SQL, migration.version, migration.name, migration.checksum)
+                else:
+                    logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+                    await _apply(conn, migration)
+                done.append(migration)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+    return done
+
+
+async def status(pool: asyncpg.Pool) -> List[Dict[str, object]]:
+    async with pool.acquire() as conn:
+        await conn.execute(CREATE_TABLE_SQL)
+        applied = await _applied(conn)
+    return [
+        {
+            "version": m.version,
+            "name": m.name,
+            "state": "pending" if m.version not in applied
+            else "applied" if applied[m.version] == m.checksum else "changed",
+        }
+        for m in discover()
+    ]
+
+
+def _baseline_target(value: str) -> Optional[int]:
+    """`latest` (every migration, no target) or a version number."""
+    if value == "latest":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a version number or 'latest', got {value!r}")
+
+
+async def main(show_status: bool, target: Optional[int], baseline: Optional[str]) -> int:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        if show_status:
+            for row in await status(db_manager.pool):
+                print(f"{row['version']:04d}_{row['name']:<40}{row['state']}")
+            return 0
+        if baseline is not None:
+            done = await migrate(db_manager.pool, target=_baseline_target(baseline), baseline=True)
+            print(f"Recorded {len(done)} migrations as applied")
+        else:
+            done = await migrate(db_manager.pool, target=target)
+            print(f"Applied {len(done)} migrations")
+        return 0
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    parser.add_argument(
+        "--baseline", metavar="N|latest",
+        help="record versions up to N (or all, with 'latest') as applied without running them",
+    )
+    args = parser.parse_args()
+    if args.baseline is not None:
+        try:
+            _baseline_target(args.baseline)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    raise SystemExit(asyncio.run(main(args.status, args.target, args.baseline)))
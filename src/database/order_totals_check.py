@@ -0,0 +1,85 @@
+"""Offline consistency check for the cart totals kept by the update_order_totals
+trigger (migrations/0003_incremental_order_totals.sql).
+
+Compares every order_list row with the sum of its orders and lists the ones
+that drifted; `--repair` re-aggregates those carts:
+
+    python -m src.database.order_totals_check [--repair]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from .admission import Priority
+from .connection import db_manager
+from .order_repository import RECALC_ORDER_LIST_SQL
+from .statements import register_statement
+
+logger = logging.getLogger(__name__)
+
+FIND_DRIFT_SQL = register_statement(
+    "orders.totals_drift",
+    """
+    SELECT ol.id AS order_list_id, ol.from_id, ol.status,
+           ol.total_count, COALESCE(agg.qty, 0) AS expected_count,
+           ol.total_amount, COALESCE(agg.amount, 0) AS expected_amount
+    FROM order_list ol
+    LEFT JOIN (
+        SELECT order_list_id, SUM(qty) AS qty, SUM(amount) AS amount
+        FROM orders
+        GROUP BY order_list_id
+    ) agg ON agg.order_list_id = ol.id
+    WHERE ol.total_count <> COALESCE(agg.qty, 0)
+       OR ol.total_amount <> COALESCE(agg.amount, 0)
+    ORDER BY ol.id
+    """,
+)
+
+
+async def find_drift() -> List[Dict[str, Any]]:
+    """Carts whose stored totals differ from their orders. Always reads the primary."""
+    rows = await db_manager.fetch_all(FIND_DRIFT_SQL, priority=Priority.BACKGROUND)
+    return [dict(r) for r in rows]
+
+
+async def repair(order_list_ids: List[int]) -> int:
+    """Re-aggregates the given carts; returns how many were rewritten.
+
+    Carts with no orders left are only reported: the trigger would have
+    deleted them, and removing a cart is not this tool's call.
+    """
+    repaired = 0
+    for order_list_id in order_list_ids:
+        status = await db_manager.execute(RECALC_ORDER_LIST_SQL, [order_list_id], priority=Priority.BACKGROUND)
+        if status and status.endswith(" 1"):
+            repaired += 1
+    return repaired
+
+
+async def main(fix: bool) -> int:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    try:
+        drift = await find_drift()
+        for row in drift:
+            print(
+                f"order_list {row['order_list_id']} ({row['from_id']}, {row['status']}): "
+                f"count {row['total_count']} != {row['expected_count']}, "
+                f"amount {row['total_amount']} != {row['expected_amount']}"
+            )
+        print(f"{len(drift)} order lists with inconsistent totals")
+        if fix and drift:
+            repaired = await repair([row['order_list_id'] for row in drift])
+            print(f"Repaired {repaired}; {len(drift) - repaired} empty carts left for manual review")
+        return 1 if drift and not fix else 0
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="re-aggregate the carts that drifted")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.repair)))
@@ -0,0 +1,101 @@
+import math
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from src.common.constants import Lexicon
+
+_TOKEN = re.compile(r'\w+')
+_STOP_WORDS = frozenset(Lexicon.fold(w) for w in Lexicon.INSURANCE_STOP_WORDS if ' ' not in w)
+
+
+def _features(text: str) -> Dict[str, float]:
+    """Folded words, word bigrams and character trigrams with their weights.
+
+    Trigrams keep "xe mai" or "suc khoe" typed as "suckhoe" close to the right
+    product; they are weighted down so whole-word overlap dominates the score.
+    """
+    words = [w for w in _TOKEN.findall(Lexicon.fold(text)) if w not in _STOP_WORDS]
+    features: Dict[str, float] = {}
+    for i, word in enumerate(words):
+        features['w:' + word] = features.get('w:' + word, 0.0) + 1.0
+        if i:
+            bigram = 'b:' + words[i - 1] + ' ' + word
+            features[bigram] = features.get(bigram, 0.0) + 1.0
+        padded = f' {word} '
+        for j in range(len(padded) - 2):
+            gram = 'c:' + padded[j:j + 3]
+            features[gram] = features.get(gram, 0.0) + 0.25
+    return features
+
+
+class ProductIndex:
+    """In-memory cosine index over the insurance catalog.
+
+    Documents are product name, type and term plus the type's descriptive
+    phrases from Lexicon.TYPE_DESCRIPTORS, so "bảo hiểm cho chuyến đi Nhật"
+    lands on travel products without naming the type. Features are hashed
+    (stable crc32, signed) into `dim` columns and TF-IDF weighted; rows are
+    L2-normalized so a query is one matrix-vector product.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self._products: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    @classmethod
+    def build(cls, products: Iterable[Dict[str, Any]], dim: int = 1024) -> "ProductIndex":
+        index = cls(dim)
+        index._products = list(products)
+        rows = np.zeros((len(index._products), dim), dtype=np.float32)
+        for i, product in enumerate(index._products):
+            rows[i] = index._vectorize(cls._document(product))
+        if index._products:
+            df = np.count_nonzero(rows, axis=0)
+            n = len(index._products)
+            index._idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+            rows *= index._idf
+            norms = np.linalg.norm(rows, axis=1, keepdims=True)
+            rows /= np.where(norms == 0, 1, norms)
+        index._matrix = rows
+        return index
+
+    @staticmethod
+    def _document(product: Dict[str, Any]) -> str:
+        insurance_type = str(product.get("insurance_type") or "")
+        descriptors = Lexicon.TYPE_DESCRIPTORS.get(insurance_type.lower(), ())
+        return " . ".join([
+            str(product.get("insurance_name") or ""),
+            insurance_type.replace("_", " "),
+            str(product.get("term") or ""),
+            *descriptors,
+        ])
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in _features(text).items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            # Sublinear tf, and a sign bit so collisions cancel out on average.
+            vector[h % self.dim] += (1.0 + math.log(weight) if weight >= 1 else weight) * (-1.0 if h & 0x80000000 else 1.0)
+        return vector
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.1) -> List[Tuple[Dict[str, Any], float]]:
+        """Top `limit` products by cosine similarity to `query`, best first."""
+        if not self._products or not query:
+            return []
+        q = self._vectorize(query) * self._idf
+        norm = float(np.linalg.norm(q))
+        if norm == 0:
+            return []
+        scores = self._matrix @ (q / norm)
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._products[i], float(scores[i])) for i in top if scores[i] >= min_score]
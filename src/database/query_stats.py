@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"\$\d+")
+_NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Normalizes SQL so queries that differ only in literals, parameters or
+    layout share one fingerprint."""
+    fp = _COMMENT_RE.sub(" ", sql)
+    fp = _STRING_RE.sub("?", fp)
+    fp = _PARAM_RE.sub("?", fp)
+    fp = _NUMBER_RE.sub("?", fp)
+    fp = _IN_LIST_RE.sub("(?)", fp)
+    fp = _SPACE_RE.sub(" ", fp).strip().rstrip(";").strip()
+    return fp.lower()
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class _QueryStat:
+    __slots__ = ("fingerprint", "name", "calls", "errors", "rows", "retries", "total_ms", "max_ms", "samples")
+
+    def __init__(self, fp: str, name: Optional[str], sample_size: int):
+        self.fingerprint = fp
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def as_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "fingerprint": self.fingerprint,
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "retries": self.retries,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(_percentile(ordered, 50), 3),
+            "p95_ms": round(_percentile(ordered, 95), 3),
+            "p99_ms": round(_percentile(ordered, 99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class QueryStats:
+    """In-process latency statistics per SQL fingerprint.
+
+    Percentiles are computed over the most recent `sample_size` calls of each
+    fingerprint; counters cover everything since the last `reset()`.
+    """
+
+    def __init__(self, sample_size: int = 1024):
+        self.sample_size = sample_size
+        self.enabled = True
+        self._stats: Dict[str, _QueryStat] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._log_task: Optional[asyncio.Task] = None
+
+    def _fingerprint(self, sql: str) -> str:
+        fp = self._fingerprints.get(sql)
+        if fp is None:
+            if len(self._fingerprints) > 5000:
+                self._fingerprints.clear()
+            fp = self._fingerprints[sql] = fingerprint(sql)
+        return fp
+
+    def record(
+        self,
+        sql: str,
+        latency_ms: float,
+        rows: int = 0,
+        retries: int = 0,
+        error: bool = False,
+        name: Optional[str] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        fp = self._fingerprint(sql)
+        stat = self._stats.get(fp)
+        if stat is None:
+            stat = self._stats[fp] = _QueryStat(fp, name, self.sample_size)
+        stat.calls += 1
+        stat.rows += rows
+        stat.retries += retries
+        stat.total_ms += latency_ms
+        stat.max_ms = max(stat.max_ms, latency_ms)
+        stat.samples.append(latency_ms)
+        if error:
+            stat.errors += 1
+
+    def snapshot(self, top: Optional[int] = None, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        rows = [s.as_dict() for s in self._stats.values()]
+        rows.sort(key=lambda r: r[order_by], reverse=True)
+        return rows[:top] if top else rows
+
+    def reset(self) -> None:
+        self._stats.clear()
+
+    def log_summary(self, top: int = 10) -> None:
+        rows = self.snapshot(top=top)
+        if not rows:
+            return
+        lines = [
+            f"  {r['name'] or r['fingerprint'][:80]}: calls={r['calls']} rows={r['rows']} "
+            f"retries={r['retries']} errors={r['errors']} p50={r['p50_ms']}ms "
+            f"p95={r['p95_ms']}ms p99={r['p99_ms']}ms total={r['total_ms']}ms"
+            for r in rows
+        ]
+        logger.info("Top queries by total time:\n" + "\n".join(lines))
+
+    def start_periodic_log(self, interval_seconds: float, top: int = 10) -> None:
+        if interval_seconds > 0 and self._log_task is None:
+            self._log_task = asyncio.create_task(self._periodic_log(interval_seconds, top))
+
+    async def _periodic_log(self, interval_seconds: float, top: int) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                self.log_summary(top)
+            except Exception as e:
+                logger.warning(f"Query stats dump failed: {e}")
+
+    async def stop_periodic_log(self) -> None:
+        if self._log_task:
+            self._log_task.cancel()
+            try:
+                await self._log_task
+            except asyncio.CancelledError:
+                pass
+            self._log_task = None
+
+
+query_stats = QueryStats()
@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from asyncpg import Pool
+
+from .admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+# Lag is zero when the replica has replayed everything it received; otherwise it is
+# the age of the last replayed transaction. A primary (not in recovery) reports 0.
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END::float8
+"""
+
+
+class ReadIntent(str, Enum):
+    """Where a read is allowed to go."""
+    PRIMARY = "primary"
+    REPLICA = "replica"
+
+
+def parse_hosts(spec: str, default_port: int) -> List[Tuple[str, int]]:
+    """Parses `host[:port],host[:port]` into (host, port) pairs."""
+    hosts = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+@dataclass
+class Replica:
+    host: str
+    port: int
+    admission: AdmissionController
+    pool: Optional[Pool] = None
+    lag_seconds: Optional[float] = None
+    healthy: bool = False
+    last_error: Optional[str] = None
+    reads: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+class ReplicaSet:
+    """Replica pools plus the routing state around them: measured lag, health and
+    read-your-writes stickiness per key (typically a user's from_id)."""
+
+    def __init__(self, max_lag_seconds: float, sticky_seconds: float):
+        self.max_lag_seconds = max_lag_seconds
+        self.sticky_seconds = sticky_seconds
+        self.replicas: List[Replica] = []
+        self._sticky_until: Dict[str, float] = {}
+        self._round_robin = itertools.count()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def add(self, replica: Replica) -> None:
+        self.replicas.append(replica)
+
+    def mark_write(self, key: Optional[str]) -> None:
+        """Pins reads for `key` to the primary until replicas have had time to catch up."""
+        if not key or not self.replicas:
+            return
+        now = time.monotonic()
+        self._sticky_until[key] = now + self.sticky_seconds
+        if len(self._sticky_until) > 10000:
+            self._sticky_until = {k: t for k, t in self._sticky_until.items() if t > now}
+
+    def is_sticky(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        until = self._sticky_until.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._sticky_until.pop(key, None)
+            return False
+        return True
+
+    def choose(self, intent: ReadIntent, sticky_key: Optional[str] = None) -> Optional[Replica]:
+        if intent != ReadIntent.REPLICA or self.is_sticky(sticky_key):
+            return None
+        healthy = [r for r in self.replicas if r.healthy and r.pool and not r.pool.is_closing()]
+        if not healthy:
+            return None
+        replica = healthy[next(self._round_robin) % len(healthy)]
+        replica.reads += 1
+        return replica
+
+    def mark_unhealthy(self, replica: Replica, error: Exception) -> None:
+        replica.healthy = False
+        replica.last_error = str(error)
+        logger.warning(f"Replica {replica.name} marked unhealthy until the next lag check: {error}")
+
+    async def refresh_lag(self) -> None:
+        for replica in self.replicas:
+            if not replica.pool:
+                continue
+            try:
+                lag = await replica.pool.fetchval(REPLICA_LAG_SQL, timeout=2)
+                replica.lag_seconds = float(lag or 0)
+                replica.last_error = None
+                was_healthy = replica.healthy
+                replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+                if was_healthy and not replica.healthy:
+                    logger.warning(
+                        f"Replica {replica.name} lag {replica.lag_seconds:.1f}s exceeds "
+                        f"{self.max_lag_seconds:.1f}s, routing its reads to the primary"
+                    )
+            except Exception as e:
+                replica.healthy = False
+                replica.last_error = str(e)
+                logger.warning(f"Replica {replica.name} lag check failed: {e}")
+
+    def start_monitor(self, interval: float) -> None:
+        if self.replicas and self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor(interval))
+
+    async def _monitor(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_lag()
+
+    async def close(self) -> None:
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+        for replica in self.replicas:
+            if replica.pool:
+                await replica.pool.close()
+        self.replicas = []
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        return [
+            {
+                "replica": r.name,
+                "healthy": r.healthy,
+                "lag_seconds": r.lag_seconds,
+                "reads": r.reads,
+                "last_error": r.last_error,
+                "admission": r.admission.snapshot(),
+            }
+            for r in self.replicas
+        ]
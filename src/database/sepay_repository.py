@@ -1,10 +1,17 @@
 import logging
-from typing import Optional, Dict, Any
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
+from .admission import Priority
 from .connection import db_manager
+from .statements import register_statement
 
 logger = logging.getLogger(__name__)
 
-GET_ROW_SQL = "SELECT id, owner_name, owner_email, amount_count FROM public.sepay WHERE id = $1 LIMIT 1"
+GET_ROW_SQL = register_statement(
+    "sepay.get_row",
+    "SELECT id, owner_name, owner_email, amount_count FROM public.sepay WHERE id = $1 LIMIT 1",
+)
 SEPAY_DEFAULT_ROW_ID = 1
 
 async def get_sepay_info() -> Optional[Dict[str, Any]]:
@@ -19,4 +26,89 @@ async def get_sepay_info() -> Optional[Dict[str, Any]]:
             }
     except Exception as e:
         logger.error(f"Error fetching sepay info: {e}")
-    return None
\ No newline at end of file
+    return None
+
+# One batch of bank transfers in a single statement (migrations/0009_payment_reconciliation.sql).
+# `fresh` only returns transactions not seen before, so only those can settle a cart. The carts
+# a batch references are locked first, so two batches paying the same cart queue up and the
+# second one sees it already paid.
+RECONCILE_SQL = register_statement(
+    "sepay.reconcile",
+    """
+    WITH batch AS (
+        SELECT DISTINCT ON (transaction_id) *
+        FROM unnest($1::text[], $2::text[], $3::numeric[], $4::text[], $5::timestamptz[], $6::bigint[])
+             AS b(transaction_id, gateway, amount, content, transferred_at, order_list_id)
+        ORDER BY transaction_id
+    ), carts AS (
+        SELECT id, status, total_amount
+        FROM public.order_list
+        WHERE id IN (SELECT order_list_id FROM batch)
+        ORDER BY id
+        FOR UPDATE
+    ), fresh AS (
+        INSERT INTO public.bank_transactions
+            (transaction_id, gateway, amount, content, transferred_at, order_list_id, match_status)
+        SELECT b.transaction_id, b.gateway, b.amount, b.content, b.transferred_at, c.id,
+               CASE
+                   WHEN c.id IS NULL THEN 'unmatched'
+                   WHEN c.status <> 'pending' THEN 'already_paid'
+                   WHEN b.amount < c.total_amount THEN 'underpaid'
+                   -- A second full transfer for the same cart in one batch does not pay it again.
+                   WHEN row_number() OVER (
+                       PARTITION BY c.id, b.amount >= c.total_amount
+                       ORDER BY b.transferred_at NULLS LAST, b.transaction_id
+                   ) > 1 THEN 'already_paid'
+                   ELSE 'matched'
+               END
+        FROM batch b
+        LEFT JOIN carts c ON c.id = b.order_list_id
+        ON CONFLICT (transaction_id) DO NOTHING
+        RETURNING transaction_id, order_list_id, match_status
+    ), settled AS (
+        UPDATE public.order_list ol
+        SET status = CASE WHEN f.paid THEN 'completed' ELSE ol.status END,
+            human_check = ol.human_check OR NOT f.paid,
+            updated_at = now()
+        FROM (
+            SELECT order_list_id, bool_or(match_status = 'matched') AS paid
+            FROM fresh
+            WHERE match_status IN ('matched', 'underpaid')
+            GROUP BY order_list_id
+        ) f
+        WHERE ol.id = f.order_list_id
+        RETURNING ol.id, ol.from_id, f.paid
+    ), items AS (
+        UPDATE public.orders o
+        SET status = 'completed'
+        FROM settled s
+        WHERE s.paid AND o.order_list_id = s.id AND o.status = 'pending'
+        RETURNING o.id
+    )
+    SELECT f.transaction_id, f.order_list_id, f.match_status, s.from_id,
+           (SELECT count(*) FROM items) AS items_completed
+    FROM fresh f
+    LEFT JOIN settled s ON s.id = f.order_list_id AND f.match_status = 'matched'
+    """,
+)
+
+
+async def reconcile_transactions(
+    transaction_ids: List[str],
+    gateways: List[Optional[str]],
+    amounts: List[Decimal],
+    contents: List[Optional[str]],
+    transferred_at: List[Optional[datetime]],
+    order_list_ids: List[Optional[int]],
+) -> List[Dict[str, Any]]:
+    """Records a batch of transfers and settles the carts they pay, as columns.
+
+    Returns one row per transaction not recorded before; duplicates of
+    already-recorded transactions are left out.
+    """
+    rows = await db_manager.fetch_all(
+        RECONCILE_SQL,
+        [transaction_ids, gateways, amounts, contents, transferred_at, order_list_ids],
+        priority=Priority.BACKGROUND,
+    )
+    return [dict(r) for r in rows]
@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+
+@dataclass(frozen=True)
+class Statement:
+    """A named SQL statement declared once by a repository."""
+    name: str
+    sql: str
+
+
+class StatementRegistry:
+    """Process-wide catalogue of named statements.
+
+    Repositories register their queries at import time. When the registry is
+    enabled, `DatabaseManager` sizes asyncpg's per-connection statement cache to
+    hold every registered statement and disables its lifetime expiry, so each
+    statement is prepared lazily on first use on a connection and then reused
+    for the life of that connection.
+    """
+
+    def __init__(self):
+        self._statements: Dict[str, Statement] = {}
+
+    def register(self, name: str, sql: str) -> Statement:
+        sql = sql.strip()
+        existing = self._statements.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"Statement '{name}' is already registered with different SQL.")
+            return existing
+        statement = Statement(name=name, sql=sql)
+        self._statements[name] = statement
+        return statement
+
+    def get(self, name: str) -> Optional[Statement]:
+        return self._statements.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._statements
+
+    def __iter__(self) -> Iterator[Statement]:
+        return iter(self._statements.values())
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+
+statement_registry = StatementRegistry()
+
+
+def register_statement(name: str, sql: str) -> Statement:
+    return statement_registry.register(name, sql)
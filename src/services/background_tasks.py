@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called anew for every attempt, so a retry gets a fresh coroutine.
+JobFactory = Callable[[], Awaitable[Any]]
+
+
+class _Job(NamedTuple):
+    label: str
+    factory: JobFactory
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class BackgroundQueue:
+    """One named queue: at most `max_size` waiting jobs, run by `concurrency` workers.
+
+    A job that raises is retried up to `max_attempts` times in all, waiting
+    `retry_backoff * 2**n` seconds between attempts; the wait holds the worker,
+    so a failing dependency also slows the queue down instead of being hammered.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_size: int, max_attempts: int, retry_backoff: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._enqueued: Deque[float] = deque()
+        self._workers: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "rejected": 0}
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._work()))
+        return self._queue
+
+    async def put(self, job: _Job, wait: bool) -> bool:
+        queue = self._ensure_started()
+        if wait:
+            await queue.put(job)
+        else:
+            try:
+                queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.stats["rejected"] += 1
+                return False
+        self._enqueued.append(job.enqueued_at)
+        self.stats["submitted"] += 1
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._enqueued.popleft()
+            self.in_flight += 1
+            try:
+                await self._run(job)
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+                if not job.future.done():
+                    job.future.cancel()
+
+    async def _run(self, job: _Job) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = await job.factory()
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    self.stats["retried"] += 1
+                    delay = self.retry_backoff * 2 ** (attempt - 1)
+                    logger.warning(f"Background job {self.name}/{job.label} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+                    continue
+                self.stats["failed"] += 1
+                logger.error(f"Background job {self.name}/{job.label} failed after {attempt} attempts: {e}", exc_info=True)
+                if not job.future.done():
+                    job.future.set_exception(e)
+                    # Nobody has to await the outcome; don't warn about it never being retrieved.
+                    job.future.exception()
+                return
+            self.stats["completed"] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+            return
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def oldest_age(self) -> float:
+        return time.monotonic() - self._enqueued[0] if self._enqueued else 0.0
+
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait().future.cancel()
+            self._queue.task_done()
+        self._enqueued.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "oldest_age_s": round(self.oldest_age(), 3),
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            **self.stats,
+        }
+
+
+class BackgroundTaskRunner:
+    """Supervised fire-and-forget work: memory writes, summaries and the like.
+
+    Callers submit a job to a named queue instead of calling asyncio.create_task,
+    so every job is referenced until it finishes, concurrency per kind of work is
+    bounded, and failures are logged and retried. When a queue is full, submit
+    waits for room (backpressure on the caller) unless `wait=False`, in which case
+    the job is rejected. drain() at shutdown stops accepting jobs and waits up to
+    `timeout` seconds for the queued and running ones before cancelling them, so
+    they finish while the pools they use are still open.
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, BackgroundQueue] = {}
+        self._draining = False
+
+    def register_queue(
+        self,
+        name: str,
+        concurrency: int = 4,
+        max_size: int = 1000,
+        max_attempts: int = 3,
+        retry_backoff: float = 1.0,
+    ) -> BackgroundQueue:
+        queue = self._queues[name] = BackgroundQueue(name, concurrency, max_size, max_attempts, retry_backoff)
+        return queue
+
+    async def submit(self, queue: str, label: str, factory: JobFactory, wait: bool = True) -> Optional[asyncio.Future]:
+        """Queues `factory()` to run on `queue`; returns a future of its result, or None
+        when the job was rejected (queue full with `wait=False`, or draining)."""
+        if self._draining:
+            logger.warning(f"Background job {queue}/{label} rejected: shutting down")
+            return None
+        background_queue = self._queues[queue]
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(label, factory, time.monotonic(), future)
+        if not await background_queue.put(job, wait):
+            logger.warning(f"Background job {queue}/{label} rejected: queue is full ({background_queue.max_size})")
+            return None
+        return future
+
+    async def drain(self, timeout: float = 30.0) -> bool:
+        """Waits for every queued and running job; returns False if some had to be cancelled."""
+        self._draining = True
+        queues = list(self._queues.values())
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in queues)), timeout=timeout)
+            drained = True
+        except asyncio.TimeoutError:
+            drained = False
+            logger.warning(f"Background jobs still pending after {timeout}s, cancelling: {self.snapshot()}")
+        for queue in queues:
+            await queue.stop()
+        return drained
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: queue.snapshot() for name, queue in self._queues.items()}
+
+
+background_tasks = BackgroundTaskRunner()
+background_tasks.register_queue(
+    "memory",
+    concurrency=settings.background_memory_concurrency,
+    max_size=settings.background_queue_size,
+    max_attempts=settings.background_max_attempts,
+    retry_backoff=settings.background_retry_backoff,
+)
+# A failed summary is not retried: the next turn asks for one again.
+background_tasks.register_queue(
+    "summaries",
+    concurrency=settings.background_summary_concurrency,
+    max_size=settings.background_queue_size,
+    max_attempts=1,
+)
@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Dict, Any, Optional, List
 from src.services.ocr_service import OcrService
 from src.common.constants import BankingVisionKeywords
+from src.common.keyword_matcher import KeywordMatcher
 from src.config import settings
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,7 @@ class DocumentParser:
         self.ocr_service = OcrService(api_key=settings.ocr_api_key)
         self.recipient_account = recipient_account
         self.recipient_name_keywords = [kw.lower() for kw in recipient_name_keywords]
+        self.recipient_name_matcher = KeywordMatcher(self.recipient_name_keywords)
         self.date_regex = re.compile(r'(\d{2}:\d{2}(?::\d{2})?\s*[-]?\s*\d{2}[/-]\d{2}[/-]\d{4}|\d{2}[/-]\d{2}[/-]\d{4}\s*\d{2}:\d{2}(?::\d{2})?)')
         self.amount_regex = re.compile(r'((?:-?[\d]{1,3}(?:[.,]\d{3})*)\s?(?:VND|đ))')
         id_keywords = "|".join(BankingVisionKeywords.TRANSACTION_ID_KEYWORDS)
@@ -24,20 +26,10 @@ class DocumentParser:
         )
 
     def _check_is_insurance(self, text: str) -> bool:
-        lower_text = text.lower()
-        found_count = 0
-        for keyword in BankingVisionKeywords.INSURANCE_KEYWORDS:
-            if keyword in lower_text:
-                found_count += 1
-        return found_count >= 3
+        return BankingVisionKeywords.INSURANCE_MATCHER.count_distinct(text) >= 3
 
     def _check_is_signboard(self, text: str) -> bool:
-        lower_text = text.lower()
-        found_count = 0
-        for keyword in BankingVisionKeywords.SIGNBOARD_KEYWORDS:
-            if keyword in lower_text:
-                found_count += 1
-        return found_count >= 2
+        return BankingVisionKeywords.SIGNBOARD_MATCHER.count_distinct(text) >= 2
 
     def _normalize_date(self, date_str: str) -> str:
         formats_to_try = ['%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%H:%M - %d/%m/%Y', '%H:%M - %d-%m-%Y', '%d/%m/%Y %H:%M', '%d-%m-%Y %H:%M', '%d/%m/%Y, %H:%M']
@@ -47,10 +39,7 @@ class DocumentParser:
         return date_str
 
     def _extract_banking_name(self, text: str) -> Optional[str]:
-        lower_text = text.lower()
-        for keyword, bank_name in BankingVisionKeywords.BANKS.items():
-            if keyword in lower_text: return bank_name
-        return None
+        return BankingVisionKeywords.BANK_MATCHER.longest(text)
 
     def _extract_transaction_date(self, text: str) -> Optional[str]:
         match = self.date_regex.search(text)
@@ -71,9 +60,7 @@ class DocumentParser:
         return None
         
     def _extract_recipient_name(self, text: str) -> Optional[str]:
-        lower_text = text.lower()
-        for keyword in self.recipient_name_keywords:
-            if keyword in lower_text: return "CONG TY CO PHAN BAO HIEM CONG NGHE PHUONG DONG INSURTECH"
+        if self.recipient_name_matcher.first(text) is not None: return "CONG TY CO PHAN BAO HIEM CONG NGHE PHUONG DONG INSURTECH"
         return None
 
     def _extract_transaction_id(self, text: str) -> Optional[str]:
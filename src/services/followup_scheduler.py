@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.database import followup_repository
+from src.database.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Sends the follow-up for one claimed cart: order_list_id, user_id, created_at,
+# total_amount, attempts and insurance_names. Raising marks the attempt failed.
+FollowupHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class FollowupScheduler:
+    """Periodic follow-up for paid carts, shared safely between workers.
+
+    Every interval the scheduler pages through carts that have been paid for
+    longer than the configured threshold, in (created_at, id) keyset order.
+    Each page is claimed in one statement (followup_repository.CLAIM_DUE_SQL),
+    which gives the carts a lease in user_feedback, so any number of workers
+    can run the same job without sending a follow-up twice. The handler runs
+    for up to `concurrency` carts of a page at once. After each page the
+    job's cursor in followup_progress moves past it, so a restarted worker
+    resumes the pass where it stopped; when a pass runs out of carts the
+    cursor goes back to the start, and carts whose handler failed are retried
+    then, up to `max_attempts` times. A worker stopped mid-page leaves its
+    claims to expire after `lease` seconds.
+    """
+
+    def __init__(
+        self,
+        job: str = "order_followup",
+        batch_size: int = 100,
+        concurrency: int = 8,
+        lease: float = 600.0,
+        max_attempts: int = 3,
+        handler: Optional[FollowupHandler] = None,
+    ):
+        self.job = job
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self._handler = handler
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"passes": 0, "claimed": 0, "sent": 0, "failed": 0}
+
+    def set_handler(self, handler: FollowupHandler) -> None:
+        self._handler = handler
+
+    @property
+    def interval(self) -> float:
+        if settings.scheduler_dev_mode:
+            return settings.followup_check_interval_minutes * 60.0
+        return settings.followup_check_interval_hours * 3600.0
+
+    @property
+    def threshold(self) -> timedelta:
+        if settings.scheduler_dev_mode:
+            return timedelta(minutes=settings.followup_minutes_threshold)
+        return timedelta(days=settings.followup_days_threshold)
+
+    async def start(self) -> None:
+        if self._task is not None or not settings.scheduler_enabled:
+            return
+        if self._handler is None:
+            logger.warning("Follow-up scheduler not started: no handler registered")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if db_manager.pool:
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"Follow-up pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Works through due carts from the saved cursor; returns how many were claimed."""
+        if self._handler is None:
+            raise RuntimeError("No follow-up handler registered")
+        cursor = await followup_repository.get_cursor(self.job)
+        claimed = 0
+        while True:
+            batch = await followup_repository.claim_due(
+                cursor, self.threshold, self.batch_size, self.lease, self.max_attempts
+            )
+            if not batch:
+                await followup_repository.reset_cursor(self.job)
+                self.stats["passes"] += 1
+                break
+            claimed += len(batch)
+            self.stats["claimed"] += len(batch)
+            await self._process(batch)
+            cursor = (batch[-1]["created_at"], batch[-1]["order_list_id"])
+            await followup_repository.advance_cursor(self.job, cursor)
+        if claimed:
+            logger.info(f"Follow-up pass claimed {claimed} carts")
+        return claimed
+
+    async def _process(self, batch: List[Dict[str, Any]]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _one(order: Dict[str, Any]) -> Optional[Tuple[int, str]]:
+            async with semaphore:
+                try:
+                    await self._handler(order)
+                    return None
+                except Exception as e:
+                    logger.warning(f"Follow-up for order list {order['order_list_id']} failed: {e}")
+                    return order["order_list_id"], str(e)[:500]
+
+        results = await asyncio.gather(*(_one(order) for order in batch))
+        failures = [r for r in results if r is not None]
+        failed_ids = {order_list_id for order_list_id, _ in failures}
+        await followup_repository.mark_sent([o["order_list_id"] for o in batch if o["order_list_id"] not in failed_ids])
+        await followup_repository.mark_failed(failures)
+        self.stats["sent"] += len(batch) - len(failures)
+        self.stats["failed"] += len(failures)
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+followup_scheduler = FollowupScheduler(
+    batch_size=settings.followup_batch_size,
+    concurrency=settings.followup_concurrency,
+    lease=settings.followup_claim_seconds,
+    max_attempts=settings.followup_max_attempts,
+)
@@ -0,0 +1,204 @@
+"""Bulk reconciliation of bank transfers against pending carts.
+
+Transfers arrive as SePay webhook payloads or as rows of a bank statement
+export. Each is matched to a cart through the `<prefix>+DH<order_list_id>`
+reference printed in the cart's QR code (see order_repository._QR_TEMPLATE),
+and a whole batch is settled by one statement
+(sepay_repository.RECONCILE_SQL): paid carts and their items become
+'completed', short payments flag the cart for human_check, and every
+transfer is recorded under its bank transaction id, so replaying a webhook
+or re-importing a statement changes nothing. Receipt screenshots still go
+through the OCR path; this covers transfers the bank reports directly.
+
+    python -m src.services.payment_reconciliation statement.csv [more.csv ...]
+
+Statement files are CSV with a header row, using either SePay's export
+column names (id, gateway, transactionDate, transferAmount, content) or
+transaction_id, gateway, transferred_at, amount, content.
+"""
+import argparse
+import asyncio
+import csv
+import hmac
+import logging
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from src.config import settings
+from src.database import sepay_repository
+from src.database.cart_cache import cart_cache
+from src.database.connection import db_manager, redis_manager
+
+logger = logging.getLogger(__name__)
+
+# SePay reports local (Vietnam) time without an offset.
+SEPAY_TZ = timezone(timedelta(hours=7))
+
+# Banks rewrite the '+' and spacing of the transfer note freely: "TKPS2E DH123", "tkps2edh123".
+_PREFIXED_REFERENCE = re.compile(rf"{re.escape(settings.payment_code_prefix)}\W*DH\W*(\d+)", re.IGNORECASE)
+_BARE_REFERENCE = re.compile(r"(?<![A-Z0-9])DH\W?(\d+)(?!\d)", re.IGNORECASE)
+# Largest id RECONCILE_SQL's bigint[] parameter can carry.
+_MAX_ORDER_LIST_ID = 2**63 - 1
+
+
+class BankTransaction(NamedTuple):
+    transaction_id: str
+    amount: Decimal
+    content: Optional[str]
+    transferred_at: Optional[datetime] = None
+    gateway: Optional[str] = None
+
+    @property
+    def order_list_id(self) -> Optional[int]:
+        return parse_order_reference(self.content)
+
+
+def parse_order_reference(content: Optional[str]) -> Optional[int]:
+    """The cart id in a transfer note, preferring the full `<prefix>DH<id>` form.
+
+    A number too long to be a cart id gives None, so the transfer is recorded as
+    unmatched instead of failing the whole batch.
+    """
+    if not content:
+        return None
+    match = _PREFIXED_REFERENCE.search(content) or _BARE_REFERENCE.search(content)
+    if not match:
+        return None
+    order_list_id = int(match.group(1))
+    return order_list_id if order_list_id <= _MAX_ORDER_LIST_ID else None
+
+
+def _amount(value: Any) -> Optional[Decimal]:
+    try:
+        amount = Decimal(str(value).replace(",", "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return amount if amount > 0 else None
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S%z", "%d/%m/%Y %H:%M:%S"):
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=SEPAY_TZ)
+    return None
+
+
+def from_sepay_webhook(payload: Dict[str, Any]) -> Optional[BankTransaction]:
+    """A transaction from one SePay webhook body; None for outgoing or malformed ones."""
+    if payload.get("transferType", "in") != "in" or payload.get("id") is None:
+        return None
+    amount = _amount(payload.get("transferAmount"))
+    if amount is None:
+        return None
+    # SePay fills `code` when payment-code detection is configured; the note is the fallback.
+    content = payload.get("content") or payload.get("description")
+    if payload.get("code"):
+        content = f"{payload['code']} {content or ''}".strip()
+    return BankTransaction(
+        transaction_id=str(payload["id"]),
+        amount=amount,
+        content=content,
+        transferred_at=_timestamp(payload.get("transactionDate")),
+        gateway=payload.get("gateway"),
+    )
+
+
+def read_statement(path: Path) -> List[BankTransaction]:
+    """Incoming transactions of a CSV statement export."""
+    transactions = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            transaction_id = row.get("id") or row.get("transaction_id")
+            amount = _amount(row.get("transferAmount") or row.get("amount") or "")
+            if not transaction_id or amount is None:
+                continue
+            transactions.append(BankTransaction(
+                transaction_id=transaction_id.strip(),
+                amount=amount,
+                content=row.get("content"),
+                transferred_at=_timestamp(row.get("transactionDate") or row.get("transferred_at")),
+                gateway=row.get("gateway"),
+            ))
+    return transactions
+
+
+def verify_webhook_auth(authorization: Optional[str]) -> bool:
+    """Checks SePay's `Authorization: Apikey <key>` header against settings.sepay_api_key."""
+    if not settings.sepay_api_key or not authorization:
+        return False
+    scheme, _, key = authorization.partition(" ")
+    return scheme.lower() == "apikey" and hmac.compare_digest(key.strip(), settings.sepay_api_key)
+
+
+async def reconcile(transactions: Iterable[BankTransaction], batch_size: int = 1000) -> Dict[str, int]:
+    """Settles the carts paid by `transactions`; returns counts per outcome.
+
+    `duplicates` counts transactions already recorded, or repeated within the input.
+    """
+    summary: Counter = Counter()
+    batch: List[BankTransaction] = []
+
+    async def _flush() -> None:
+        rows = await sepay_repository.reconcile_transactions(
+            [t.transaction_id for t in batch],
+            [t.gateway for t in batch],
+            [t.amount for t in batch],
+            [t.content for t in batch],
+            [t.transferred_at for t in batch],
+            [t.order_list_id for t in batch],
+        )
+        summary["received"] += len(batch)
+        summary["duplicates"] += len(batch) - len(rows)
+        summary.update(row["match_status"] for row in rows)
+        if rows:
+            summary["items_completed"] += rows[0]["items_completed"]
+        # The paid cart is no longer pending; refresh the cached view_orders snapshots,
+        # concurrently so their reads share snapshot_loader's batches.
+        await asyncio.gather(*(
+            cart_cache.write_through(from_id) for from_id in {row["from_id"] for row in rows if row["from_id"]}
+        ))
+        batch.clear()
+
+    for transaction in transactions:
+        batch.append(transaction)
+        if len(batch) >= batch_size:
+            await _flush()
+    if batch:
+        await _flush()
+    if summary["matched"] or summary["underpaid"]:
+        logger.info(f"Reconciled payments: {dict(summary)}")
+    return {key: summary[key] for key in
+            ("received", "duplicates", "matched", "underpaid", "already_paid", "unmatched", "items_completed")}
+
+
+async def main(paths: List[Path]) -> int:
+    await db_manager.initialize()
+    if not db_manager.pool:
+        raise SystemExit("Database is not reachable; check your .env settings.")
+    # Settled carts are written through to the cached pending cart.
+    await redis_manager.initialize()
+    try:
+        transactions = [t for path in paths for t in read_statement(path)]
+        summary = await reconcile(transactions)
+        print(" ".join(f"{key}={value}" for key, value in summary.items()))
+        return 0
+    finally:
+        await db_manager.close()
+        await redis_manager.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("statements", nargs="+", type=Path, help="CSV statement exports")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.statements)))
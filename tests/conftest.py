@@ -0,0 +1,17 @@
+import os
+import sys
+import types
+
+# Settings refuses to load without these; the unit tests never reach the services behind them.
+for _name in (
+    "OPENAI_API_KEY", "ZALO_BOT_TOKEN", "ZALO_WEBHOOK_SECRET", "DATABASE_URL", "DB_HOST",
+    "DB_NAME", "DB_USER", "DB_PASSWORD", "REDIS_URL", "OCR_API_KEY", "QDRANT_URL", "QDRANT_API_KEY",
+):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("DB_PORT", "5432")
+
+# src.database.vector_store connects to Qdrant at import time, and importing anything under
+# src.agent.middleware reaches it through memory_tools. No unit test touches the store.
+_vector_store = types.ModuleType("src.database.vector_store")
+_vector_store.vector_store = None
+sys.modules.setdefault("src.database.vector_store", _vector_store)
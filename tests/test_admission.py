@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from src.common.exceptions import PoolSaturatedException
+from src.database.admission import AdmissionController, Priority
+
+
+def test_background_cannot_use_reserved_slots():
+    async def scenario():
+        admission = AdmissionController(capacity=3, interactive_reserved=1, acquire_timeout=0.05)
+        await admission.acquire("a", Priority.BACKGROUND)
+        await admission.acquire("b", Priority.BACKGROUND)
+        with pytest.raises(PoolSaturatedException):
+            await admission.acquire("c", Priority.BACKGROUND)
+        # The reserved slot is still there for an interactive caller.
+        await admission.acquire("d", Priority.INTERACTIVE)
+        return admission.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["in_flight"] == 3
+    assert snapshot["rejected"] == {"interactive": 0, "background": 1}
+
+
+def test_interactive_waiters_are_served_first():
+    async def scenario():
+        admission = AdmissionController(capacity=1, acquire_timeout=1.0)
+        await admission.acquire("holder", Priority.INTERACTIVE)
+        order = []
+
+        async def caller(name, priority):
+            async with admission.slot(name, priority):
+                order.append(name)
+
+        background = asyncio.create_task(caller("background", Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(caller("interactive", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(background, interactive)
+        return order, admission.in_flight
+
+    order, in_flight = asyncio.run(scenario())
+    assert order == ["interactive", "background"]
+    assert in_flight == 0
+
+
+def test_cancelled_waiter_leaves_no_slot_behind():
+    async def scenario():
+        admission = AdmissionController(capacity=1, acquire_timeout=1.0)
+        await admission.acquire("holder", Priority.INTERACTIVE)
+        waiter = asyncio.create_task(admission.acquire("waiter", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        admission.release()
+        return admission.in_flight, admission.queue_depth
+
+    assert asyncio.run(scenario()) == (0, 0)
@@ -0,0 +1,16 @@
+from datetime import date
+
+import pytest
+
+from src.database.chat_history_retention import _cutoff
+
+
+@pytest.mark.parametrize("today, months, expected", [
+    (date(2026, 10, 18), 6, date(2026, 4, 1)),
+    (date(2026, 3, 1), 6, date(2025, 9, 1)),
+    (date(2026, 1, 31), 1, date(2025, 12, 1)),
+    (date(2026, 12, 31), 12, date(2025, 12, 1)),
+    (date(2026, 10, 18), 0, date(2026, 10, 1)),
+])
+def test_cutoff_is_the_first_kept_month(today, months, expected):
+    assert _cutoff(today, months) == expected
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.common.exceptions import CircuitOpenException
+from src.database.circuit_breaker import BreakerState, CircuitBreaker
+
+
+async def _fail(breaker: CircuitBreaker, error: Exception) -> None:
+    with pytest.raises(type(error)):
+        async with breaker.guard():
+            raise error
+
+
+def test_opens_at_failure_rate_and_rejects():
+    async def scenario():
+        breaker = CircuitBreaker("db", failure_rate=0.5, min_calls=4, probe_interval=60)
+        async with breaker.guard():
+            pass
+        for _ in range(2):
+            await _fail(breaker, ConnectionError("down"))
+        assert breaker.state == BreakerState.CLOSED
+        await _fail(breaker, ConnectionError("down"))
+        assert breaker.state == BreakerState.OPEN
+        with pytest.raises(CircuitOpenException):
+            async with breaker.guard():
+                pass
+        with pytest.raises(CircuitOpenException):
+            breaker.reject_if_open()
+        return breaker.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["trips"] == 1
+    assert snapshot["rejected"] == 2
+
+
+def test_errors_that_are_not_failures_keep_it_closed():
+    async def scenario():
+        breaker = CircuitBreaker("db", is_failure=lambda e: isinstance(e, ConnectionError), min_calls=2)
+        for _ in range(5):
+            await _fail(breaker, ValueError("constraint"))
+        return breaker.state
+
+    assert asyncio.run(scenario()) == BreakerState.CLOSED
+
+
+def test_half_open_trial_closes_or_reopens():
+    async def scenario():
+        breaker = CircuitBreaker("db", probe_interval=0)
+        breaker.trip(ConnectionError("down"))
+        # Without a background probe, the first call after the interval is the trial.
+        breaker.reject_if_open()
+        await _fail(breaker, ConnectionError("still down"))
+        assert breaker.state == BreakerState.OPEN
+        async with breaker.guard():
+            pass
+        return breaker.state
+
+    assert asyncio.run(scenario()) == BreakerState.CLOSED
+
+
+def test_half_open_admits_only_the_trial_calls():
+    breaker = CircuitBreaker("db", probe_interval=0, half_open_max_calls=1)
+    breaker.trip(ConnectionError("down"))
+    breaker.before_call()
+    assert breaker.state == BreakerState.HALF_OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+    breaker.record_abandoned()
+    breaker.before_call()
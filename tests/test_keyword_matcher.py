@@ -0,0 +1,32 @@
+from src.common.keyword_matcher import KeywordMatcher, fold
+
+
+def test_fold_strips_case_and_diacritics_one_char_per_char():
+    text = "Bảo Hiểm Đà Nẵng"
+    assert fold(text) == "bao hiem da nang"
+    assert len(fold(text)) == len(text)
+
+
+def test_folded_duplicates_collapse_to_the_first():
+    matcher = KeywordMatcher({"sức khỏe": "health", "suc khoe": "other", "du lịch": "travel"})
+    assert len(matcher) == 2
+    assert matcher.get("  SUC   KHOE ") == "health"
+    assert matcher.get("xe máy", "none") == "none"
+
+
+def test_first_follows_declaration_order_and_longest_length():
+    matcher = KeywordMatcher({"bảo hiểm": "generic", "bảo hiểm sức khỏe": "health"})
+    text = "Mình cần bao hiem suc khoe cho bố"
+    assert matcher.first(text) == "generic"
+    assert matcher.longest(text) == "health"
+    assert matcher.first("không liên quan") is None
+
+
+def test_find_all_positions_index_the_original_text():
+    matcher = KeywordMatcher(["du lịch", "lịch"])
+    text = "Du lịch Nhật, lịch trình 5 ngày"
+    matches = matcher.find_all(text)
+    assert [(m.keyword, text[m.start:m.end]) for m in matches] == [
+        ("du lịch", "Du lịch"), ("lịch", "lịch"), ("lịch", "lịch"),
+    ]
+    assert matcher.count_distinct(text) == 2
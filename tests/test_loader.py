@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from src.database.loader import BatchLoader
+
+
+class _Source:
+    def __init__(self, rows, error=None):
+        self.rows = rows
+        self.error = error
+        self.batches = []
+
+    async def __call__(self, keys):
+        self.batches.append(sorted(keys))
+        if self.error:
+            raise self.error
+        return {k: self.rows[k] for k in keys if k in self.rows}
+
+
+def test_loads_in_one_tick_share_a_batch():
+    source = _Source({1: "a", 2: "b"})
+
+    async def scenario():
+        loader = BatchLoader(source)
+        results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+        return results, loader.stats
+
+    results, stats = asyncio.run(scenario())
+    assert results == ["a", "b", "a", None]
+    assert source.batches == [[1, 2, 3]]
+    assert stats == {"loads": 4, "deduplicated": 1, "batches": 1, "keys": 3}
+
+
+def test_batches_are_capped():
+    source = _Source({k: k for k in range(5)})
+
+    async def scenario():
+        return await BatchLoader(source, max_batch_size=2).load_many(list(range(5)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert source.batches == [[0, 1], [2, 3], [4]]
+
+
+def test_failure_reaches_every_caller_of_the_batch():
+    source = _Source({}, error=ConnectionError("down"))
+
+    async def scenario():
+        loader = BatchLoader(source)
+        return await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_nothing_is_cached_across_batches():
+    source = _Source({1: "a"})
+
+    async def scenario():
+        loader = BatchLoader(source)
+        await loader.load(1)
+        source.rows[1] = "b"
+        return await loader.load(1)
+
+    assert asyncio.run(scenario()) == "b"
+    assert len(source.batches) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    source = _Source({1: "a"})
+
+    async def scenario():
+        loader = BatchLoader(source)
+        first = asyncio.create_task(loader.load(1))
+        second = asyncio.create_task(loader.load(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "a"
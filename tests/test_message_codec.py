@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.agent.middleware.message_codec import CODECS, COMPACT_V1, decode_message
+
+
+@pytest.mark.parametrize("message", [
+    HumanMessage(content="Bảo hiểm xe máy bao nhiêu?", id="h1"),
+    AIMessage(content="66.000đ/năm", id="a1", response_metadata={"token_usage": {"total_tokens": 9}}),
+    SystemMessage(content="Summary of previous conversation: ...", id=None),
+])
+def test_compact_round_trip_keeps_type_content_and_id(message):
+    raw = CODECS["compact"].encode(message)
+    assert raw[:1] == COMPACT_V1
+    decoded = decode_message(raw)
+    assert (type(decoded), decoded.content, decoded.id) == (type(message), message.content, message.id)
+    # Model metadata is dropped; the stamped created_at survives a re-encode.
+    assert set(decoded.response_metadata) == {"created_at"}
+    assert CODECS["compact"].encode(decoded) == raw
+
+
+def test_compact_falls_back_to_json_for_other_types():
+    message = ToolMessage(content="ok", tool_call_id="call_1", id="t1")
+    raw = CODECS["compact"].encode(message)
+    assert raw[:1] == b"{"
+    assert decode_message(raw).tool_call_id == "call_1"
+
+
+def test_legacy_json_entries_still_decode():
+    message = AIMessage(content="xin chào", id="a2", response_metadata={"finish_reason": "stop"})
+    raw = CODECS["json"].encode(message)
+    assert json.loads(raw)["type"] == "ai"
+    decoded = decode_message(raw.decode("utf-8"))
+    assert decoded.response_metadata == {"finish_reason": "stop"}
+
+
+def test_unknown_header_is_rejected():
+    with pytest.raises(ValueError):
+        decode_message(b"\x02[]")
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pytest
+
+from src.services.payment_reconciliation import SEPAY_TZ, from_sepay_webhook, parse_order_reference
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("TKPS2E DH123 chuyen tien", 123),
+    ("tkps2e+dh45", 45),
+    ("ND: DH 56 cam on", 56),
+    ("MBVCB.123.DH78.CT", 78),
+    ("ADH99", None),
+    ("chuyen tien", None),
+    (None, None),
+    # Past bigint: recorded as unmatched instead of failing the batch.
+    ("DH" + "9" * 20, None),
+    ("TKPS2E DH" + "1" * 25, None),
+    ("DH9223372036854775807", 9223372036854775807),
+])
+def test_parse_order_reference(content, expected):
+    assert parse_order_reference(content) == expected
+
+
+def test_prefixed_reference_wins_over_a_bare_one():
+    assert parse_order_reference("DH1 TKPS2E DH2") == 2
+
+
+def test_from_sepay_webhook():
+    transaction = from_sepay_webhook({
+        "id": 92704, "gateway": "VPBank", "transactionDate": "2026-10-18 10:00:00",
+        "transferType": "in", "transferAmount": "1,500,000", "content": "chuyen tien", "code": "TKPS2E DH7",
+    })
+    assert transaction.transaction_id == "92704"
+    assert transaction.amount == Decimal("1500000")
+    assert transaction.order_list_id == 7
+    assert transaction.transferred_at.tzinfo == SEPAY_TZ
+
+
+@pytest.mark.parametrize("payload", [
+    {"id": 1, "transferType": "out", "transferAmount": 1000},
+    {"id": 1, "transferType": "in", "transferAmount": 0},
+    {"transferType": "in", "transferAmount": 1000},
+])
+def test_from_sepay_webhook_skips_outgoing_and_malformed(payload):
+    assert from_sepay_webhook(payload) is None
@@ -0,0 +1,39 @@
+"""EXPLAIN checks for the hot per-user queries (benchmarks/check_query_plans.py).
+
+Needs a migrated scratch database the test may seed, as its owner, inside a rolled-back
+transaction; set TEST_DATABASE_URL to run it, e.g.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/zalo_test python -m pytest tests/test_query_plans.py
+"""
+import asyncio
+import os
+
+import asyncpg
+import pytest
+
+from benchmarks.check_query_plans import CHECKS, check_plans
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def plan_results():
+    async def run():
+        try:
+            conn = await asyncpg.connect(TEST_DATABASE_URL, timeout=5)
+        except (OSError, asyncpg.PostgresError) as e:
+            pytest.skip(f"Postgres is not reachable: {e}")
+        try:
+            return await check_plans(conn, users=2000, lists=10, messages=20, max_seq_rows=1000)
+        finally:
+            await conn.close()
+
+    return {result.statement: result for result in asyncio.run(run())}
+
+
+@pytest.mark.parametrize("statement", [check.statement.name for check in CHECKS])
+def test_hot_query_uses_indexes(plan_results, statement):
+    result = plan_results[statement]
+    assert not result.regressed, f"sequential scans on {result.regressed}: {result.scans}"
@@ -0,0 +1,52 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.agent.middleware.token_budget import trim_to_budget
+
+
+class _LengthCounter:
+    """One token per character, so budgets in the tests are easy to read."""
+
+    def count_messages(self, messages):
+        return sum(len(m.content) for m in messages)
+
+
+def _tool_exchange(n):
+    call = AIMessage(content="", id=f"call{n}", tool_calls=[{"name": "search", "args": {}, "id": f"c{n}"}])
+    return [call, ToolMessage(content="r" * 10, tool_call_id=f"c{n}", id=f"result{n}")]
+
+
+def test_keeps_summary_and_current_turn_over_budget():
+    summary = SystemMessage(content="s" * 50)
+    older = [HumanMessage(content="q" * 10, id="q0"), AIMessage(content="a" * 10, id="a0")]
+    turn = [HumanMessage(content="q" * 50, id="q1")]
+    kept, dropped = trim_to_budget([summary, *older, *turn], budget=60, counter=_LengthCounter())
+    assert kept == [summary, *turn]
+    assert dropped == 2
+
+
+def test_drops_oldest_first():
+    messages = [HumanMessage(content="x" * 10, id=f"m{i}") for i in range(5)]
+    kept, dropped = trim_to_budget(messages, budget=30, counter=_LengthCounter())
+    assert [m.id for m in kept] == ["m2", "m3", "m4"]
+    assert dropped == 2
+
+
+def test_tool_exchanges_are_kept_or_dropped_whole():
+    question = HumanMessage(content="q" * 10, id="q0")
+    exchange = _tool_exchange(0)
+    answer = AIMessage(content="a" * 5, id="a0")
+    turn = HumanMessage(content="q" * 5, id="q1")
+    messages = [question, *exchange, answer, turn]
+
+    kept, _ = trim_to_budget(messages, budget=20, counter=_LengthCounter())
+    assert [m.id for m in kept] == ["call0", "result0", "a0", "q1"]
+    kept, _ = trim_to_budget(messages, budget=19, counter=_LengthCounter())
+    assert [m.id for m in kept] == ["a0", "q1"]
+
+
+def test_orphaned_tool_results_never_survive():
+    orphan = ToolMessage(content="r", tool_call_id="gone", id="orphan")
+    turn = HumanMessage(content="q", id="q1")
+    kept, dropped = trim_to_budget([orphan, turn], budget=100, counter=_LengthCounter())
+    assert kept == [turn]
+    assert dropped == 1